@@ -1,11 +1,36 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
+import uuid
+import tracemalloc
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from io import StringIO
 import re
+import time
+import threading
+from functools import wraps
+
+import config
+from backends import ShardedBackend, create_backend
+from caching import LRUCache, SingleFlightCache, TokenBucket, VersionedValue
+from charts import downsample
+from frames import ensure_date_columns, format_date, to_epoch_day, typed_frame
+from gazetteer import Gazetteer
+from loading import UPSERT_EVENT, UPSERT_OBSERVATION, ensure_natural_keys
+from hotspots import HotspotEngine, ensure_hotspot_schema, hotspot_features, top_hotspots
+from nowcast import AnomalyDetector, describe_flags
+from partitions import PartitionManager
+from profiling import MemoryProfiler
+from querylog import QueryLog
+from scoring import RuleScorer, build_features, load_scorer, recent_start
+from search import archive_sources, ensure_search_schema, page_count, search_events
+from sharding import ShardSet
+from snapshot import load_snapshot
+from trends import TrendCube, direction
+from uncertainty import probability_bands
 
 # Page configuration
 st.set_page_config(
@@ -17,7 +42,7 @@ st.set_page_config(
 # Initialize SQLite Database
 @st.cache_resource
 def init_database():
-    conn = sqlite3.connect('cloudburst_data.db', check_same_thread=False)
+    conn = sqlite3.connect(config.DB_PATH, check_same_thread=False)
     cursor = conn.cursor()
    
     # Create tables
@@ -41,6 +66,7 @@ def init_database():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             state TEXT NOT NULL,
             district TEXT NOT NULL,
+            station TEXT NOT NULL DEFAULT '',
             date TEXT NOT NULL,
             humidity REAL,
             temperature REAL,
@@ -51,9 +77,33 @@ def init_database():
         )
     ''')
    
-    # Check if data already exists
-    cursor.execute("SELECT COUNT(*) FROM cloudburst_history")
-    if cursor.fetchone()[0] == 0:
+    # Add generated date-part columns and later key columns to databases created before them
+    ensure_date_columns(conn)
+    ensure_natural_keys(conn)
+   
+    # Data version counter, bumped by triggers on every change to either table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    for table in ('cloudburst_history', 'weather_data'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+    ensure_hotspot_schema(conn)
+    ensure_search_schema(conn)
+   
+    # Seed only an empty database: years moved to archives leave the hot tables empty (without counting every row)
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM cloudburst_history) OR EXISTS (SELECT 1 FROM weather_data)")
+    if not cursor.fetchone()[0] and not PartitionManager(conn).archives():
         # Insert cloudburst historical data
         cloudburst_data = [
             # Uttarakhand
@@ -110,11 +160,7 @@ def init_database():
             ('Kerala', 'Kozhikode', '2024-07-20', 132, 2.5, 10, 'High', 11.2, 75.8),
         ]
        
-        cursor.executemany('''
-            INSERT INTO cloudburst_history
-            (state, district, date, rainfall_mm, duration_hours, casualties, severity, latitude, longitude)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', cloudburst_data)
+        cursor.executemany(UPSERT_EVENT, cloudburst_data)
        
         # Insert weather data
         weather_data = [
@@ -150,11 +196,8 @@ def init_database():
             ('Uttar Pradesh', 'All Districts', '2025-10-28', 60, 29, 8, 996, 55, 18),
         ]
        
-        cursor.executemany('''
-            INSERT INTO weather_data
-            (state, district, date, humidity, temperature, wind_speed, pressure, cloud_cover, precipitation)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', weather_data)
+        # Regional readings, not from any one feed station
+        cursor.executemany(UPSERT_OBSERVATION, [(state, district, '', *rest) for state, district, *rest in weather_data])
        
         conn.commit()
    
@@ -177,127 +220,351 @@ all_indian_states = [
     "Uttar Pradesh", "Uttarakhand", "West Bengal", "Jammu and Kashmir"
 ]
 
+# Date columns are datetime64 in memory; show them as plain dates
+DATE_COLUMN_CONFIG = {'date': st.column_config.DatetimeColumn("date", format="YYYY-MM-DD")}
+
+# Memory profiling (opt-in); caches are looked up lazily when a report is built
+@st.cache_resource
+def get_memory_profiler():
+    if not config.MEMORY_PROFILING:
+        return None
+    profiler = MemoryProfiler(frames=config.MEMORY_PROFILE_FRAMES)
+    profiler.track_cache('full history', lambda: get_full_history_store())
+    profiler.track_cache('gazetteer', lambda: get_gazetteer_store())
+    profiler.track_cache('quick answers', lambda: get_quick_answer_store())
+    profiler.track_cache('chat results', lambda: get_chat_result_store())
+    profiler.track_cache('figure specs', lambda: get_figure_cache())
+    profiler.track_cache('scorer', lambda: get_scorer())
+    profiler.track_cache('trend cube', lambda: get_trend_store())
+    profiler.track_cache('prediction cache', lambda: get_prediction_cache())
+    profiler.track_cache('nowcaster', lambda: get_nowcaster())
+    profiler.track_cache('hotspot index', lambda: get_hotspot_engine())
+    profiler.track_cache('snapshot', lambda: get_snapshot())
+    return profiler
+
+def profile_query(query, frame):
+    profiler = get_memory_profiler()
+    if profiler is not None:
+        profiler.record_query(query, frame)
+    return frame
+
 # Helper functions
-def execute_query(query, params=()):
-    """Execute SQL query and return results as DataFrame"""
-    return pd.read_sql_query(query, conn, params=params)
+@st.cache_resource
+def get_connection_lock():
+    """Held while a read resolves its relations on the shared connection and runs.
+
+    Archives are ATTACHed and their union views created on `conn`, which
+    every session thread uses; reaching more than partitions.MAX_ATTACHED
+    archives detaches the least recently used ones and drops their views,
+    so no other session may be between resolving a relation and reading it.
+    """
+    return threading.RLock()
+
+def execute_query(query, params=(), since=None):
+    """Execute SQL query and return results as a compactly typed DataFrame.
+
+    Tables are written as {cloudburst_history} / {weather_data} placeholders,
+    resolved to the rows from `since` (YYYY-MM-DD) onwards, or all of them.
+    """
+    relations = {'cloudburst_history': history_table, 'weather_data': weather_table}
+    with get_connection_lock():
+        query = query.format(**{name: resolve(since) for name, resolve in relations.items() if f"{{{name}}}" in query})
+        frame = pd.read_sql_query(query, conn, params=params)
+    return profile_query(query, typed_frame(frame))
+
+@st.cache_resource
+def get_partition_manager():
+    return PartitionManager(conn, lock=get_connection_lock())
+
+@st.cache_resource
+def get_shard_set():
+    """Per-state shards when CLOUDBURST_SHARDING is on, split from the main database the first time"""
+    if not config.SHARDING:
+        return None
+    shards = ShardSet()
+    shards.ensure_schema(conn)
+    if shards.is_empty():
+        shards.split(config.DB_PATH)
+    return shards
+
+def history_table(since=None):
+    """Relation holding cloudburst events from `since` (YYYY-MM-DD) onwards, or all of them.
+
+    Archived years are ATTACHed only when the range reaches them, so recent
+    queries read the hot database alone. With sharding on it is a view over
+    every shard (archiving applies to the unsharded layout only). Resolve and
+    read it under get_connection_lock(), as execute_query does.
+    """
+    shards = get_shard_set()
+    if shards is not None:
+        return shards.relation(conn, 'cloudburst_history')
+    return get_partition_manager().relation('cloudburst_history', to_epoch_day(since) if since else None)
+
+def weather_table(since=None):
+    """Relation holding weather observations from `since` (YYYY-MM-DD) onwards, or all of them (see history_table)"""
+    shards = get_shard_set()
+    if shards is not None:
+        return shards.relation(conn, 'weather_data')
+    return get_partition_manager().relation('weather_data', to_epoch_day(since) if since else None)
+
+def execute_state_query(state, query, params=()):
+    """execute_query for a query filtered to one state.
+
+    Tables are written as {cloudburst_history} / {weather_data} placeholders;
+    with sharding on, the query runs on that state's shard alone.
+    """
+    shards = get_shard_set()
+    if shards is None:
+        return execute_query(query, params)
+    query = query.format(cloudburst_history='cloudburst_history', weather_data='weather_data')
+    return profile_query(query, typed_frame(shards.query_state(state, query, params)))
+
+@st.cache_resource
+def get_analytics_backend():
+    shards = get_shard_set()
+    if shards is not None:
+        return ShardedBackend(shards)
+    sources = {'cloudburst_history': history_table, 'weather_data': weather_table}
+    return create_backend(config.QUERY_BACKEND, conn, sources, lock=get_connection_lock())
+
+def execute_aggregate(query, params=()):
+    """Run a full-scan aggregate on the configured analytics backend.
+
+    Tables are written as {cloudburst_history} / {weather_data} placeholders
+    and resolved by the backend; point lookups should use execute_query.
+    """
+    frame = typed_frame(get_analytics_backend().execute(query, params, version=get_data_version()))
+    return profile_query(query, frame)
+
+def get_data_version():
+    """Current data version; changes whenever either table is written, in the main database or any shard"""
+    version = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+    shards = get_shard_set()
+    return version if shards is None else version + shards.version(conn)
+
+@st.cache_resource
+def get_snapshot():
+    """Startup snapshot written after the last ingest (see snapshot.py), if there is one"""
+    return load_snapshot(config.SNAPSHOT_PATH) if config.SNAPSHOT_PATH else None
+
+def fresh_snapshot():
+    """The startup snapshot if the database is still at the version it was built from, else None"""
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot['version'] != get_data_version():
+        return None
+    return snapshot
+
+# Stored columns only; the generated date parts are for filtering and grouping
+HISTORY_COLUMNS = "id, state, district, date, rainfall_mm, duration_hours, casualties, severity, latitude, longitude"
+WEATHER_COLUMNS = "id, state, district, date, humidity, temperature, wind_speed, pressure, cloud_cover, precipitation"
+
+@st.cache_resource
+def get_full_history_store():
+    return VersionedValue(lambda: execute_query(f"SELECT {HISTORY_COLUMNS} FROM {{cloudburst_history}} ORDER BY epoch_day DESC"))
 
 def get_cloudburst_history(state=None):
-    """Get cloudburst history for a specific state or all states"""
+    """Get cloudburst history for a specific state or all states.
+
+    The all-states frame is shared by every session for the current data
+    version; callers must filter into new frames rather than mutate it.
+    """
     if state:
-        query = "SELECT * FROM cloudburst_history WHERE state = ? ORDER BY date DESC"
-        return execute_query(query, (state,))
+        query = f"SELECT {HISTORY_COLUMNS} FROM {{cloudburst_history}} WHERE state = ? ORDER BY epoch_day DESC"
+        return execute_state_query(state, query, (state,))
     else:
-        query = "SELECT * FROM cloudburst_history ORDER BY date DESC"
-        return execute_query(query)
+        return get_full_history_store().get(get_data_version())
 
 def get_weather_data(state=None):
     """Get current weather data"""
     if state:
-        query = "SELECT * FROM weather_data WHERE state = ? ORDER BY date DESC LIMIT 1"
-        return execute_query(query, (state,))
+        query = f"SELECT {WEATHER_COLUMNS} FROM {{weather_data}} WHERE state = ? ORDER BY epoch_day DESC, date DESC LIMIT 1"
+        return execute_state_query(state, query, (state,))
     else:
-        query = "SELECT * FROM weather_data ORDER BY date DESC"
+        query = f"SELECT {WEATHER_COLUMNS} FROM {{weather_data}} ORDER BY epoch_day DESC, date DESC"
         return execute_query(query)
 
+def latest_weather():
+    """Latest weather reading of every state, in the shape of the Current Weather query"""
+    return execute_query(f"""
+        SELECT state, humidity, temperature, wind_speed, pressure, cloud_cover, precipitation, date
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY state ORDER BY epoch_day DESC, date DESC, id DESC) as rn
+            FROM {{weather_data}}
+        )
+        WHERE rn = 1
+        ORDER BY state
+    """)
+
+# Risk bands keyed by the minimum probability (percent) that reaches them
+RISK_LEVELS = [
+    (85, 'Critical', True, 'red', '🚨 EXTREME ALERT: High probability of cloudburst in the next 24-48 hours!'),
+    (65, 'High', True, 'orange', '⚠️ HIGH ALERT: Significant cloudburst risk detected. Take precautions!'),
+    (40, 'Medium', True, 'yellow', '⚠️ MODERATE ALERT: Monitor weather conditions closely.'),
+    (0, 'Low', False, 'green', '✅ LOW RISK: Weather conditions are relatively stable.'),
+]
+
+WEATHER_FIELDS = ['district', 'date', 'humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation']
+
+@st.cache_resource
+def get_scorer():
+    """Load the configured risk scorer once per process, falling back to the rule set"""
+    try:
+        return load_scorer(config.SCORER, config.MODEL_PATH)
+    except (OSError, ValueError):
+        return RuleScorer()
+
+@st.cache_resource
+def get_nowcaster():
+    return AnomalyDetector()
+
+def nowcast_features():
+    """Per-state streaming anomaly features, after folding in observations added since the last call"""
+    detector = get_nowcaster()
+    shards = get_shard_set()
+    if shards is None:
+        detector.catch_up(conn)
+    else:
+        for name in shards.names:
+            detector.catch_up(shards.connection(name), source=name)
+    return detector.state_features()
+
+@st.cache_resource
+def get_hotspot_engine():
+    # Shard ids are not one increasing sequence, so sharded layouts re-cluster per version
+    return HotspotEngine(conn, history_table, incremental=not config.SHARDING)
+
+@st.cache_resource
+def get_hotspot_store():
+    engine = get_hotspot_engine()
+    def refresh():
+        with get_connection_lock():
+            return engine.refresh()
+    return VersionedValue(refresh)
+
+def refresh_hotspots():
+    """Fold events added since the last data version into the persisted hotspot clusters"""
+    get_hotspot_store().get(get_data_version())
+
+@st.cache_resource
+def get_trend_store():
+    def build():
+        snapshot = fresh_snapshot()
+        if snapshot is not None:
+            return TrendCube(snapshot['trend_cube'])
+        with get_connection_lock():
+            return TrendCube.build(conn, history_table())
+    return VersionedValue(build)
+
+def get_trends():
+    """Yearly/monthly trend cube for the current data version"""
+    return get_trend_store().get(get_data_version())
+
+def recent_year():
+    """Latest year with recorded events (this year before any); 'recent' incidents are the ones from that year on"""
+    return get_trends().latest_year or datetime.now().year
+
+def predict_states(states):
+    """Risk predictions for several states, from one feature build and one scoring pass; {state: prediction}"""
+    refresh_hotspots()
+    since = recent_start(recent_year())
+    shards = get_shard_set()
+    if shards is None:
+        with get_connection_lock():
+            state_features = build_features(
+                conn, states, recent_since=since, history_table=history_table(), weather_table=weather_table()
+            )
+    else:
+        by_shard = {}
+        for state in states:
+            by_shard.setdefault(shards.shard_for(state), []).append(state)
+        state_features = pd.concat([
+            build_features(shards.connection(name), shard_states, recent_since=since)
+            for name, shard_states in by_shard.items()
+        ]).reindex(pd.Index(states, name='state'))
+    features = (
+        state_features
+        .join(nowcast_features())
+        .join(hotspot_features(conn))
+    )
+    probabilities = get_scorer().score(features)
+    bands = probability_bands(get_scorer(), features) if config.UNCERTAINTY_SAMPLES else None
+    return {
+        state: risk_prediction(row, float(probabilities[i]), None if bands is None else bands.iloc[i], since)
+        for i, (state, row) in enumerate(features.iterrows())
+    }
+
+@st.cache_resource
+def get_prediction_cache():
+    return SingleFlightCache(config.PREDICTION_TTL_SECONDS)
+
 def predict_cloudburst(state):
-    """Predict cloudburst probability based on historical and weather data"""
-    # Get historical data
-    historical = get_cloudburst_history(state)
-    weather = get_weather_data(state)
+    """Predict cloudburst probability based on historical and weather data.
+
+    Sessions asking for the same state at the same data version share one
+    computation and its result for PREDICTION_TTL_SECONDS.
+    """
+    snapshot = fresh_snapshot()
+    if snapshot is not None and state in snapshot['predictions']:
+        return snapshot['predictions'][state]
+    return get_prediction_cache().get((get_data_version(), state), lambda: predict_states([state])[state])
+
+def prediction_wait():
+    """0 if this session may request another prediction now, else the seconds until it may"""
+    if not config.PREDICTION_RATE_PER_MINUTE:
+        return 0
+    if 'prediction_limit' not in st.session_state:
+        st.session_state.prediction_limit = TokenBucket(config.PREDICTION_RATE_PER_MINUTE / 60, config.PREDICTION_BURST)
+    return st.session_state.prediction_limit.take()
+
+def risk_prediction(row, probability, bands, since):
+    """Prediction for one state from its feature row, probability and (optional) probability bands"""
+    anomalies = describe_flags(int(row['anomaly_flags'])) if pd.notna(row['anomaly_flags']) else []
+    active_hotspots = int(row['active_hotspots']) if pd.notna(row['active_hotspots']) else 0
+    weather = row[WEATHER_FIELDS] if pd.notna(row['date']) else None
+    probability_range = None
+    if bands is not None:
+        probability_range = (
+            min(round(bands['probability_low'], 1), 95),
+            min(round(bands['probability_high'], 1), 95)
+        )
+   
+    _, risk, alert, color, message = next(level for level in RISK_LEVELS if probability >= level[0])
    
-    if historical.empty:
+    if row['total_incidents'] == 0:
         return {
-            'risk': 'Low',
-            'probability': 15,
-            'alert': False,
+            'risk': risk,
+            'probability': min(round(probability, 1), 95),
+            'probability_range': probability_range,
+            'alert': alert,
             'message': 'No historical cloudburst data available for this state',
-            'color': 'green',
+            'color': color,
             'total_incidents': 0,
             'recent_incidents': 0,
+            'recent_year': since[:4],
             'avg_rainfall': 0,
             'max_rainfall': 0,
             'avg_casualties': 0,
-            'weather': weather.iloc[0] if not weather.empty else None
+            'weather': weather,
+            'anomalies': anomalies,
+            'active_hotspots': active_hotspots
         }
    
-    # Calculate risk factors
-    total_incidents = len(historical)
-    recent_incidents = len(historical[historical['date'] >= '2024-01-01'])
-    avg_rainfall = historical['rainfall_mm'].mean()
-    max_rainfall = historical['rainfall_mm'].max()
-    avg_casualties = historical['casualties'].mean()
-   
-    # Risk scoring
-    risk_score = 0
-   
-    # Historical frequency (0-30 points)
-    risk_score += min(total_incidents * 3, 30)
-   
-    # Recent activity (0-25 points)
-    risk_score += min(recent_incidents * 5, 25)
-   
-    # Current weather conditions (0-45 points)
-    if not weather.empty:
-        w = weather.iloc[0]
-        if w['humidity'] > 80:
-            risk_score += 15
-        elif w['humidity'] > 70:
-            risk_score += 8
-       
-        if w['pressure'] < 985:
-            risk_score += 12
-        elif w['pressure'] < 990:
-            risk_score += 6
-       
-        if w['cloud_cover'] > 85:
-            risk_score += 10
-        elif w['cloud_cover'] > 75:
-            risk_score += 5
-       
-        if w['wind_speed'] > 12:
-            risk_score += 8
-        elif w['wind_speed'] > 8:
-            risk_score += 3
-   
-    # Determine risk level
-    if risk_score >= 70:
-        risk = 'Critical'
-        alert = True
-        color = 'red'
-        probability = 85 + (risk_score - 70) / 3
-        message = '🚨 EXTREME ALERT: High probability of cloudburst in the next 24-48 hours!'
-    elif risk_score >= 50:
-        risk = 'High'
-        alert = True
-        color = 'orange'
-        probability = 65 + (risk_score - 50) / 2
-        message = '⚠️ HIGH ALERT: Significant cloudburst risk detected. Take precautions!'
-    elif risk_score >= 30:
-        risk = 'Medium'
-        alert = True
-        color = 'yellow'
-        probability = 40 + (risk_score - 30) / 1.5
-        message = '⚠️ MODERATE ALERT: Monitor weather conditions closely.'
-    else:
-        risk = 'Low'
-        alert = False
-        color = 'green'
-        probability = 15 + risk_score / 2
-        message = '✅ LOW RISK: Weather conditions are relatively stable.'
-   
     return {
         'risk': risk,
         'probability': min(round(probability, 1), 95),
+        'probability_range': probability_range,
         'alert': alert,
         'message': message,
         'color': color,
-        'total_incidents': total_incidents,
-        'recent_incidents': recent_incidents,
-        'avg_rainfall': round(avg_rainfall, 1),
-        'max_rainfall': round(max_rainfall, 1),
-        'avg_casualties': round(avg_casualties, 1),
-        'weather': weather.iloc[0] if not weather.empty else None
+        'total_incidents': int(row['total_incidents']),
+        'recent_incidents': int(row['recent_incidents']),
+        'recent_year': since[:4],
+        'avg_rainfall': round(row['avg_rainfall'], 1),
+        'max_rainfall': round(row['max_rainfall'], 1),
+        'avg_casualties': round(row['avg_casualties'], 1),
+        'weather': weather,
+        'anomalies': anomalies,
+        'active_hotspots': active_hotspots
     }
 
 def query_information(query_type, state, district=None):
@@ -306,53 +573,174 @@ def query_information(query_type, state, district=None):
         if district and district != "All Districts":
             query = """
                 SELECT date, district, rainfall_mm, duration_hours
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 WHERE state = ? AND district = ?
-                ORDER BY date DESC
+                ORDER BY epoch_day DESC
             """
-            return execute_query(query, (state, district))
+            return execute_state_query(state, query, (state, district))
         else:
             query = """
                 SELECT date, district, rainfall_mm, duration_hours
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 WHERE state = ?
-                ORDER BY date DESC
+                ORDER BY epoch_day DESC
             """
-            return execute_query(query, (state,))
+            return execute_state_query(state, query, (state,))
    
     elif query_type == "Current Weather":
+        snapshot = fresh_snapshot()
+        if snapshot is not None:
+            weather = snapshot['weather']
+            return weather[weather['state'] == state].reset_index(drop=True)
         query = """
             SELECT state, humidity, temperature, wind_speed, pressure,
                    cloud_cover, precipitation, date
-            FROM weather_data
+            FROM {weather_data}
             WHERE state = ?
-            ORDER BY date DESC LIMIT 1
+            ORDER BY epoch_day DESC, date DESC LIMIT 1
         """
-        return execute_query(query, (state,))
+        return execute_state_query(state, query, (state,))
    
     elif query_type == "Precipitation Trends":
         query = """
             SELECT date, rainfall_mm as precipitation
-            FROM cloudburst_history
+            FROM {cloudburst_history}
             WHERE state = ?
-            ORDER BY date
+            ORDER BY epoch_day
         """
-        return execute_query(query, (state,))
+        return execute_state_query(state, query, (state,))
+
+def get_state_stats():
+    """Incidents, rainfall and casualties per state, most incidents first"""
+    snapshot = fresh_snapshot()
+    if snapshot is not None:
+        return snapshot['state_stats']
+    return execute_aggregate("""
+        SELECT
+            state,
+            COUNT(*) as total_incidents,
+            ROUND(AVG(rainfall_mm), 2) as avg_rainfall,
+            ROUND(MAX(rainfall_mm), 2) as max_rainfall,
+            SUM(casualties) as total_casualties
+        FROM {cloudburst_history}
+        GROUP BY state
+        ORDER BY total_incidents DESC
+    """)
+
+def filter_values():
+    """Distinct places in the data: {'places': [(state, district or None)], 'districts': {state: [district]}}"""
+    with get_connection_lock():
+        places = conn.execute(f"""
+            SELECT DISTINCT state, district FROM {history_table()}
+            UNION
+            SELECT DISTINCT state, NULL FROM {weather_table()}
+            ORDER BY state, district
+        """).fetchall()
+    districts = {}
+    for state, district in places:
+        if district is not None:
+            districts.setdefault(state, []).append(district)
+    return {'places': places, 'districts': districts}
+
+def state_districts(state):
+    """Districts with recorded events in a state, sorted"""
+    snapshot = fresh_snapshot()
+    if snapshot is not None:
+        return snapshot['filters']['districts'].get(state, [])
+    districts = execute_state_query(
+        state, "SELECT DISTINCT district FROM {cloudburst_history} WHERE state = ? ORDER BY district", (state,)
+    )
+    return districts['district'].tolist()
+
+def find_events(text, page=1):
+    """One page of the events matching free text, best match first, and the number of matches"""
+    shards = get_shard_set()
+    if shards is not None:
+        rows, total = search_events([shards.connection(name) for name in shards.names], text, page)
+    else:
+        with get_connection_lock():
+            rows, total = search_events(archive_sources(conn, get_partition_manager()), text, page)
+    return profile_query(f"search: {text}", typed_frame(rows)), total
 
 # Chatbot functions
-def process_chatbot_query(user_query):
-    """Process natural language queries and return appropriate responses"""
+@st.cache_resource
+def get_query_log():
+    return QueryLog(config.QUERY_LOG_PATH) if config.QUERY_LOG_PATH else None
+
+@st.cache_resource
+def get_gazetteer_store():
+    def build():
+        snapshot = fresh_snapshot()
+        with get_connection_lock():
+            return Gazetteer.load(
+                conn, extra_states=all_indian_states, history_table=history_table(), weather_table=weather_table(),
+                places=None if snapshot is None else snapshot['filters']['places']
+            )
+    return VersionedValue(build)
+
+def get_gazetteer():
+    """Place-name index (states, UTs, districts, aliases) for the current data version"""
+    return get_gazetteer_store().get(get_data_version())
+
+def describe_hotspots(hotspots):
+    """Numbered markdown lines for rows of top_hotspots"""
+    lines = ""
+    for idx, row in enumerate(hotspots.itertuples(index=False)):
+        span = format_date(row.first_date) if row.first_date == row.last_date else f"{format_date(row.first_date)} – {format_date(row.last_date)}"
+        # Clusters near a border list every state they span, most events first
+        states = row.states if isinstance(row.states, str) else row.state
+        lines += f"{idx+1}. **Around {row.district}, {states}**: {row.events} events ({span}), {int(row.casualties or 0)} casualties\n"
+    return lines
+
+def process_chatbot_query(user_query, answer=None):
+    """Answer an operator's query, or take a quick button's precomputed answer, and log the call"""
+    trace = {'intent': None if answer is None else 'quick'}
+    started = time.perf_counter()
+    response, result = answer if answer is not None else answer_chatbot_query(user_query, trace)
+    query_log = get_query_log()
+    if query_log is not None:
+        query_log.record(user_query, trace['intent'], time.perf_counter() - started, response, result,
+                         version=get_data_version())
+    return response, result
+
+# "search <text>" / "look up <text>", optionally ending in "page <n>"
+SEARCH_COMMAND = re.compile(r'^\s*(?:search|look\s*up)\b(?:\s+for)?\s+(.+?)(?:\s+page\s+(\d+))?\s*$', re.IGNORECASE)
+
+def answer_chatbot_query(user_query, trace):
+    """Answer a natural language query; sets trace['intent'] to the intent that handled it"""
     query_lower = user_query.lower()
     
-    # Extract state names from query
-    mentioned_states = [state for state in all_indian_states if state.lower() in query_lower]
+    # Resolve state names, aliases, districts and misspellings mentioned in the query
+    mentioned_states = get_gazetteer().states(user_query)
+    mentioned_years = [int(year) for year in re.findall(r'\b((?:19|20)\d{2})\b', user_query)]
     
     try:
+        search = SEARCH_COMMAND.match(user_query)
+        
+        # Query: Full-text search over events, e.g. "search chamoli 2023 page 2"
+        if search:
+            trace['intent'] = 'search'
+            text, page = search.group(1), int(search.group(2) or 1)
+            result, total = find_events(text, page)
+            if result.empty:
+                if total:
+                    return f"Results for **{text}** end at page {page_count(total)}.", None
+                return f"🔎 No events match **{text}**. Try a district, state, severity or year.", None
+            first = (page - 1) * config.SEARCH_PAGE_SIZE + 1
+            response = f"**🔎 Events matching '{text}'** ({first}–{first + len(result) - 1} of {total}, best first):\n\n"
+            for idx, row in enumerate(result.itertuples(index=False), first):
+                response += (f"{idx}. **{row.district}, {row.state}** – {format_date(row.date)}: "
+                             f"{row.rainfall_mm:.0f} mm, {row.severity}, {row.casualties} casualties\n")
+            if page < page_count(total):
+                response += f"\nAsk **search {text} page {page + 1}** for more."
+            return response, result
+        
         # Query: Which state has most/more cloudbursts?
-        if any(word in query_lower for word in ['most cloudburst', 'more cloudburst', 'highest cloudburst', 'maximum cloudburst']):
-            result = execute_query("""
+        elif 'district' not in query_lower and any(word in query_lower for word in ['most cloudburst', 'more cloudburst', 'highest cloudburst', 'maximum cloudburst']):
+            trace['intent'] = 'most_cloudbursts'
+            result = execute_aggregate("""
                 SELECT state, COUNT(*) as total_incidents
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 GROUP BY state
                 ORDER BY total_incidents DESC
                 LIMIT 5
@@ -366,9 +754,10 @@ def process_chatbot_query(user_query):
         
         # Query: Least cloudbursts / Safest places
         elif any(word in query_lower for word in ['least cloudburst', 'fewest cloudburst', 'lowest cloudburst', 'safest', 'safe place', 'safe state', 'safer']):
-            result = execute_query("""
+            trace['intent'] = 'safest_states'
+            result = execute_aggregate("""
                 SELECT state, COUNT(*) as total_incidents
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 GROUP BY state
                 ORDER BY total_incidents ASC
                 LIMIT 5
@@ -383,8 +772,9 @@ def process_chatbot_query(user_query):
         
         # Query: States with no cloudbursts
         elif 'no cloudburst' in query_lower or 'zero cloudburst' in query_lower or 'never had' in query_lower:
+            trace['intent'] = 'no_cloudbursts'
             all_states_df = pd.DataFrame({'state': all_indian_states})
-            states_with_cloudbursts = execute_query("SELECT DISTINCT state FROM cloudburst_history")
+            states_with_cloudbursts = execute_query(f"SELECT DISTINCT state FROM {{cloudburst_history}}")
             safe_states = all_states_df[~all_states_df['state'].isin(states_with_cloudbursts['state'])]
             
             if not safe_states.empty:
@@ -398,9 +788,10 @@ def process_chatbot_query(user_query):
         
         # Query: Most dangerous/deadliest
         elif any(word in query_lower for word in ['dangerous', 'deadliest', 'most fatal', 'most casualties', 'worst']):
-            result = execute_query("""
+            trace['intent'] = 'most_dangerous'
+            result = execute_aggregate("""
                 SELECT state, SUM(casualties) as total_casualties, COUNT(*) as incidents
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 GROUP BY state
                 ORDER BY total_casualties DESC
                 LIMIT 5
@@ -414,20 +805,21 @@ def process_chatbot_query(user_query):
         
         # Query: When do cloudbursts occur most
         elif any(word in query_lower for word in ['when', 'which month', 'what month', 'season', 'time of year']):
-            result = execute_query("""
+            trace['intent'] = 'peak_months'
+            result = execute_aggregate("""
                 SELECT 
-                    SUBSTR(date, 6, 2) as month,
+                    month,
                     COUNT(*) as incidents
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 GROUP BY month
                 ORDER BY incidents DESC
             """)
             
             if not result.empty:
                 month_names = {
-                    '01': 'January', '02': 'February', '03': 'March', '04': 'April',
-                    '05': 'May', '06': 'June', '07': 'July', '08': 'August',
-                    '09': 'September', '10': 'October', '11': 'November', '12': 'December'
+                    1: 'January', 2: 'February', 3: 'March', 4: 'April',
+                    5: 'May', 6: 'June', 7: 'July', 8: 'August',
+                    9: 'September', 10: 'October', 11: 'November', 12: 'December'
                 }
                 result['month_name'] = result['month'].map(month_names)
                 
@@ -439,11 +831,12 @@ def process_chatbot_query(user_query):
         
         # Query: Districts with most cloudbursts
         elif 'district' in query_lower and any(word in query_lower for word in ['most', 'highest', 'top']):
+            trace['intent'] = 'top_districts'
             if mentioned_states:
                 state = mentioned_states[0]
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT district, COUNT(*) as incidents, SUM(casualties) as casualties
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     WHERE state = ?
                     GROUP BY district
                     ORDER BY incidents DESC
@@ -453,11 +846,23 @@ def process_chatbot_query(user_query):
                     response = f"**🏘️ Most Affected Districts in {state}:**\n\n"
                     for idx, row in result.iterrows():
                         response += f"{idx+1}. **{row['district']}**: {row['incidents']} incidents, {int(row['casualties'])} casualties\n"
+                    refresh_hotspots()
+                    hotspots = top_hotspots(conn, state=state, limit=5)
+                    if not hotspots.empty:
+                        response += "\n**🔥 Space-time hotspots:**\n\n"
+                        response += describe_hotspots(hotspots)
                     return response, result
             else:
-                result = execute_query("""
+                refresh_hotspots()
+                hotspots = top_hotspots(conn, limit=10)
+                if not hotspots.empty:
+                    response = "**🏘️ Top Hotspots (events clustered in space and time):**\n\n"
+                    response += describe_hotspots(hotspots)
+                    return response, hotspots
+
+                result = execute_aggregate("""
                     SELECT state, district, COUNT(*) as incidents
-                    FROM cloudburst_history
+                    FROM {cloudburst_history}
                     GROUP BY state, district
                     ORDER BY incidents DESC
                     LIMIT 10
@@ -471,10 +876,11 @@ def process_chatbot_query(user_query):
         
         # Query: Duration/intensity
         elif any(word in query_lower for word in ['duration', 'how long', 'longest', 'shortest']):
+            trace['intent'] = 'duration'
             if 'longest' in query_lower:
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT state, district, date, duration_hours, rainfall_mm
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     ORDER BY duration_hours DESC
                     LIMIT 5
                 """)
@@ -482,14 +888,14 @@ def process_chatbot_query(user_query):
                 if not result.empty:
                     response = "**⏱️ Longest Duration Cloudbursts:**\n\n"
                     for idx, row in result.iterrows():
-                        response += f"{idx+1}. **{row['state']}, {row['district']}** ({row['date']}): {row['duration_hours']} hours, {row['rainfall_mm']} mm\n"
+                        response += f"{idx+1}. **{row['state']}, {row['district']}** ({format_date(row['date'])}): {row['duration_hours']} hours, {row['rainfall_mm']} mm\n"
                     return response, result
             else:
-                result = execute_query("""
+                result = execute_aggregate("""
                     SELECT ROUND(AVG(duration_hours), 2) as avg_duration,
                            ROUND(MIN(duration_hours), 2) as min_duration,
                            ROUND(MAX(duration_hours), 2) as max_duration
-                    FROM cloudburst_history
+                    FROM {cloudburst_history}
                 """)
                 
                 if not result.empty:
@@ -501,31 +907,37 @@ def process_chatbot_query(user_query):
                     return response, result
         
         # Query: Year comparison
-        elif any(word in query_lower for word in ['2023 vs 2024', 'compare 2023', 'compare 2024', 'year comparison']):
-            result = execute_query("""
-                SELECT 
-                    SUBSTR(date, 1, 4) as year,
-                    COUNT(*) as incidents,
-                    SUM(casualties) as casualties,
-                    ROUND(AVG(rainfall_mm), 2) as avg_rainfall
-                FROM cloudburst_history
-                GROUP BY year
-                ORDER BY year
-            """)
+        elif (any(word in query_lower for word in ['year comparison', 'year over year', 'year-over-year', 'yoy'])
+              or (mentioned_years and len(mentioned_states) < 2
+                  and any(word in query_lower for word in ['compare', ' vs ', 'versus']))):
+            trace['intent'] = 'year_comparison'
+            trends = get_trends()
+            state = mentioned_states[0] if mentioned_states else None
+            years = sorted(set(mentioned_years))
+            first, last = (years[0], years[-1]) if years else (trends.first_year, trends.latest_year)
+            result = trends.yearly(first_year=first, last_year=last, state=state)
+            if len(years) > 1:
+                result = result[result['year'].isin(years)].reset_index(drop=True)
             
             if not result.empty:
-                response = "**📊 Year-wise Comparison:**\n\n"
-                for idx, row in result.iterrows():
-                    response += f"**{row['year']}**: {row['incidents']} incidents, {int(row['casualties'])} casualties, {row['avg_rainfall']} mm avg rainfall\n"
+                response = f"**📊 Year-wise Comparison{f' for {state}' if state else ''}:**\n\n"
+                for row in result.itertuples():
+                    change = f" ({row.yoy_change:+.0f} on {row.year - 1})" if pd.notna(row.yoy_change) else ""
+                    rainfall = f", {row.avg_rainfall} mm avg rainfall" if pd.notna(row.avg_rainfall) else ""
+                    response += f"**{row.year}**: {row.incidents} incidents{change}, {row.casualties} casualties{rainfall}\n"
+                if len(years) > 1:
+                    delta = result['incidents'].iloc[-1] - result['incidents'].iloc[0]
+                    response += f"\n💡 {years[-1]} had {abs(delta)} {'more' if delta >= 0 else 'fewer'} incidents than {years[0]}."
                 return response, result
         
         # Query: High severity incidents
         elif 'high severity' in query_lower or 'severe' in query_lower:
+            trace['intent'] = 'high_severity'
             if mentioned_states:
                 state = mentioned_states[0]
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT district, date, rainfall_mm, casualties
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     WHERE state = ? AND severity = 'High'
                     ORDER BY rainfall_mm DESC
                 """, (state,))
@@ -535,9 +947,9 @@ def process_chatbot_query(user_query):
                     response += f"Total high severity incidents: **{len(result)}**\n\n"
                     return response, result
             else:
-                result = execute_query("""
+                result = execute_aggregate("""
                     SELECT state, COUNT(*) as high_severity_count
-                    FROM cloudburst_history
+                    FROM {cloudburst_history}
                     WHERE severity = 'High'
                     GROUP BY state
                     ORDER BY high_severity_count DESC
@@ -551,44 +963,48 @@ def process_chatbot_query(user_query):
         
         # Query: Trend analysis
         elif any(word in query_lower for word in ['trend', 'increasing', 'decreasing', 'getting worse', 'getting better']):
-            result = execute_query("""
-                SELECT 
-                    SUBSTR(date, 1, 4) as year,
-                    COUNT(*) as incidents
-                FROM cloudburst_history
-                GROUP BY year
-                ORDER BY year
-            """)
+            trace['intent'] = 'trend'
+            trends = get_trends()
+            state = mentioned_states[0] if mentioned_states else None
+            result = trends.yearly(state=state)
             
-            if not result.empty and len(result) > 1:
-                trend = "increasing" if result['incidents'].iloc[-1] > result['incidents'].iloc[0] else "decreasing"
-                response = f"**📈 Cloudburst Trend Analysis:**\n\n"
-                for idx, row in result.iterrows():
-                    response += f"**{row['year']}**: {row['incidents']} incidents\n"
-                response += f"\n💡 The trend shows {trend} frequency from 2023 to 2024."
+            if len(result) > 1:
+                response = f"**📈 Cloudburst Trend Analysis{f' for {state}' if state else ''}:**\n\n"
+                for row in result.itertuples():
+                    response += f"**{row.year}**: {row.incidents} incidents (3-year average {row.moving_avg})\n"
+                response += f"\n💡 The trend shows {direction(result)} frequency from {trends.first_year} to {trends.latest_year}."
                 return response, result
         
         # Query: Risk level / prediction
         elif any(word in query_lower for word in ['risk', 'prediction', 'forecast', 'likely']) and mentioned_states:
+            trace['intent'] = 'risk'
             state = mentioned_states[0]
             prediction = predict_cloudburst(state)
             
             response = f"**🔮 Risk Assessment for {state}:**\n\n"
             response += f"Risk Level: **{prediction['risk']}**\n"
             response += f"Probability: **{prediction['probability']}%**\n"
+            if prediction['probability_range']:
+                low, high = prediction['probability_range']
+                response += f"Range under sensor error ({config.UNCERTAINTY_INTERVAL:g}%): **{low}% – {high}%**\n"
             response += f"Total Incidents: **{prediction['total_incidents']}**\n"
-            response += f"Recent Incidents (2024): **{prediction['recent_incidents']}**\n\n"
+            response += f"Recent Incidents ({prediction['recent_year']}): **{prediction['recent_incidents']}**\n\n"
+            if prediction['active_hotspots']:
+                response += f"🔥 Active hotspot clusters: **{prediction['active_hotspots']}**\n\n"
+            if prediction['anomalies']:
+                response += f"⚡ Live anomalies: **{', '.join(prediction['anomalies'])}**\n\n"
             response += f"💡 {prediction['message']}"
             
             return response, None
             
         # Query: Total casualties
         elif 'total casualties' in query_lower or 'how many deaths' in query_lower or 'total deaths' in query_lower:
+            trace['intent'] = 'casualties'
             if mentioned_states:
                 state = mentioned_states[0]
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT state, SUM(casualties) as total_casualties, COUNT(*) as incidents
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     WHERE state = ?
                     GROUP BY state
                 """, (state,))
@@ -599,9 +1015,9 @@ def process_chatbot_query(user_query):
                     response += f"Total incidents: **{int(result['incidents'].iloc[0])}**"
                     return response, result
             else:
-                result = execute_query("""
+                result = execute_aggregate("""
                     SELECT SUM(casualties) as total_casualties, COUNT(*) as total_incidents
-                    FROM cloudburst_history
+                    FROM {cloudburst_history}
                 """)
                 
                 response = f"**💔 Overall Casualties:**\n\n"
@@ -611,19 +1027,20 @@ def process_chatbot_query(user_query):
         
         # Query: Highest/maximum rainfall
         elif 'highest rainfall' in query_lower or 'maximum rainfall' in query_lower or 'most rainfall' in query_lower:
+            trace['intent'] = 'highest_rainfall'
             if mentioned_states:
                 state = mentioned_states[0]
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT state, district, date, rainfall_mm, severity
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     WHERE state = ?
                     ORDER BY rainfall_mm DESC
                     LIMIT 1
                 """, (state,))
             else:
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT state, district, date, rainfall_mm, severity
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     ORDER BY rainfall_mm DESC
                     LIMIT 1
                 """)
@@ -633,36 +1050,38 @@ def process_chatbot_query(user_query):
                 response = f"**🌧️ Highest Rainfall Record:**\n\n"
                 response += f"State: **{row['state']}**\n"
                 response += f"District: **{row['district']}**\n"
-                response += f"Date: **{row['date']}**\n"
+                response += f"Date: **{format_date(row['date'])}**\n"
                 response += f"Rainfall: **{row['rainfall_mm']} mm**\n"
                 response += f"Severity: **{row['severity']}**"
                 return response, result
         
         # Query: Information about specific state
         elif mentioned_states:
+            trace['intent'] = 'state_summary'
             state = mentioned_states[0]
             
             # Get state statistics
-            stats = execute_query("""
+            stats = execute_query(f"""
                 SELECT 
                     COUNT(*) as total_incidents,
                     ROUND(AVG(rainfall_mm), 2) as avg_rainfall,
                     ROUND(MAX(rainfall_mm), 2) as max_rainfall,
                     SUM(casualties) as total_casualties
-                FROM cloudburst_history
+                FROM {{cloudburst_history}}
                 WHERE state = ?
             """, (state,))
             
-            recent = execute_query("""
+            year = recent_year()
+            recent = execute_query(f"""
                 SELECT COUNT(*) as recent_incidents
-                FROM cloudburst_history
-                WHERE state = ? AND date >= '2024-01-01'
-            """, (state,))
+                FROM {{cloudburst_history}}
+                WHERE state = ? AND epoch_day >= ?
+            """, (state, to_epoch_day(f'{year}-01-01')), since=f'{year}-01-01')
             
             if not stats.empty and stats['total_incidents'].iloc[0] > 0:
                 response = f"**📊 Cloudburst Information for {state}:**\n\n"
                 response += f"Total incidents: **{int(stats['total_incidents'].iloc[0])}**\n"
-                response += f"Recent incidents (2024): **{int(recent['recent_incidents'].iloc[0])}**\n"
+                response += f"Recent incidents ({year}): **{int(recent['recent_incidents'].iloc[0])}**\n"
                 response += f"Average rainfall: **{stats['avg_rainfall'].iloc[0]} mm**\n"
                 response += f"Maximum rainfall: **{stats['max_rainfall'].iloc[0]} mm**\n"
                 response += f"Total casualties: **{int(stats['total_casualties'].iloc[0])}**"
@@ -670,26 +1089,31 @@ def process_chatbot_query(user_query):
             else:
                 return f"No historical cloudburst data found for **{state}**.", None
         
-        # Query: Recent cloudbursts or 2024 data
-        elif '2024' in query_lower or 'recent' in query_lower or 'latest' in query_lower:
-            result = execute_query("""
+        # Query: Recent cloudbursts or a given year
+        elif mentioned_years or 'recent' in query_lower or 'latest' in query_lower:
+            trace['intent'] = 'recent'
+            year = mentioned_years[-1] if mentioned_years else recent_year()
+            result = execute_query(f"""
                 SELECT state, district, date, rainfall_mm, casualties, severity
-                FROM cloudburst_history
-                WHERE date >= '2024-01-01'
-                ORDER BY date DESC
+                FROM {{cloudburst_history}}
+                WHERE year = ?
+                ORDER BY epoch_day DESC
                 LIMIT 10
-            """)
+            """, (year,), since=f'{year}-01-01')
             
             if not result.empty:
-                response = "**📅 Recent Cloudbursts (2024):**\n\n"
-                response += f"Total incidents in 2024: **{len(result)}**\n\n"
+                total = get_trends().yearly(first_year=year, last_year=year)['incidents'].sum()
+                title = "Recent Cloudbursts" if not mentioned_years else "Cloudbursts"
+                response = f"**📅 {title} ({year}):**\n\n"
+                response += f"Total incidents in {year}: **{total}**\n\n"
                 return response, result
         
         # Query: Severity levels
         elif 'severity' in query_lower or 'high severity' in query_lower:
-            result = execute_query("""
+            trace['intent'] = 'severity'
+            result = execute_aggregate("""
                 SELECT severity, COUNT(*) as count
-                FROM cloudburst_history
+                FROM {cloudburst_history}
                 GROUP BY severity
                 ORDER BY count DESC
             """)
@@ -702,14 +1126,15 @@ def process_chatbot_query(user_query):
         
         # Query: Compare states
         elif 'compare' in query_lower and len(mentioned_states) >= 2:
+            trace['intent'] = 'compare_states'
             state1, state2 = mentioned_states[0], mentioned_states[1]
-            result = execute_query("""
+            result = execute_query(f"""
                 SELECT 
                     state,
                     COUNT(*) as incidents,
                     ROUND(AVG(rainfall_mm), 2) as avg_rainfall,
                     SUM(casualties) as casualties
-                FROM cloudburst_history
+                FROM {{cloudburst_history}}
                 WHERE state IN (?, ?)
                 GROUP BY state
             """, (state1, state2))
@@ -720,11 +1145,12 @@ def process_chatbot_query(user_query):
         
         # Query: Average rainfall
         elif 'average rainfall' in query_lower or 'avg rainfall' in query_lower:
+            trace['intent'] = 'average_rainfall'
             if mentioned_states:
                 state = mentioned_states[0]
-                result = execute_query("""
+                result = execute_query(f"""
                     SELECT ROUND(AVG(rainfall_mm), 2) as avg_rainfall
-                    FROM cloudburst_history
+                    FROM {{cloudburst_history}}
                     WHERE state = ?
                 """, (state,))
                 
@@ -733,9 +1159,9 @@ def process_chatbot_query(user_query):
                     response += f"**{result['avg_rainfall'].iloc[0]} mm**"
                     return response, result
             else:
-                result = execute_query("""
+                result = execute_aggregate("""
                     SELECT state, ROUND(AVG(rainfall_mm), 2) as avg_rainfall
-                    FROM cloudburst_history
+                    FROM {cloudburst_history}
                     GROUP BY state
                     ORDER BY avg_rainfall DESC
                     LIMIT 5
@@ -748,9 +1174,10 @@ def process_chatbot_query(user_query):
         
         # Default: List all states with data
         else:
-            result = execute_query("""
+            trace['intent'] = 'help'
+            result = execute_query(f"""
                 SELECT DISTINCT state
-                FROM cloudburst_history
+                FROM {{cloudburst_history}}
                 ORDER BY state
             """)
             
@@ -761,365 +1188,385 @@ def process_chatbot_query(user_query):
             response += "- Tell me about cloudbursts in [state name]\n"
             response += "- What was the highest rainfall recorded?\n"
             response += "- Show me recent cloudbursts\n"
-            response += "- Compare [state1] and [state2]\n\n"
+            response += "- Compare [state1] and [state2]\n"
+            response += "- Search [district, state, severity or year]\n\n"
             response += f"I have data for {len(result)} states."
             return response, result
             
     except Exception as e:
+        trace['intent'] = 'error'
         return f"❌ Sorry, I encountered an error: {str(e)}", None
 
-# Main UI
-st.title("🌧️ Cloudburst Prediction System - India")
-st.markdown("### Real-time Weather Analysis & Historical Data (2023-2024)")
+    # A matched intent whose query came back empty
+    return "I couldn't find any matching cloudburst records for that question.", None
 
-# Sidebar
-st.sidebar.header("Navigation")
-page = st.sidebar.radio(
-    "Select Page",
-    ["🏠 Home & Prediction", "💬 Chatbot Assistant", "📊 Database Explorer", "🔍 Query Information"]
-)
+# Quick queries: (button label, query text). Answers depend only on the data,
+# so they are computed once per data version and shared by every session.
+QUICK_QUERIES = [
+    ("🏆 Most Cloudbursts", "Which state has the most cloudbursts?"),
+    ("✅ Safest States", "Which are the safest states?"),
+    ("💔 Most Dangerous", "Which is the most dangerous state?"),
+    ("📅 Monthly Trends", "When do cloudbursts occur most?"),
+    ("🛡️ No Cloudbursts", "Which states have no cloudbursts?"),
+    ("🏘️ Top Districts", "Which districts have the most cloudbursts?"),
+    ("📊 Year Comparison", "Compare cloudbursts year over year"),
+    ("📈 Trends", "Show me cloudburst trends"),
+]
 
-if page == "🏠 Home & Prediction":
-    st.header("Cloudburst Risk Assessment")
+@st.cache_resource
+def get_quick_answer_store():
+    def build():
+        snapshot = fresh_snapshot()
+        if snapshot is not None:
+            return snapshot['quick_answers']
+        return {query: answer_chatbot_query(query, {'intent': None}) for _, query in QUICK_QUERIES}
+    return VersionedValue(build)
+
+def get_quick_answers():
+    """Precomputed {query: (response, data)} for the current data version"""
+    return get_quick_answer_store().get(get_data_version())
+
+# Chat history helpers
+@st.cache_resource
+def get_chat_result_store():
+    """Result tables shared by every session, keyed by data version and normalised query text"""
+    return LRUCache(config.CHAT_RESULT_CACHE_SIZE)
+
+def chat_result_key(user_query):
+    return f"{get_data_version()}:{' '.join(user_query.lower().split())}"
+
+def ask_chatbot(user_query, answer=None):
+    """Answer a query and record a compact turn (text plus a result reference) in session history"""
+    response, data = process_chatbot_query(user_query, answer)
+    result_key = None
+    if data is not None and not data.empty:
+        result_key = chat_result_key(user_query)
+        get_chat_result_store().put(result_key, data)
    
-    # Use all Indian states for dropdown
-    states_list = sorted(all_indian_states)
+    history = st.session_state.chat_history
+    history.append({
+        'user': user_query,
+        'bot': response,
+        'result_key': result_key
+    })
+    # Evict the oldest turns beyond the per-session cap
+    del history[:-config.CHAT_HISTORY_LIMIT]
+
+def get_chat_result(chat):
+    """Look up a turn's result table, recomputing it if it was evicted from the shared store"""
+    if not chat.get('result_key'):
+        return None
+    store = get_chat_result_store()
+    data = store.get(chat['result_key'])
+    if data is None:
+        _, data = answer_chatbot_query(chat['user'], {'intent': None})
+        if data is not None:
+            store.put(chat['result_key'], data)
+    return data
+
+def clear_chat_history():
+    st.session_state.chat_history = []
+
+def render_chat_turn(chat, show_data=True):
+    with st.chat_message("user"):
+        st.write(chat['user'])
+    with st.chat_message("assistant"):
+        st.markdown(chat['bot'])
+        if show_data:
+            data = get_chat_result(chat)
+            if data is not None and not data.empty:
+                st.dataframe(data, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG)
+
+# Chart helpers
+@st.cache_resource
+def get_figure_cache():
+    """Generated figure JSON shared by every session"""
+    return LRUCache(config.FIGURE_CACHE_SIZE)
+
+def chart_window(df, key):
+    """Date-range slider bounding a time-series chart; None when there is nothing to zoom"""
+    start, end = df['date'].min().date(), df['date'].max().date()
+    if start == end:
+        return None
+    start, end = st.slider("Chart window", min_value=start, max_value=end, value=(start, end), key=key)
+    return pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+
+def render_time_series(chart_key, df, y, window, build):
+    """Render build(data) for df downsampled to the window, reusing the cached figure spec.
+
+    The spec is keyed by chart identity, window and data version, so a repeat
+    view costs a cache lookup and the browser never receives more than
+    CHART_MAX_POINTS points however long the history is.
+    """
+    cache = get_figure_cache()
+    key = (*chart_key, window, get_data_version())
+    spec = cache.get(key)
+    if spec is None:
+        spec = build(downsample(df, 'date', y, config.CHART_MAX_POINTS, window)).to_json()
+        cache.put(key, spec)
+    st.plotly_chart(pio.from_json(spec), use_container_width=True)
+
+def profiled_fragment(func):
+    """Profile a fragment's own reruns as renders; within a full script run it is part of that render"""
+    @wraps(func)
+    def run(*args, **kwargs):
+        profiler = get_memory_profiler()
+        session_id = st.session_state.get('profile_session')
+        if profiler is None or session_id is None or profiler.rendering(session_id):
+            return func(*args, **kwargs)
+        profiler.begin_render(session_id, f"{func.__name__} (fragment)")
+        result = func(*args, **kwargs)
+        profiler.end_render(session_id, st.session_state)
+        return result
+    return run
+
+# Page fragments: a widget inside one reruns just that function, not the whole script
+@st.fragment
+@profiled_fragment
+def prediction_panel(selected_state):
+    """Prediction result for one state; its chart controls rerun only this panel"""
+    st.divider()
    
-    col1, col2 = st.columns([2, 1])
+    # Get prediction
+    prediction = predict_cloudburst(selected_state)
+   
+    # Display alert box
+    if prediction['color'] == 'red':
+        st.error(f"### {prediction['message']}")
+    elif prediction['color'] == 'orange':
+        st.warning(f"### {prediction['message']}")
+    elif prediction['color'] == 'yellow':
+        st.info(f"### {prediction['message']}")
+    else:
+        st.success(f"### {prediction['message']}")
+    if prediction['anomalies']:
+        st.warning(f"⚡ Nowcast: live readings show {', '.join(prediction['anomalies'])}")
+   
+    # Risk metrics
+    col1, col2, col3, col4 = st.columns(4)
    
     with col1:
-        selected_state = st.selectbox(
-            "Select State",
-            [""] + states_list,
-            help="Choose a state to check cloudburst risk"
+        st.metric("Risk Level", prediction['risk'])
+    with col2:
+        st.metric("Probability", f"{prediction['probability']}%")
+    with col3:
+        st.metric("Total Incidents", prediction['total_incidents'])
+    with col4:
+        st.metric(f"Recent ({prediction['recent_year']})", prediction['recent_incidents'])
+    if prediction['probability_range']:
+        low, high = prediction['probability_range']
+        st.caption(
+            f"📐 {config.UNCERTAINTY_INTERVAL:g}% range under sensor error: {low}% – {high}% "
+            f"({config.UNCERTAINTY_SAMPLES:,} Monte Carlo samples)"
         )
    
-    with col2:
-        predict_btn = st.button("🔮 Predict Risk", type="primary", use_container_width=True)
+    st.divider()
    
-    if predict_btn and selected_state:
-        st.divider()
-       
-        # Get prediction
-        prediction = predict_cloudburst(selected_state)
+    # Weather conditions
+    if prediction['weather'] is not None:
+        st.subheader("🌤️ Current Weather Conditions")
+        st.caption(f"📅 Latest observation: {format_date(prediction['weather']['date'])} ({prediction['weather']['district']})")
        
-        # Display alert box
-        if prediction['color'] == 'red':
-            st.error(f"### {prediction['message']}")
-        elif prediction['color'] == 'orange':
-            st.warning(f"### {prediction['message']}")
-        elif prediction['color'] == 'yellow':
-            st.info(f"### {prediction['message']}")
-        else:
-            st.success(f"### {prediction['message']}")
-       
-        # Risk metrics
-        col1, col2, col3, col4 = st.columns(4)
-       
-        with col1:
-            st.metric("Risk Level", prediction['risk'])
-        with col2:
-            st.metric("Probability", f"{prediction['probability']}%")
-        with col3:
-            st.metric("Total Incidents", prediction['total_incidents'])
-        with col4:
-            st.metric("Recent (2024)", prediction['recent_incidents'])
+        wcol1, wcol2, wcol3, wcol4, wcol5 = st.columns(5)
        
-        st.divider()
+        with wcol1:
+            st.metric("💧 Humidity", f"{prediction['weather']['humidity']}%")
+        with wcol2:
+            st.metric("🌡️ Temperature", f"{prediction['weather']['temperature']}°C")
+        with wcol3:
+            st.metric("💨 Wind Speed", f"{prediction['weather']['wind_speed']} km/h")
+        with wcol4:
+            st.metric("🔽 Pressure", f"{prediction['weather']['pressure']} mb")
+        with wcol5:
+            st.metric("☁️ Cloud Cover", f"{prediction['weather']['cloud_cover']}%")
        
-        # Weather conditions
-        if prediction['weather'] is not None:
-            st.subheader("🌤️ Current Weather Conditions")
-           
-            wcol1, wcol2, wcol3, wcol4, wcol5 = st.columns(5)
-           
-            with wcol1:
-                st.metric("💧 Humidity", f"{prediction['weather']['humidity']}%")
-            with wcol2:
-                st.metric("🌡️ Temperature", f"{prediction['weather']['temperature']}°C")
-            with wcol3:
-                st.metric("💨 Wind Speed", f"{prediction['weather']['wind_speed']} km/h")
-            with wcol4:
-                st.metric("🔽 Pressure", f"{prediction['weather']['pressure']} mb")
-            with wcol5:
-                st.metric("☁️ Cloud Cover", f"{prediction['weather']['cloud_cover']}%")
-           
-            st.metric("🌧️ Precipitation", f"{prediction['weather']['precipitation']} mm")
+        st.metric("🌧️ Precipitation", f"{prediction['weather']['precipitation']} mm")
+   
+    st.divider()
+   
+    # Historical data
+    st.subheader(f"📜 Historical Cloudburst Records - {selected_state}")
+    historical_df = get_cloudburst_history(selected_state)
+   
+    if not historical_df.empty:
+        # Display statistics
+        stats_col1, stats_col2, stats_col3 = st.columns(3)
        
-        st.divider()
+        with stats_col1:
+            st.metric("Average Rainfall", f"{prediction['avg_rainfall']} mm")
+        with stats_col2:
+            st.metric("Maximum Rainfall", f"{prediction['max_rainfall']} mm")
+        with stats_col3:
+            st.metric("Avg Casualties", f"{prediction['avg_casualties']}")
        
-        # Historical data
-        st.subheader(f"📜 Historical Cloudburst Records - {selected_state}")
-        historical_df = get_cloudburst_history(selected_state)
+        # Display table
+        display_df = historical_df[['date', 'district', 'rainfall_mm', 'duration_hours', 'casualties', 'severity']]
+        st.dataframe(display_df, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG)
        
-        if not historical_df.empty:
-            # Display statistics
-            stats_col1, stats_col2, stats_col3 = st.columns(3)
-           
-            with stats_col1:
-                st.metric("Average Rainfall", f"{prediction['avg_rainfall']} mm")
-            with stats_col2:
-                st.metric("Maximum Rainfall", f"{prediction['max_rainfall']} mm")
-            with stats_col3:
-                st.metric("Avg Casualties", f"{prediction['avg_casualties']}")
-           
-            # Display table
-            display_df = historical_df[['date', 'district', 'rainfall_mm', 'duration_hours', 'casualties', 'severity']]
-            st.dataframe(display_df, use_container_width=True, hide_index=True)
-           
-            # Visualization
-            st.subheader("📈 Rainfall Trend Analysis")
-            fig = px.bar(
-                historical_df,
-                x='date',
-                y='rainfall_mm',
-                color='severity',
-                title=f'Cloudburst Rainfall History - {selected_state}',
-                labels={'rainfall_mm': 'Rainfall (mm)', 'date': 'Date'},
-                color_discrete_map={'High': '#ff4444', 'Medium': '#ffaa00'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No historical data available for this state.")
-   
-    elif predict_btn:
-        st.warning("⚠️ Please select a state first!")
+        # Visualization
+        st.subheader("📈 Rainfall Trend Analysis")
+        window = chart_window(historical_df, 'home_chart_window')
+        render_time_series(('history_bar', selected_state), historical_df, 'rainfall_mm', window, lambda data: px.bar(
+            data,
+            x='date',
+            y='rainfall_mm',
+            color='severity',
+            title=f'Cloudburst Rainfall History - {selected_state}',
+            labels={'rainfall_mm': 'Rainfall (mm)', 'date': 'Date'},
+            color_discrete_map={'High': '#ff4444', 'Medium': '#ffaa00'}
+        ))
+    else:
+        st.info("No historical data available for this state.")
 
-elif page == "💬 Chatbot Assistant":
-    st.header("🤖 Cloudburst Information Chatbot")
-    st.markdown("Ask me anything about cloudbursts in India! I can answer questions about rainfall, casualties, state comparisons, and more.")
-    
-    # Display chat history
+@st.fragment
+@profiled_fragment
+def chat_panel():
+    """Chat history, input and quick queries; a new message reruns only this panel"""
+    # Display chat history: older turns collapse into a paginated, text-first view
+    chat_history = st.session_state.chat_history
+    older_turns = chat_history[:-config.CHAT_RECENT_TURNS] if config.CHAT_RECENT_TURNS else chat_history
+    recent_turns = chat_history[len(older_turns):]
+   
     chat_container = st.container()
     with chat_container:
-        for chat in st.session_state.chat_history:
-            with st.chat_message("user"):
-                st.write(chat['user'])
-            with st.chat_message("assistant"):
-                st.markdown(chat['bot'])
-                if chat.get('data') is not None and not chat['data'].empty:
-                    st.dataframe(chat['data'], use_container_width=True, hide_index=True)
+        if older_turns:
+            with st.expander(f"🕘 Earlier messages ({len(older_turns)})"):
+                page_count = -(-len(older_turns) // config.CHAT_PAGE_SIZE)
+                hcol1, hcol2 = st.columns([1, 3])
+                with hcol1:
+                    history_page = st.number_input("Page", min_value=1, max_value=page_count, value=page_count)
+                with hcol2:
+                    show_old_tables = st.checkbox("Show result tables")
+                page_start = (history_page - 1) * config.CHAT_PAGE_SIZE
+                for chat in older_turns[page_start:page_start + config.CHAT_PAGE_SIZE]:
+                    render_chat_turn(chat, show_data=show_old_tables)
+       
+        for chat in recent_turns:
+            render_chat_turn(chat)
     
-    # Chat input
-    user_input = st.chat_input("Ask me about cloudbursts... (e.g., 'Which state has the most cloudbursts?')")
-    
-    if user_input:
-        # Process the query
-        response, data = process_chatbot_query(user_input)
-        
-        # Add to chat history
-        st.session_state.chat_history.append({
-            'user': user_input,
-            'bot': response,
-            'data': data
-        })
-        
-        # Rerun to display new message
-        st.rerun()
+    # Chat input; callbacks run before the panel reruns, so new turns show up without an extra rerun
+    st.chat_input(
+        "Ask me about cloudbursts... (e.g., 'Which state has the most cloudbursts?')",
+        key='chat_input',
+        on_submit=lambda: ask_chatbot(st.session_state.chat_input)
+    )
     
     # Quick query buttons
     st.markdown("---")
     st.markdown("**💡 Quick Queries:**")
-    qcol1, qcol2, qcol3, qcol4 = st.columns(4)
-    
-    with qcol1:
-        if st.button("🏆 Most Cloudbursts", use_container_width=True):
-            response, data = process_chatbot_query("Which state has the most cloudbursts?")
-            st.session_state.chat_history.append({
-                'user': "Which state has the most cloudbursts?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol2:
-        if st.button("✅ Safest States", use_container_width=True):
-            response, data = process_chatbot_query("Which are the safest states?")
-            st.session_state.chat_history.append({
-                'user': "Which are the safest states?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol3:
-        if st.button("💔 Most Dangerous", use_container_width=True):
-            response, data = process_chatbot_query("Which is the most dangerous state?")
-            st.session_state.chat_history.append({
-                'user': "Which is the most dangerous state?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol4:
-        if st.button("📅 Monthly Trends", use_container_width=True):
-            response, data = process_chatbot_query("When do cloudbursts occur most?")
-            st.session_state.chat_history.append({
-                'user': "When do cloudbursts occur most?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    qcol5, qcol6, qcol7, qcol8 = st.columns(4)
-    
-    with qcol5:
-        if st.button("🛡️ No Cloudbursts", use_container_width=True):
-            response, data = process_chatbot_query("Which states have no cloudbursts?")
-            st.session_state.chat_history.append({
-                'user': "Which states have no cloudbursts?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol6:
-        if st.button("🏘️ Top Districts", use_container_width=True):
-            response, data = process_chatbot_query("Which districts have the most cloudbursts?")
-            st.session_state.chat_history.append({
-                'user': "Which districts have the most cloudbursts?",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol7:
-        if st.button("📊 Year Comparison", use_container_width=True):
-            response, data = process_chatbot_query("Compare 2023 and 2024")
-            st.session_state.chat_history.append({
-                'user': "Compare 2023 and 2024",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
-    
-    with qcol8:
-        if st.button("📈 Trends", use_container_width=True):
-            response, data = process_chatbot_query("Show me cloudburst trends")
-            st.session_state.chat_history.append({
-                'user': "Show me cloudburst trends",
-                'bot': response,
-                'data': data
-            })
-            st.rerun()
+    quick_answers = get_quick_answers()
+    quick_cols = st.columns(4)
+    for idx, (label, query) in enumerate(QUICK_QUERIES):
+        with quick_cols[idx % 4]:
+            st.button(label, use_container_width=True, on_click=ask_chatbot, args=(query, quick_answers[query]))
     
     # Clear chat button
-    if st.button("🗑️ Clear Chat History"):
-        st.session_state.chat_history = []
-        st.rerun()
+    st.button("🗑️ Clear Chat History", on_click=clear_chat_history)
 
-elif page == "📊 Database Explorer":
-    st.header("Complete Cloudburst Database (2023-2024)")
+@st.fragment
+@profiled_fragment
+def explorer_records():
+    """All Records tab: filters rerun only this tab"""
+    st.subheader("Complete Cloudburst History")
+    all_data = get_cloudburst_history()
    
-    # Tabs for different views
-    tab1, tab2, tab3 = st.tabs(["📋 All Records", "🗺️ State-wise Analysis", "📊 Statistics"])
+    # Filters
+    fcol1, fcol2, fcol3 = st.columns(3)
+    with fcol1:
+        filter_state = st.multiselect("Filter by State", all_data['state'].unique().tolist())
+    with fcol2:
+        filter_severity = st.multiselect("Filter by Severity", all_data['severity'].dropna().unique().tolist())
+    with fcol3:
+        filter_year = st.multiselect("Filter by Year", [str(year) for year in get_trends().years])
    
-    with tab1:
-        st.subheader("Complete Cloudburst History")
-        all_data = get_cloudburst_history()
-       
-        # Filters
-        fcol1, fcol2, fcol3 = st.columns(3)
-        with fcol1:
-            filter_state = st.multiselect("Filter by State", all_data['state'].unique())
-        with fcol2:
-            filter_severity = st.multiselect("Filter by Severity", all_data['severity'].unique())
-        with fcol3:
-            filter_year = st.multiselect("Filter by Year", ['2023', '2024'])
-       
-        # Apply filters
-        filtered_data = all_data.copy()
-        if filter_state:
-            filtered_data = filtered_data[filtered_data['state'].isin(filter_state)]
-        if filter_severity:
-            filtered_data = filtered_data[filtered_data['severity'].isin(filter_severity)]
-        if filter_year:
-            filtered_data = filtered_data[filtered_data['date'].str.startswith(tuple(filter_year))]
-       
-        st.dataframe(filtered_data, use_container_width=True, hide_index=True)
-       
-        # Download button
-        csv = filtered_data.to_csv(index=False)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name="cloudburst_data.csv",
-            mime="text/csv"
-        )
+    # Apply filters (each step builds a new frame; the shared all_data is never modified)
+    filtered_data = all_data
+    if filter_state:
+        filtered_data = filtered_data[filtered_data['state'].isin(filter_state)]
+    if filter_severity:
+        filtered_data = filtered_data[filtered_data['severity'].isin(filter_severity)]
+    if filter_year:
+        filtered_data = filtered_data[filtered_data['date'].dt.year.isin([int(year) for year in filter_year])]
    
-    with tab2:
-        st.subheader("State-wise Cloudburst Analysis")
-       
-        state_stats = execute_query("""
-            SELECT
-                state,
-                COUNT(*) as total_incidents,
-                ROUND(AVG(rainfall_mm), 2) as avg_rainfall,
-                ROUND(MAX(rainfall_mm), 2) as max_rainfall,
-                SUM(casualties) as total_casualties
-            FROM cloudburst_history
-            GROUP BY state
-            ORDER BY total_incidents DESC
-        """)
-       
-        st.dataframe(state_stats, use_container_width=True, hide_index=True)
-       
-        # Visualization
-        fig1 = px.bar(
-            state_stats,
-            x='state',
-            y='total_incidents',
-            title='Total Cloudburst Incidents by State',
-            labels={'total_incidents': 'Number of Incidents', 'state': 'State'}
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-       
-        fig2 = px.bar(
-            state_stats,
-            x='state',
-            y='avg_rainfall',
-            title='Average Rainfall by State (mm)',
-            labels={'avg_rainfall': 'Average Rainfall (mm)', 'state': 'State'}
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+    st.dataframe(filtered_data, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG)
    
-    with tab3:
-        st.subheader("Overall Statistics")
-       
-        total_incidents = execute_query("SELECT COUNT(*) as count FROM cloudburst_history")
-        total_casualties = execute_query("SELECT SUM(casualties) as total FROM cloudburst_history")
-        avg_rainfall = execute_query("SELECT AVG(rainfall_mm) as avg FROM cloudburst_history")
-       
-        mcol1, mcol2, mcol3 = st.columns(3)
-        with mcol1:
-            st.metric("Total Incidents", total_incidents['count'].iloc[0])
-        with mcol2:
-            st.metric("Total Casualties", int(total_casualties['total'].iloc[0]))
-        with mcol3:
-            st.metric("Avg Rainfall", f"{avg_rainfall['avg'].iloc[0]:.2f} mm")
-       
-        # Severity distribution
-        severity_dist = execute_query("""
-            SELECT severity, COUNT(*) as count
-            FROM cloudburst_history
-            GROUP BY severity
-        """)
-       
-        fig = px.pie(
-            severity_dist,
-            values='count',
-            names='severity',
-            title='Cloudburst Severity Distribution',
-            color='severity',
-            color_discrete_map={'High': '#ff4444', 'Medium': '#ffaa00'}
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    # Download button
+    csv = filtered_data.to_csv(index=False)
+    st.download_button(
+        label="📥 Download CSV",
+        data=csv,
+        file_name="cloudburst_data.csv",
+        mime="text/csv"
+    )
 
-elif page == "🔍 Query Information":
-    st.header("Query Weather & Rainfall Information")
-    st.markdown("Get specific information about rainfall, humidity, precipitation for any state")
+@st.fragment
+@profiled_fragment
+def explorer_state_analysis():
+    """State-wise Analysis tab"""
+    st.subheader("State-wise Cloudburst Analysis")
+   
+    state_stats = get_state_stats()
+   
+    st.dataframe(state_stats, use_container_width=True, hide_index=True)
+   
+    # Visualization
+    fig1 = px.bar(
+        state_stats,
+        x='state',
+        y='total_incidents',
+        title='Total Cloudburst Incidents by State',
+        labels={'total_incidents': 'Number of Incidents', 'state': 'State'}
+    )
+    st.plotly_chart(fig1, use_container_width=True)
+   
+    fig2 = px.bar(
+        state_stats,
+        x='state',
+        y='avg_rainfall',
+        title='Average Rainfall by State (mm)',
+        labels={'avg_rainfall': 'Average Rainfall (mm)', 'state': 'State'}
+    )
+    st.plotly_chart(fig2, use_container_width=True)
+
+@st.fragment
+@profiled_fragment
+def explorer_statistics():
+    """Statistics tab"""
+    st.subheader("Overall Statistics")
    
+    total_incidents = execute_aggregate("SELECT COUNT(*) as count FROM {cloudburst_history}")
+    total_casualties = execute_aggregate("SELECT SUM(casualties) as total FROM {cloudburst_history}")
+    avg_rainfall = execute_aggregate("SELECT AVG(rainfall_mm) as avg FROM {cloudburst_history}")
+   
+    mcol1, mcol2, mcol3 = st.columns(3)
+    with mcol1:
+        st.metric("Total Incidents", total_incidents['count'].iloc[0])
+    with mcol2:
+        st.metric("Total Casualties", int(total_casualties['total'].iloc[0]))
+    with mcol3:
+        st.metric("Avg Rainfall", f"{avg_rainfall['avg'].iloc[0]:.2f} mm")
+   
+    # Severity distribution
+    severity_dist = execute_aggregate("""
+        SELECT severity, COUNT(*) as count
+        FROM {cloudburst_history}
+        GROUP BY severity
+    """)
+   
+    fig = px.pie(
+        severity_dist,
+        values='count',
+        names='severity',
+        title='Cloudburst Severity Distribution',
+        color='severity',
+        color_discrete_map={'High': '#ff4444', 'Medium': '#ffaa00'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+@profiled_fragment
+def query_panel():
+    """Query form and results; changing a control reruns only this panel"""
     # Use all Indian states for dropdown
     states_list_query = sorted(all_indian_states)
    
@@ -1138,19 +1585,20 @@ elif page == "🔍 Query Information":
     # Optional district filter for historical data
     query_district = None
     if query_type == "Historical Rainfall":
-        districts = execute_query(
-            "SELECT DISTINCT district FROM cloudburst_history WHERE state = ? ORDER BY district",
-            (query_state,)
-        )
-        if districts.empty:
+        districts = state_districts(query_state)
+        if not districts:
             st.info("No districts available for historical rainfall in this state.")
         else:
             query_district = st.selectbox(
                 "Select District (Optional)",
-                ["All Districts"] + districts['district'].tolist()
+                ["All Districts"] + districts
             )
    
+    # Remember the executed query so the chart window slider does not clear the results
     if st.button("🔍 Execute Query", type="primary"):
+        st.session_state.executed_query = (query_type, query_state, query_district)
+   
+    if st.session_state.get('executed_query') == (query_type, query_state, query_district):
         result = query_information(query_type, query_state, query_district)
        
         if not result.empty:
@@ -1158,7 +1606,7 @@ elif page == "🔍 Query Information":
            
             if query_type == "Historical Rainfall":
                 st.subheader(f"📊 Historical Rainfall Data - {query_state}")
-                st.dataframe(result, use_container_width=True, hide_index=True)
+                st.dataframe(result, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG)
                
                 # Summary statistics
                 st.markdown("### Summary Statistics")
@@ -1171,14 +1619,14 @@ elif page == "🔍 Query Information":
                     st.metric("Max Rainfall", f"{result['rainfall_mm'].max():.2f} mm")
                
                 # Chart
-                fig = px.line(
-                    result,
+                window = chart_window(result, 'rainfall_chart_window')
+                render_time_series(('rainfall_line', query_state, query_district), result, 'rainfall_mm', window, lambda data: px.line(
+                    data,
                     x='date',
                     y='rainfall_mm',
                     title='Rainfall Trend Over Time',
                     markers=True
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                ))
            
             elif query_type == "Current Weather":
                 st.subheader(f"🌤️ Current Weather Conditions - {query_state}")
@@ -1195,28 +1643,177 @@ elif page == "🔍 Query Information":
                     st.metric("☁️ Cloud Cover", f"{weather_data['cloud_cover']}%")
                     st.metric("🌧️ Precipitation", f"{weather_data['precipitation']} mm")
                
-                st.info(f"📅 Data as of: {weather_data['date']}")
+                st.info(f"📅 Data as of: {format_date(weather_data['date'])}")
            
             elif query_type == "Precipitation Trends":
                 st.subheader(f"🌧️ Precipitation Trends - {query_state}")
-                st.dataframe(result, use_container_width=True, hide_index=True)
+                st.dataframe(result, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG)
                
-                fig = px.area(
-                    result,
+                window = chart_window(result, 'precipitation_chart_window')
+                render_time_series(('precipitation_area', query_state), result, 'precipitation', window, lambda data: px.area(
+                    data,
                     x='date',
                     y='precipitation',
                     title='Precipitation Trend Analysis',
                     labels={'precipitation': 'Precipitation (mm)', 'date': 'Date'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                ))
         else:
             st.warning("No data found for the selected query.")
 
+def reset_search_page():
+    st.session_state.search_page = 1
+
+@st.fragment
+@profiled_fragment
+def search_panel():
+    """Full-text event search with paged results; typing or paging reruns only this panel"""
+    text = st.text_input(
+        "🔎 Search events", key='search_text', on_change=reset_search_page,
+        placeholder="District, state, severity or year, e.g. chamoli high 2023"
+    )
+    if not text.strip():
+        return
+    page = st.session_state.get('search_page', 1)
+    result, total = find_events(text, page)
+    if not total:
+        st.info("No events match this search.")
+        return
+    pages = page_count(total)
+    if page > pages:
+        # Fewer matches than when this page was picked (the data changed)
+        page = st.session_state.search_page = pages
+        result, total = find_events(text, page)
+    first = (page - 1) * config.SEARCH_PAGE_SIZE + 1
+    st.caption(f"{total} matching events, best match first; showing {first}–{first + len(result) - 1}")
+    st.dataframe(result.drop(columns=['id', 'score']), use_container_width=True, hide_index=True,
+                 column_config=DATE_COLUMN_CONFIG)
+    if pages > 1:
+        st.number_input("Page", min_value=1, max_value=pages, key='search_page')
+
+# Main UI
+st.title("🌧️ Cloudburst Prediction System - India")
+data_span = get_trends().span()
+st.markdown(f"### Real-time Weather Analysis & Historical Data ({data_span})")
+
+# Sidebar
+st.sidebar.header("Navigation")
+profiler = get_memory_profiler()
+pages = ["🏠 Home & Prediction", "💬 Chatbot Assistant", "📊 Database Explorer", "🔍 Query Information"]
+if profiler is not None:
+    pages.append("🧠 Memory Profile")
+page = st.sidebar.radio("Select Page", pages)
+
+if profiler is not None:
+    if 'profile_session' not in st.session_state:
+        st.session_state.profile_session = uuid.uuid4().hex[:8]
+    profiler.begin_render(st.session_state.profile_session, page)
+
+if page == "🏠 Home & Prediction":
+    st.header("Cloudburst Risk Assessment")
+   
+    # Use all Indian states for dropdown
+    states_list = sorted(all_indian_states)
+   
+    col1, col2 = st.columns([2, 1])
+   
+    with col1:
+        selected_state = st.selectbox(
+            "Select State",
+            [""] + states_list,
+            help="Choose a state to check cloudburst risk"
+        )
+   
+    with col2:
+        predict_btn = st.button("🔮 Predict Risk", type="primary", use_container_width=True)
+   
+    # Remember the requested prediction so widget interactions below keep it on screen
+    wait = prediction_wait() if predict_btn and selected_state else 0
+    if wait:
+        st.warning(f"⏳ Too many prediction requests from this session; please try again in {int(wait) + 1}s.")
+    elif predict_btn:
+        st.session_state.predicted_state = selected_state
+   
+    if selected_state and st.session_state.get('predicted_state') == selected_state:
+        prediction_panel(selected_state)
+   
+    elif predict_btn and not wait:
+        st.warning("⚠️ Please select a state first!")
+
+elif page == "💬 Chatbot Assistant":
+    st.header("🤖 Cloudburst Information Chatbot")
+    st.markdown("Ask me anything about cloudbursts in India! I can answer questions about rainfall, casualties, state comparisons, and more.")
+    
+    chat_panel()
+
+elif page == "📊 Database Explorer":
+    st.header(f"Complete Cloudburst Database ({data_span})")
+   
+    # Tabs track the selection, so only the open tab's fragment runs and loads its data
+    records_tab, states_tab, stats_tab = st.tabs(
+        ["📋 All Records", "🗺️ State-wise Analysis", "📊 Statistics"], key='explorer_tab', on_change='rerun'
+    )
+    with records_tab:
+        if records_tab.open:
+            explorer_records()
+    with states_tab:
+        if states_tab.open:
+            explorer_state_analysis()
+    with stats_tab:
+        if stats_tab.open:
+            explorer_statistics()
+
+elif page == "🔍 Query Information":
+    st.header("Query Weather & Rainfall Information")
+    st.markdown("Get specific information about rainfall, humidity, precipitation for any state")
+   
+    search_panel()
+    st.divider()
+    query_panel()
+
+elif page == "🧠 Memory Profile":
+    st.header("Memory Profile")
+    st.caption("Allocation diffs per page render (tracemalloc), result sizes per query and sizes of cached objects")
+
+    current, peak = tracemalloc.get_traced_memory()
+    pcol1, pcol2, pcol3 = st.columns(3)
+    with pcol1:
+        st.metric("Traced now", f"{current / 2**20:.1f} MB")
+    with pcol2:
+        st.metric("Traced peak", f"{peak / 2**20:.1f} MB")
+    with pcol3:
+        st.metric("Sessions seen", len(profiler.sessions))
+
+    st.subheader("Sessions")
+    st.caption("Retained session_state size after the latest render, and its growth since the first recorded one")
+    st.dataframe(profiler.session_summary(), use_container_width=True, hide_index=True)
+
+    st.subheader("Top allocating lines")
+    st.caption(
+        "Live traced memory by the project line that allocated it; growth is against the previous capture. "
+        "A capture walks every traced block and can take a minute on a large heap."
+    )
+    if st.button("📸 Capture heap snapshot"):
+        profiler.capture()
+    st.dataframe(profiler.top_allocations(), use_container_width=True, hide_index=True)
+
+    st.subheader("Query results")
+    st.dataframe(profiler.query_summary(), use_container_width=True, hide_index=True)
+
+    st.subheader("Cached objects")
+    st.dataframe(profiler.cache_summary(), use_container_width=True, hide_index=True)
+
+    if st.button("💾 Dump report"):
+        profiler.dump(config.MEMORY_REPORT_PATH)
+        st.success(f"Report written to {config.MEMORY_REPORT_PATH}")
+
 # Footer
 st.divider()
-st.markdown("""
+st.markdown(f"""
 <div style='text-align: center; color: #666;'>
-    <p>🌧️ Cloudburst Prediction System | Data Source: Historical Records 2023-2024</p>
+    <p>🌧️ Cloudburst Prediction System | Data Source: Historical Records {data_span}</p>
     <p>⚠️ This is a predictive system. Always follow official weather advisories.</p>
 </div>
 """, unsafe_allow_html=True)
+
+if profiler is not None:
+    profiler.end_render(st.session_state.profile_session, st.session_state)
@@ -0,0 +1,258 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+
+try:
+    import duckdb
+except ImportError:  # optional: only needed for CLOUDBURST_QUERY_BACKEND=duckdb
+    duckdb = None
+
+# Full-scan aggregates (GROUP BY over every event) go through an analytics
+# backend; point lookups keep using the SQLite connection directly. Aggregate
+# queries name their tables as {cloudburst_history} / {weather_data}
+# placeholders so each backend can substitute the relation it reads from.
+#
+# `python backends.py --rows 10000000` on one core: SQLite takes 4.9-15.2s
+# per aggregate, DuckDB over the Parquet snapshot 43-265ms (x43-x139), after
+# a one-off 70s export. At 1M rows it is 0.4-1.2s against 6-35ms.
+
+
+class SQLiteBackend:
+    """Runs aggregates on the SQLite connection itself"""
+
+    name = 'sqlite'
+
+    def __init__(self, conn, sources, lock=None):
+        # sources: {placeholder: callable returning the SQLite relation to read}
+        self.conn = conn
+        self.sources = sources
+        # Held from resolving the relations until they are read (see app.get_connection_lock)
+        self.lock = threading.RLock() if lock is None else lock
+
+    def relations(self, version=None):
+        return {name: source() for name, source in self.sources.items()}
+
+    def query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def execute(self, template, params=(), version=None):
+        """Fill the table placeholders in `template` and run it"""
+        with self.lock:
+            return self.query(template.format(**self.relations(version)), params)
+
+
+class DuckDBBackend(SQLiteBackend):
+    """Runs aggregates in DuckDB over Parquet snapshots of the SQLite tables.
+
+    Each source relation is exported to <snapshot_dir>/<name>_v<version>.parquet
+    the first time a query arrives at a new data version, and a DuckDB view of
+    the same name is pointed at it. Columnar scans make the GROUP BYs cheap;
+    the export itself is a full read, so it pays off when queries outnumber
+    writes between versions.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, conn, sources, lock=None, snapshot_dir=config.PARQUET_DIR, chunk_rows=500_000):
+        if duckdb is None:
+            raise RuntimeError("The duckdb backend needs the duckdb package: pip install duckdb")
+        super().__init__(conn, sources, lock)
+        self.snapshot_dir = snapshot_dir
+        self.chunk_rows = chunk_rows
+        self.db = duckdb.connect()
+        self.version = None
+        self._lock = threading.Lock()
+
+    def _export(self, name, relation, version):
+        path = os.path.join(self.snapshot_dir, f"{name}_v{version}.parquet")
+        staging = f"staging_{name}"
+        self.db.execute(f"DROP TABLE IF EXISTS {staging}")
+        chunks = pd.read_sql_query(f"SELECT * FROM {relation}", self.conn, chunksize=self.chunk_rows)
+        created = False
+        for chunk in chunks:
+            self.db.register('chunk', chunk)
+            if created:
+                self.db.execute(f"INSERT INTO {staging} SELECT * FROM chunk")
+            else:
+                self.db.execute(f"CREATE TABLE {staging} AS SELECT * FROM chunk")
+                created = True
+            self.db.unregister('chunk')
+        if not created:
+            self.db.register('chunk', pd.read_sql_query(f"SELECT * FROM {relation} LIMIT 0", self.conn))
+            self.db.execute(f"CREATE TABLE {staging} AS SELECT * FROM chunk")
+            self.db.unregister('chunk')
+        partial = path + '.tmp'
+        self.db.execute(f"COPY {staging} TO '{partial}' (FORMAT PARQUET)")
+        self.db.execute(f"DROP TABLE {staging}")
+        os.replace(partial, path)
+        self.db.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{path}')")
+        for old in os.listdir(self.snapshot_dir):
+            if old.startswith(f"{name}_v") and old != os.path.basename(path):
+                os.remove(os.path.join(self.snapshot_dir, old))
+
+    def relations(self, version=None):
+        with self._lock:
+            if version is None or version != self.version:
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+                for name, source in self.sources.items():
+                    with self.lock:
+                        self._export(name, source(), version)
+                self.version = version
+        return {name: name for name in self.sources}
+
+    def execute(self, template, params=(), version=None):
+        # Only the export reads SQLite; the DuckDB query runs without the connection lock
+        return self.query(template.format(**self.relations(version)), params)
+
+    def query(self, sql, params=()):
+        # A cursor per call: DuckDB connections must not be shared across threads
+        result = self.db.cursor().execute(sql, list(params))
+        # SUM over integers is HUGEINT in DuckDB and arrives as float64
+        hugeint = [column[0] for column in result.description if str(column[1]) == 'HUGEINT']
+        frame = result.df()
+        for col in hugeint:
+            if not frame[col].isna().any():
+                frame[col] = frame[col].astype('int64')
+        return frame
+
+
+class ShardedBackend:
+    """Runs aggregates on every per-state shard in parallel and merges the partial results.
+
+    Built from a sharding.ShardSet rather than a connection, so it is not in
+    BACKENDS; the shards are queried live, so `version` is not needed.
+    """
+
+    name = 'sharded'
+
+    def __init__(self, shards):
+        self.shards = shards
+
+    def execute(self, template, params=(), version=None):
+        return self.shards.aggregate(template, params)
+
+
+BACKENDS = {
+    SQLiteBackend.name: SQLiteBackend,
+    DuckDBBackend.name: DuckDBBackend,
+}
+
+
+def create_backend(name, conn, sources, lock=None):
+    """Instantiate an analytics backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown query backend '{name}'; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](conn, sources, lock)
+
+
+# Benchmark: the aggregate shapes the Explorer and chatbot run, on synthetic rows
+
+BENCHMARK_QUERIES = {
+    'incidents by state': "SELECT state, COUNT(*) as total_incidents FROM {cloudburst_history} GROUP BY state ORDER BY total_incidents DESC",
+    'state summary': """
+        SELECT state, COUNT(*) as total_incidents, ROUND(AVG(rainfall_mm), 2) as avg_rainfall,
+               ROUND(MAX(rainfall_mm), 2) as max_rainfall, SUM(casualties) as total_casualties
+        FROM {cloudburst_history} GROUP BY state ORDER BY total_incidents DESC
+    """,
+    'incidents by month': "SELECT month, COUNT(*) as incidents FROM {cloudburst_history} GROUP BY month ORDER BY incidents DESC",
+    'top districts': """
+        SELECT state, district, COUNT(*) as incidents FROM {cloudburst_history}
+        GROUP BY state, district ORDER BY incidents DESC LIMIT 10
+    """,
+    'yearly totals': """
+        SELECT year, COUNT(*) as incidents, SUM(casualties) as casualties, ROUND(AVG(rainfall_mm), 2) as avg_rainfall
+        FROM {cloudburst_history} GROUP BY year ORDER BY year
+    """,
+}
+
+
+def build_synthetic_history(path, rows, chunk_rows=1_000_000, seed=0):
+    """Write `rows` synthetic cloudburst events into a fresh SQLite file"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE cloudburst_history (
+            id INTEGER PRIMARY KEY, state TEXT, district TEXT, date TEXT,
+            rainfall_mm REAL, duration_hours REAL, casualties INTEGER, severity TEXT,
+            year INTEGER, month INTEGER
+        )
+    ''')
+    states = np.array([f"State {i:02d}" for i in range(36)])
+    severities = np.array(['Low', 'Medium', 'High'])
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        days = rng.integers(0, 365 * 20, n)
+        dates = (np.datetime64('2005-01-01') + days).astype('datetime64[D]')
+        years = dates.astype('datetime64[Y]').astype(int) + 1970
+        months = dates.astype('datetime64[M]').astype(int) % 12 + 1
+        state_ids = rng.integers(0, len(states), n)
+        conn.executemany(
+            "INSERT INTO cloudburst_history VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                states[state_ids].tolist(),
+                [f"District {s}-{d}" for s, d in zip(state_ids, rng.integers(0, 40, n))],
+                dates.astype(str).tolist(),
+                np.round(rng.gamma(4, 30, n), 1).tolist(),
+                np.round(rng.uniform(0.5, 6, n), 1).tolist(),
+                rng.poisson(3, n).tolist(),
+                severities[rng.integers(0, 3, n)].tolist(),
+                years.tolist(),
+                months.tolist(),
+            )
+        )
+        conn.commit()
+    conn.close()
+
+
+def run_benchmark(rows, repeat=3):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bench.db')
+        started = time.perf_counter()
+        build_synthetic_history(path, rows)
+        print(f"Built {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        conn = sqlite3.connect(path, check_same_thread=False)
+        sources = {'cloudburst_history': lambda: 'cloudburst_history'}
+        backends = [SQLiteBackend(conn, sources)]
+        if duckdb is not None:
+            duck = DuckDBBackend(conn, sources, snapshot_dir=os.path.join(workdir, 'parquet'))
+            started = time.perf_counter()
+            duck.relations(version=1)
+            print(f"Exported Parquet snapshot in {time.perf_counter() - started:.1f}s")
+            backends.append(duck)
+        else:
+            print("duckdb is not installed; timing SQLite only")
+
+        print(f"{'query':<22}" + ''.join(f"{backend.name:>12}" for backend in backends))
+        for label, template in BENCHMARK_QUERIES.items():
+            timings = []
+            for backend in backends:
+                best = float('inf')
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    backend.execute(template, version=1)
+                    best = min(best, time.perf_counter() - started)
+                timings.append(best)
+            speedup = f"  x{timings[0] / timings[-1]:.1f}" if len(timings) > 1 else ''
+            print(f"{label:<22}" + ''.join(f"{t * 1000:>10.0f}ms" for t in timings) + speedup)
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GROUP BY aggregates on SQLite and DuckDB")
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per query; the best is reported")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond maxsize"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class VersionedValue:
+    """Value rebuilt once per data version; concurrent callers share a single build"""
+
+    def __init__(self, build):
+        self._build = build
+        self._version = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        if self._version == version:
+            return self._value
+        with self._lock:
+            if self._version != version:
+                self._value = self._build()
+                self._version = version
+            return self._value
+
+
+class _Flight:
+    """One in-progress computation that other callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """Values kept for `ttl` seconds per key; concurrent misses on a key share a single computation.
+
+    A failed computation is not cached: its waiters get the exception and the
+    next call computes again.
+    """
+
+    def __init__(self, ttl, maxsize=256):
+        self.ttl = ttl
+        self.computations = 0
+        self._values = LRUCache(maxsize)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        entry = self._values.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def get(self, key, compute):
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry[1]
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.computations += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+            self._values.put(key, (time.monotonic(), flight.value))
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+
+class TokenBucket:
+    """Rate limit of `rate` calls per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Spend one call; returns 0 if it is allowed, else the seconds until one will be"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, threshold):
+    """Row positions kept by largest-triangle-three-buckets downsampling.
+
+    x must be sorted ascending. The first and last points are always kept;
+    every bucket in between contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        kept[i + 1] = previous
+    return kept
+
+
+def minmax_indices(y, buckets):
+    """Row positions of each bucket's minimum and maximum, in order"""
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(np.append(edges, n)))
+    order = np.lexsort((y, bucket_ids))
+    first = np.searchsorted(bucket_ids[order], np.arange(buckets), side='left')
+    last = np.searchsorted(bucket_ids[order], np.arange(buckets), side='right') - 1
+    return np.unique(np.concatenate([order[first], order[last]]))
+
+
+def downsample(df, x, y, max_points, window=None, method='lttb'):
+    """Rows of df (sorted by x) inside the half-open window [start, end), reduced to at most max_points"""
+    data = df.sort_values(x)
+    if window is not None:
+        start, end = window
+        data = data[(data[x] >= pd.Timestamp(start)) & (data[x] < pd.Timestamp(end))]
+    if len(data) <= max_points:
+        return data
+    if method == 'minmax':
+        positions = minmax_indices(data[y].to_numpy(), max_points // 2)
+    else:
+        xs = data[x].to_numpy(dtype='datetime64[ns]').astype('int64')
+        positions = lttb_indices(xs, data[y].to_numpy(), max_points)
+    return data.iloc[positions]
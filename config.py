@@ -0,0 +1,96 @@
+import os
+
+# Runtime configuration, overridable through environment variables
+
+DB_PATH = os.environ.get('CLOUDBURST_DB_PATH', 'cloudburst_data.db')
+
+# Risk scorer used by predict_cloudburst: "rules" or "logistic"
+SCORER = os.environ.get('CLOUDBURST_SCORER', 'rules')
+MODEL_PATH = os.environ.get('CLOUDBURST_MODEL_PATH', os.path.join('models', 'logistic.npz'))
+
+# Chatbot session memory: turns kept per session, turns rendered in full,
+# page size for older turns and shared result tables kept per process
+CHAT_HISTORY_LIMIT = int(os.environ.get('CLOUDBURST_CHAT_HISTORY_LIMIT', 100))
+CHAT_RECENT_TURNS = int(os.environ.get('CLOUDBURST_CHAT_RECENT_TURNS', 5))
+CHAT_PAGE_SIZE = int(os.environ.get('CLOUDBURST_CHAT_PAGE_SIZE', 10))
+CHAT_RESULT_CACHE_SIZE = int(os.environ.get('CLOUDBURST_CHAT_RESULT_CACHE_SIZE', 256))
+
+# Live weather feed ingestion (see ingestor.py)
+FEED_CONFIG_PATH = os.environ.get('CLOUDBURST_FEED_CONFIG', 'feeds.json')
+FEED_INTERVAL_SECONDS = int(os.environ.get('CLOUDBURST_FEED_INTERVAL', 300))
+FEED_CONCURRENCY = int(os.environ.get('CLOUDBURST_FEED_CONCURRENCY', 200))
+FEED_BATCH_SIZE = int(os.environ.get('CLOUDBURST_FEED_BATCH_SIZE', 1000))
+
+# Time-series charts: points sent to the browser per chart and cached figure specs
+CHART_MAX_POINTS = int(os.environ.get('CLOUDBURST_CHART_MAX_POINTS', 2000))
+FIGURE_CACHE_SIZE = int(os.environ.get('CLOUDBURST_FIGURE_CACHE_SIZE', 128))
+
+# Time partitioning and retention (see partitions.py)
+ARCHIVE_DIR = os.environ.get('CLOUDBURST_ARCHIVE_DIR', 'archive')
+HOT_YEARS = int(os.environ.get('CLOUDBURST_HOT_YEARS', 1))
+WEATHER_RAW_RETENTION_DAYS = int(os.environ.get('CLOUDBURST_WEATHER_RAW_RETENTION_DAYS', 90))
+
+# Analytics backend for full-scan aggregates: 'sqlite' or 'duckdb' (optional dependency)
+QUERY_BACKEND = os.environ.get('CLOUDBURST_QUERY_BACKEND', 'sqlite')
+PARQUET_DIR = os.environ.get('CLOUDBURST_PARQUET_DIR', 'parquet')
+
+# Opt-in memory profiling: adds a Memory Profile page (see profiling.py)
+MEMORY_PROFILING = os.environ.get('CLOUDBURST_MEMORY_PROFILING', '0') == '1'
+MEMORY_PROFILE_FRAMES = int(os.environ.get('CLOUDBURST_MEMORY_PROFILE_FRAMES', 10))
+MEMORY_REPORT_PATH = os.environ.get('CLOUDBURST_MEMORY_REPORT_PATH', 'memory_profile.json')
+
+# Bulk loads: rows per upsert transaction (see loading.py)
+LOAD_BATCH_SIZE = int(os.environ.get('CLOUDBURST_LOAD_BATCH_SIZE', 5000))
+
+# Streaming nowcast anomaly detection (see nowcast.py)
+NOWCAST_ALPHA = float(os.environ.get('CLOUDBURST_NOWCAST_ALPHA', 0.1))
+NOWCAST_Z_THRESHOLD = float(os.environ.get('CLOUDBURST_NOWCAST_Z_THRESHOLD', 3.0))
+NOWCAST_PRESSURE_FALL = float(os.environ.get('CLOUDBURST_NOWCAST_PRESSURE_FALL', 1.0))
+NOWCAST_WARMUP = int(os.environ.get('CLOUDBURST_NOWCAST_WARMUP', 5))
+NOWCAST_MIN_GAP_HOURS = float(os.environ.get('CLOUDBURST_NOWCAST_MIN_GAP_HOURS', 0.5))
+NOWCAST_MAX_GAP_HOURS = float(os.environ.get('CLOUDBURST_NOWCAST_MAX_GAP_HOURS', 6))
+# Days before the newest observation the detector reads; keep it below
+# WEATHER_RAW_RETENTION_DAYS so the daily rows of a rollup are never read
+NOWCAST_SEED_DAYS = int(os.environ.get('CLOUDBURST_NOWCAST_SEED_DAYS', 7))
+
+# Space-time hotspot clustering (see hotspots.py): events within EPS_KM and
+# EPS_DAYS of each other are neighbours; MIN_EVENTS neighbours make a core event
+HOTSPOT_EPS_KM = float(os.environ.get('CLOUDBURST_HOTSPOT_EPS_KM', 100))
+HOTSPOT_EPS_DAYS = float(os.environ.get('CLOUDBURST_HOTSPOT_EPS_DAYS', 90))
+HOTSPOT_MIN_EVENTS = int(os.environ.get('CLOUDBURST_HOTSPOT_MIN_EVENTS', 3))
+HOTSPOT_ACTIVE_DAYS = int(os.environ.get('CLOUDBURST_HOTSPOT_ACTIVE_DAYS', 365))
+
+# Monte Carlo probability bands (see uncertainty.py); 0 samples turns them off
+UNCERTAINTY_SAMPLES = int(os.environ.get('CLOUDBURST_UNCERTAINTY_SAMPLES', 0))
+UNCERTAINTY_INTERVAL = float(os.environ.get('CLOUDBURST_UNCERTAINTY_INTERVAL', 90))
+
+# Optional per-state sharding (see sharding.py): events and observations live in
+# one SQLite file per state group under SHARD_DIR; SHARD_MAP is an optional
+# {"group": ["State", ...]} JSON file replacing the default Himalayan groups
+SHARDING = os.environ.get('CLOUDBURST_SHARDING', '0') == '1'
+SHARD_DIR = os.environ.get('CLOUDBURST_SHARD_DIR', 'shards')
+SHARD_MAP_PATH = os.environ.get('CLOUDBURST_SHARD_MAP', 'shards.json')
+SHARD_WORKERS = int(os.environ.get('CLOUDBURST_SHARD_WORKERS', 8))
+
+# Chatbot query log (see querylog.py): JSON lines appended by a background
+# writer in batches; an empty path turns logging off
+QUERY_LOG_PATH = os.environ.get('CLOUDBURST_QUERY_LOG', 'query_log.jsonl')
+QUERY_LOG_BATCH_SIZE = int(os.environ.get('CLOUDBURST_QUERY_LOG_BATCH_SIZE', 100))
+QUERY_LOG_FLUSH_SECONDS = float(os.environ.get('CLOUDBURST_QUERY_LOG_FLUSH_SECONDS', 2.0))
+
+# Startup snapshot (see snapshot.py): precomputed after ingestion and served by
+# the app while the database is at the data version it was built from; an
+# empty path turns it off
+SNAPSHOT_PATH = os.environ.get('CLOUDBURST_SNAPSHOT', 'snapshot.pkl')
+
+# Full-text event search (see search.py): results per page in the Query
+# Information page and the chatbot
+SEARCH_PAGE_SIZE = int(os.environ.get('CLOUDBURST_SEARCH_PAGE_SIZE', 10))
+
+# Prediction requests: concurrent predictions for the same state and data
+# version share one computation, whose result is reused for TTL seconds; each
+# session may click Predict RATE_PER_MINUTE times a minute on average, BURST
+# times in a row (a rate of 0 turns the limit off)
+PREDICTION_TTL_SECONDS = float(os.environ.get('CLOUDBURST_PREDICTION_TTL_SECONDS', 30))
+PREDICTION_RATE_PER_MINUTE = float(os.environ.get('CLOUDBURST_PREDICTION_RATE_PER_MINUTE', 20))
+PREDICTION_BURST = int(os.environ.get('CLOUDBURST_PREDICTION_BURST', 5))
@@ -0,0 +1,89 @@
+import pandas as pd
+
+# Column typing applied to every frame loaded from the database. Low-cardinality
+# text becomes categorical, dates become datetime64 and measurements float32
+# (sensor values carry at most one decimal, well inside float32 precision).
+CATEGORICAL_COLUMNS = {'state', 'district', 'severity'}
+DATE_COLUMNS = {'date'}
+FLOAT32_COLUMNS = {
+    'rainfall_mm', 'duration_hours', 'latitude', 'longitude',
+    'humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation'
+}
+INT32_COLUMNS = {'casualties', 'epoch_day'}
+INT16_COLUMNS = {'year', 'month'}
+
+
+def typed_frame(df):
+    """Convert known columns of a query result to compact types, in place"""
+    for col in df.columns.intersection(list(CATEGORICAL_COLUMNS)):
+        df[col] = df[col].astype('category')
+    for col in df.columns.intersection(list(DATE_COLUMNS)):
+        df[col] = pd.to_datetime(df[col], format='ISO8601')
+    for col in df.columns.intersection(list(FLOAT32_COLUMNS)):
+        df[col] = df[col].astype('float32')
+    for col in df.columns.intersection(list(INT32_COLUMNS)):
+        if not df[col].isna().any():
+            df[col] = df[col].astype('int32')
+    for col in df.columns.intersection(list(INT16_COLUMNS)):
+        if not df[col].isna().any():
+            df[col] = df[col].astype('int16')
+    return df
+
+
+def format_date(value):
+    """Render a date cell as YYYY-MM-DD, adding the time of day only when there is one"""
+    if pd.isna(value):
+        return ''
+    value = pd.Timestamp(value)
+    if value == value.normalize():
+        return value.strftime('%Y-%m-%d')
+    return value.strftime('%Y-%m-%d %H:%M')
+
+
+def to_epoch_day(value):
+    """Days since 1970-01-01 for a date or 'YYYY-MM-DD...' string, matching the epoch_day column"""
+    return (pd.Timestamp(str(value)[:10]) - pd.Timestamp('1970-01-01')).days
+
+
+# Integer date parts derived from the TEXT date column. They are VIRTUAL generated
+# columns, so they always agree with `date`, and indexed, so range filters and
+# year/month grouping are index scans instead of per-row function calls.
+DATE_PART_COLUMNS = [
+    ('epoch_day', "CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER)"),
+    ('year', "CAST(substr(date, 1, 4) AS INTEGER)"),
+    ('month', "CAST(substr(date, 6, 2) AS INTEGER)"),
+]
+
+DATE_PART_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_cloudburst_history_state_epoch_day ON cloudburst_history (state, epoch_day)",
+    "CREATE INDEX IF NOT EXISTS idx_cloudburst_history_epoch_day ON cloudburst_history (epoch_day)",
+    "CREATE INDEX IF NOT EXISTS idx_cloudburst_history_year_month ON cloudburst_history (year, month)",
+    "CREATE INDEX IF NOT EXISTS idx_cloudburst_history_month ON cloudburst_history (month)",
+    "CREATE INDEX IF NOT EXISTS idx_weather_data_state_epoch_day ON weather_data (state, epoch_day, date)",
+    "CREATE INDEX IF NOT EXISTS idx_weather_data_epoch_day ON weather_data (epoch_day)",
+]
+
+# Stored columns added after the tables were first created. weather_data.station
+# is part of the observation key (see loading.NATURAL_KEYS); rows that do not
+# come from a feed station take the default.
+ADDED_COLUMNS = {
+    'weather_data': {'station': "TEXT NOT NULL DEFAULT ''"},
+}
+
+
+def ensure_date_columns(conn):
+    """Bring a database created before the date parts (or ADDED_COLUMNS) existed up to the current columns.
+
+    The app and every command-line tool call this before their first query.
+    """
+    for table in ('cloudburst_history', 'weather_data'):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+        for column, definition in ADDED_COLUMNS.get(table, {}).items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        for column, expression in DATE_PART_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER GENERATED ALWAYS AS ({expression}) VIRTUAL")
+    for statement in DATE_PART_INDEXES:
+        conn.execute(statement)
+    conn.commit()
@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from itertools import combinations
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.json')
+
+# kind is 'state', 'union_territory' or 'district'; state is the owning state/UT
+Entity = namedtuple('Entity', ['name', 'kind', 'state'])
+Match = namedtuple('Match', ['entity', 'text', 'start', 'end', 'distance'])
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+
+# Query words never corrected towards a place name
+_STOPWORDS = frozenset("""
+    a about all and any are at by can cloudburst cloudbursts compare district districts do does
+    for from has have how i in is it me most my of on or show state states tell than the there
+    to vs was were what when where which who with
+""".split())
+
+
+def tokenize(text):
+    """ASCII word tokens, preserving case; '&' is read as 'and'"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return _TOKEN_RE.findall(text.replace('&', ' and '))
+
+
+def max_distance(length):
+    """Edit distance tolerated for a phrase of the given length"""
+    if length < 5:
+        return 0
+    if length < 9:
+        return 1
+    return 2
+
+
+def _deletes(term, distance):
+    """All strings reachable from term by removing up to `distance` characters"""
+    variants = {term}
+    for k in range(1, min(distance, len(term) - 1) + 1):
+        for positions in combinations(range(len(term)), k):
+            variants.add(''.join(ch for i, ch in enumerate(term) if i not in positions))
+    return variants
+
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class Gazetteer:
+    """Prebuilt index of states, union territories, districts and aliases.
+
+    Phrases resolve through a hash of lower-cased token strings. Misspelt
+    tokens are first corrected against the phrase vocabulary with a
+    symmetric-deletion index (each word is stored under every string obtained
+    by deleting up to max_distance() characters), so a lookup is a handful of
+    dictionary probes rather than a scan over every name.
+    """
+
+    def __init__(self, entries):
+        # entries: iterable of (phrase, Entity, case_sensitive)
+        self.entities = []
+        self._exact = {}
+        self._case_sensitive = {}
+        self._vocab = set()
+        self._deletes = {}
+        self._corrections = {}
+        self.max_tokens = 1
+
+        entity_ids = {}
+        for phrase, entity, case_sensitive in entries:
+            tokens = tokenize(phrase)
+            if not tokens:
+                continue
+            if entity not in entity_ids:
+                entity_ids[entity] = len(self.entities)
+                self.entities.append(entity)
+            eid = entity_ids[entity]
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+            if case_sensitive:
+                self._case_sensitive.setdefault(tuple(tokens), set()).add(eid)
+                continue
+            lowered = [token.lower() for token in tokens]
+            # Also accept the phrase written as one word, e.g. "westbengal"
+            for key in {' '.join(lowered), ''.join(lowered)}:
+                self._exact.setdefault(key, set()).add(eid)
+            self._vocab.update(lowered)
+            self._vocab.add(''.join(lowered))
+
+        for word in self._vocab:
+            for variant in _deletes(word, max_distance(len(word))):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    @classmethod
+    def load(cls, conn=None, path=GAZETTEER_PATH, extra_states=(), history_table='cloudburst_history',
+             weather_table='weather_data', places=None):
+        """Build from the static gazetteer file plus every state/district present in the database.
+
+        `places` are (state, district or None) rows to index instead of
+        reading them from conn, e.g. from a startup snapshot.
+        """
+        entries = []
+        with open(path, encoding='utf-8') as fh:
+            static = json.load(fh)
+        for kind, group in (('state', 'states'), ('union_territory', 'union_territories')):
+            for name, info in static.get(group, {}).items():
+                region = Entity(name, kind, name)
+                entries.append((name, region, False))
+                entries.extend((alias, region, False) for alias in info.get('aliases', []))
+                entries.extend((abbr, region, True) for abbr in info.get('abbreviations', []))
+                entries.extend(
+                    (district, Entity(district, 'district', name), False)
+                    for district in info.get('districts', [])
+                )
+
+        entries.extend((state, Entity(state, 'state', state), False) for state in extra_states)
+        if places is None and conn is not None:
+            places = conn.execute(f"""
+                SELECT DISTINCT state, district FROM {history_table}
+                UNION
+                SELECT DISTINCT state, NULL FROM {weather_table}
+            """).fetchall()
+        if places is not None:
+            for state, district in places:
+                entries.append((state, Entity(state, 'state', state), False))
+                if district:
+                    entries.append((district, Entity(district, 'district', state), False))
+        return cls(entries)
+
+    def _correct(self, token):
+        """Closest vocabulary word to token and its edit distance, or (token, 0) if none is close"""
+        if token in self._vocab or token in _STOPWORDS or token.isdigit():
+            return token, 0
+        if token not in self._corrections:
+            # Operator vocabulary is small and repetitive, so memoise per token
+            if len(self._corrections) >= 50000:
+                self._corrections.clear()
+            self._corrections[token] = self._nearest(token)
+        return self._corrections[token]
+
+    def _nearest(self, token):
+        limit = max_distance(len(token))
+        if not limit:
+            return token, 0
+        best_word, best_distance = None, limit + 1
+        for variant in _deletes(token, limit):
+            for word in self._deletes.get(variant, ()):
+                distance = _edit_distance(token, word, min(limit, max_distance(len(word))))
+                if distance > limit:
+                    continue
+                if distance < best_distance or (distance == best_distance and word < best_word):
+                    best_word, best_distance = word, distance
+        if best_word is None:
+            return token, 0
+        return best_word, best_distance
+
+    def resolve(self, text):
+        """Non-overlapping entity matches in text order, preferring longer and closer matches"""
+        tokens = tokenize(text)
+        corrected, costs = zip(*(self._correct(token.lower()) for token in tokens)) if tokens else ((), ())
+
+        candidates = []
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + self.max_tokens, len(tokens)) + 1):
+                span = ' '.join(corrected[start:end])
+                eids = self._exact.get(span, set()) | self._case_sensitive.get(tuple(tokens[start:end]), set())
+                if eids:
+                    candidates.append((start, end, span, sum(costs[start:end]), eids))
+
+        # Longest covered text first, then fewest edits
+        candidates.sort(key=lambda c: (-len(c[2]), c[3], c[0]))
+        taken = set()
+        matches = []
+        for start, end, span, distance, eids in candidates:
+            if taken.intersection(range(start, end)):
+                continue
+            taken.update(range(start, end))
+            for eid in sorted(eids):
+                matches.append(Match(self.entities[eid], span, start, end, distance))
+        matches.sort(key=lambda m: (m.start, m.entity.kind == 'district'))
+        return matches
+
+    def states(self, text):
+        """States/UTs mentioned in text, explicit names first, then those implied by districts"""
+        matches = self.resolve(text)
+        explicit = [m.entity.state for m in matches if m.entity.kind != 'district']
+        implied = [m.entity.state for m in matches if m.entity.kind == 'district']
+        return list(dict.fromkeys(explicit + implied))
+
+    def districts(self, text):
+        """(district, state) pairs mentioned in text"""
+        return list(dict.fromkeys(
+            (m.entity.name, m.entity.state) for m in self.resolve(text) if m.entity.kind == 'district'
+        ))
@@ -0,0 +1,483 @@
+import argparse
+import math
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import config
+from frames import ensure_date_columns, to_epoch_day
+from partitions import PartitionManager
+from sharding import ShardSet
+
+# Space-time hotspots: DBSCAN over cloudburst events where two events are
+# neighbours when they lie within eps_km of each other *and* within eps_days.
+# Events are bucketed into a uniform grid of eps_km x eps_km x eps_days cells,
+# so a neighbour lookup only compares against the 27 surrounding cells rather
+# than every event. Assignments are persisted next to the events and kept up
+# to date incrementally: new events (higher ids) are inserted one at a time,
+# which can only promote points to core, grow clusters or merge them. Edits to
+# an event's place or date, and deletions, mark the tables stale and force a
+# full re-cluster. A cluster near a border can span states: hotspot_clusters
+# names its majority state and district, hotspot_cluster_states credits it to
+# every state with member events.
+
+NOISE = -1
+KM_PER_DEGREE = 111.2
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS hotspot_assignments (
+        event_id INTEGER PRIMARY KEY,
+        cluster_id INTEGER NOT NULL,
+        core INTEGER NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_hotspot_assignments_cluster ON hotspot_assignments(cluster_id)",
+    '''
+    CREATE TABLE IF NOT EXISTS hotspot_clusters (
+        cluster_id INTEGER PRIMARY KEY,
+        state TEXT,
+        district TEXT,
+        events INTEGER,
+        core_events INTEGER,
+        first_date TEXT,
+        last_date TEXT,
+        last_day INTEGER,
+        latitude REAL,
+        longitude REAL,
+        casualties INTEGER,
+        avg_rainfall REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS hotspot_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_event_id INTEGER NOT NULL,
+        stale INTEGER NOT NULL,
+        params TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS hotspot_cluster_states (
+        cluster_id INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        events INTEGER,
+        PRIMARY KEY (cluster_id, state)
+    )
+    ''',
+    "INSERT OR IGNORE INTO hotspot_state (id, last_event_id, stale, params) VALUES (1, 0, 1, NULL)",
+    # Clusters persisted before hotspot_cluster_states existed have no state rows yet
+    '''
+    UPDATE hotspot_state SET stale = 1
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM hotspot_clusters) AND NOT EXISTS (SELECT 1 FROM hotspot_cluster_states)
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cloudburst_history_update_hotspots
+    AFTER UPDATE OF date, latitude, longitude ON cloudburst_history
+    WHEN OLD.date IS NOT NEW.date OR OLD.latitude IS NOT NEW.latitude OR OLD.longitude IS NOT NEW.longitude
+    BEGIN
+        UPDATE hotspot_state SET stale = 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cloudburst_history_delete_hotspots
+    AFTER DELETE ON cloudburst_history
+    BEGIN
+        UPDATE hotspot_state SET stale = 1 WHERE id = 1;
+    END
+    ''',
+]
+
+_OFFSETS = [(dx, dy, dt) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dt in (-1, 0, 1)]
+
+
+def _components(n, u, v):
+    """Connected components of an undirected edge list: each node's smallest reachable node index"""
+    parent = np.arange(n)
+    while True:
+        a, b = parent[u], parent[v]
+        hook = a != b
+        if not hook.any():
+            return parent
+        u, v, a, b = u[hook], v[hook], a[hook], b[hook]
+        # Hang the larger root under the smaller, then flatten every chain
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            flat = parent[parent]
+            if (flat == parent).all():
+                break
+            parent = flat
+
+
+def ensure_hotspot_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+
+
+def project(latitude, longitude):
+    """Equirectangular kilometres; east-west scaled by each point's own latitude"""
+    latitude = np.asarray(latitude, dtype='float64')
+    longitude = np.asarray(longitude, dtype='float64')
+    return longitude * KM_PER_DEGREE * np.cos(np.radians(latitude)), latitude * KM_PER_DEGREE
+
+
+class HotspotIndex:
+    """Events on a uniform space-time grid, with their neighbour counts and DBSCAN labels"""
+
+    def __init__(self, eps_km=config.HOTSPOT_EPS_KM, eps_days=config.HOTSPOT_EPS_DAYS,
+                 min_events=config.HOTSPOT_MIN_EVENTS):
+        self.eps_km = eps_km
+        self.eps_days = eps_days
+        self.min_events = min_events
+        self.params = f"eps_km={eps_km};eps_days={eps_days};min_events={min_events}"
+        self._reset(0)
+
+    def _reset(self, capacity):
+        capacity = max(capacity, 64)
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.counts = np.zeros(capacity, dtype=np.int32)
+        self.labels = np.full(capacity, NOISE, dtype=np.int64)
+        self.core = np.zeros(capacity, dtype=bool)
+        self.grid = {}
+        self.next_cluster = 0
+
+    def _grow(self):
+        for name in ('ids', 'x', 'y', 't', 'counts', 'labels', 'core'):
+            old = getattr(self, name)
+            new = np.full(2 * len(old), NOISE, dtype=old.dtype) if name == 'labels' else np.zeros(2 * len(old), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _cell(self, i):
+        return (math.floor(self.x[i] / self.eps_km), math.floor(self.y[i] / self.eps_km),
+                math.floor(self.t[i] / self.eps_days))
+
+    def _candidates(self, cell):
+        cx, cy, ct = cell
+        found = [self.grid[key] for key in ((cx + dx, cy + dy, ct + dt) for dx, dy, dt in _OFFSETS) if key in self.grid]
+        return np.concatenate(found)
+
+    def _close(self, a, b):
+        """Elementwise (broadcasting) test that points a and b are neighbours"""
+        dx = self.x[a] - self.x[b]
+        dy = self.y[a] - self.y[b]
+        return (dx * dx + dy * dy <= self.eps_km ** 2) & (np.abs(self.t[a] - self.t[b]) <= self.eps_days)
+
+    def neighbours(self, i):
+        """Indices of every point within reach of point i, including i"""
+        candidates = self._candidates(self._cell(i))
+        return candidates[self._close(i, candidates)]
+
+    # Batch clustering
+
+    def _pairs(self, n):
+        """Grid the first n points and return every (point, neighbour) pair, self-pairs included.
+
+        Cells are encoded as single integers and sorted, so for each of the 27
+        cell offsets the matching cell of every point is found with one
+        searchsorted and the candidate pairs are expanded without Python loops.
+        """
+        cells = np.column_stack([
+            np.floor(self.x[:n] / self.eps_km), np.floor(self.y[:n] / self.eps_km), np.floor(self.t[:n] / self.eps_days)
+        ]).astype(np.int64)
+        low = cells.min(axis=0) - 1
+        span = cells.max(axis=0) - low + 2
+
+        def encode(c):
+            c = c - low
+            return (c[:, 0] * span[1] + c[:, 1]) * span[2] + c[:, 2]
+
+        order = np.argsort(encode(cells), kind='stable')
+        keys = encode(cells)[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.grid = dict(zip(map(tuple, cells[order[starts]].tolist()), np.split(order, starts[1:])))
+
+        # Shifting a cell by an offset shifts its code by a constant, so the
+        # lookups stay sorted and searchsorted walks the keys in one pass
+        sources, targets = [], []
+        for offset in _OFFSETS:
+            wanted = keys + int(encode(np.array([offset]) + low)[0])
+            lo = np.searchsorted(keys, wanted, 'left')
+            sizes = np.searchsorted(keys, wanted, 'right') - lo
+            total = int(sizes.sum())
+            if total == 0:
+                continue
+            src = np.repeat(order, sizes)
+            dst = order[np.repeat(lo - (np.cumsum(sizes) - sizes), sizes) + np.arange(total)]
+            keep = self._close(src, dst)
+            sources.append(src[keep])
+            targets.append(dst[keep])
+        return np.concatenate(sources), np.concatenate(targets)
+
+    def fit(self, ids, latitude, longitude, days, labels=None):
+        """Cluster all events at once; `labels` restores previously persisted clusters instead"""
+        n = len(ids)
+        self._reset(n)
+        self.size = n
+        if n == 0:
+            return
+        self.ids[:n] = ids
+        self.x[:n], self.y[:n] = project(latitude, longitude)
+        self.t[:n] = days
+
+        src, dst = self._pairs(n)
+        self.counts[:n] = np.bincount(src, minlength=n)
+        core = self.counts[:n] >= self.min_events
+        self.core[:n] = core
+
+        if labels is not None:
+            self.labels[:n] = labels
+        else:
+            linked = core[src] & core[dst]
+            root = _components(n, src[linked], dst[linked])
+            # Border events join the cluster of (any) core neighbour
+            reached = ~core[src] & core[dst]
+            root[src[reached]] = root[dst[reached]]
+            clustered = core.copy()
+            clustered[src[reached]] = True
+            roots, numbered = np.unique(root[clustered], return_inverse=True)
+            self.labels[np.flatnonzero(clustered)] = numbered.ravel()
+        self.next_cluster = int(self.labels[:n].max()) + 1
+
+    # Incremental insertion
+
+    def insert(self, event_id, latitude, longitude, day):
+        """Add one event; returns (indices whose label changed, cluster ids merged away)"""
+        if self.size == len(self.ids):
+            self._grow()
+        i = self.size
+        self.size += 1
+        self.ids[i] = event_id
+        x, y = project(latitude, longitude)
+        self.x[i], self.y[i], self.t[i] = float(x), float(y), day
+        cell = self._cell(i)
+        self.grid[cell] = np.append(self.grid.get(cell, np.empty(0, dtype=np.int64)), i)
+
+        reach = self.neighbours(i)
+        self.counts[reach] += 1
+        self.counts[i] = len(reach)
+        promoted = reach[(self.counts[reach] >= self.min_events) & ~self.core[reach]]
+        self.core[promoted] = True
+
+        changed, merged = {i}, set()
+        for point in promoted.tolist():
+            around = self.neighbours(point)
+            clusters = set(self.labels[around[self.core[around]]].tolist()) - {NOISE}
+            if not clusters:
+                target = self.next_cluster
+                self.next_cluster += 1
+            else:
+                target = min(clusters)
+                for other in clusters - {target}:
+                    members = np.flatnonzero(self.labels[:self.size] == other)
+                    self.labels[members] = target
+                    changed.update(members.tolist())
+                    merged.add(other)
+            absorb = around[(self.labels[around] == NOISE) | (around == point)]
+            self.labels[absorb] = target
+            changed.update(absorb.tolist())
+
+        if self.labels[i] == NOISE:
+            cores = reach[self.core[reach]]
+            if len(cores):
+                self.labels[i] = self.labels[cores[0]]
+        return changed, merged
+
+    def frame(self, indices=None):
+        indices = np.arange(self.size) if indices is None else np.asarray(sorted(indices), dtype=np.int64)
+        return pd.DataFrame({
+            'event_id': self.ids[indices],
+            'cluster_id': self.labels[indices],
+            'core': self.core[indices].astype(np.int64),
+        })
+
+
+class HotspotEngine:
+    """Keeps hotspot_assignments / hotspot_clusters in step with the events table"""
+
+    def __init__(self, conn, relation=lambda: 'cloudburst_history', index=None, incremental=True):
+        # relation: callable returning the table or view to read events from.
+        # incremental=False re-clusters on every refresh, for event sources whose
+        # ids do not grow monotonically (per-state shards) or lack the stale triggers
+        self.conn = conn
+        self.relation = relation
+        self.incremental = incremental
+        self.index = index or HotspotIndex()
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def _events(self, after_id=0, until_id=None):
+        query = f"""
+            SELECT id, latitude, longitude, epoch_day FROM {self.relation()}
+            WHERE id > ? AND latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+        params = [after_id]
+        if until_id is not None:
+            query += " AND id <= ?"
+            params.append(until_id)
+        return pd.read_sql_query(query + " ORDER BY id", self.conn, params=params)
+
+    def refresh(self):
+        """Bring the persisted clusters up to date; returns a short summary of what was done"""
+        with self._lock:
+            last_id, stale, params = self.conn.execute(
+                "SELECT last_event_id, stale, params FROM hotspot_state WHERE id = 1"
+            ).fetchone()
+            if stale or params != self.index.params or not self.incremental:
+                return self._rebuild()
+            if not self.loaded:
+                self._restore(last_id)
+            return self._catch_up(last_id)
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        events = self._events()
+        self.index.fit(events['id'], events['latitude'], events['longitude'], events['epoch_day'])
+        last_id = int(events['id'].max()) if len(events) else self._max_id()
+        with self.conn:
+            self.conn.execute("DELETE FROM hotspot_assignments")
+            self.conn.execute("DELETE FROM hotspot_clusters")
+            self.conn.execute("DELETE FROM hotspot_cluster_states")
+            self._write(self.index.frame(), set(self.index.labels[:self.index.size].tolist()), set())
+            self._mark(last_id)
+        self.loaded = True
+        return {'mode': 'rebuild', 'events': len(events), 'seconds': time.perf_counter() - started}
+
+    def _restore(self, last_id):
+        """Rebuild the in-memory grid for events already clustered, taking labels from the tables"""
+        events = self._events(until_id=last_id)
+        stored = pd.read_sql_query("SELECT event_id, cluster_id FROM hotspot_assignments", self.conn)
+        labels = events[['id']].merge(stored, left_on='id', right_on='event_id', how='left')['cluster_id']
+        self.index.fit(events['id'], events['latitude'], events['longitude'], events['epoch_day'],
+                       labels=labels.fillna(NOISE).to_numpy(dtype=np.int64))
+        self.loaded = True
+
+    def _catch_up(self, last_id):
+        started = time.perf_counter()
+        events = self._events(after_id=last_id)
+        if events.empty:
+            return {'mode': 'current', 'events': 0, 'seconds': time.perf_counter() - started}
+        changed, merged = set(), set()
+        for event_id, latitude, longitude, day in events.itertuples(index=False):
+            points, gone = self.index.insert(event_id, latitude, longitude, day)
+            changed |= points
+            merged |= gone
+        touched = set(self.index.labels[sorted(changed)].tolist())
+        with self.conn:
+            self._write(self.index.frame(changed), touched, merged)
+            self._mark(int(events['id'].max()))
+        return {'mode': 'incremental', 'events': len(events), 'seconds': time.perf_counter() - started}
+
+    def _write(self, assignments, touched, merged):
+        clustered = assignments[assignments['cluster_id'] != NOISE]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO hotspot_assignments (event_id, cluster_id, core) VALUES (?, ?, ?)",
+            clustered.itertuples(index=False, name=None)
+        )
+        stale = sorted((touched | merged) - {NOISE})
+        self.conn.executemany("DELETE FROM hotspot_clusters WHERE cluster_id = ?", [(c,) for c in stale])
+        self.conn.executemany("DELETE FROM hotspot_cluster_states WHERE cluster_id = ?", [(c,) for c in stale])
+        if not stale:
+            return
+        placeholders = ', '.join('?' * len(stale))
+        self.conn.execute(f"""
+            INSERT INTO hotspot_clusters
+            SELECT a.cluster_id,
+                   (SELECT h2.state FROM hotspot_assignments a2 JOIN {self.relation()} h2 ON h2.id = a2.event_id
+                    WHERE a2.cluster_id = a.cluster_id GROUP BY h2.state ORDER BY COUNT(*) DESC, h2.state LIMIT 1),
+                   (SELECT h2.district FROM hotspot_assignments a2 JOIN {self.relation()} h2 ON h2.id = a2.event_id
+                    WHERE a2.cluster_id = a.cluster_id GROUP BY h2.district ORDER BY COUNT(*) DESC, h2.district LIMIT 1),
+                   COUNT(*), SUM(a.core), MIN(h.date), MAX(h.date), MAX(h.epoch_day),
+                   AVG(h.latitude), AVG(h.longitude), SUM(h.casualties), AVG(h.rainfall_mm)
+            FROM hotspot_assignments a JOIN {self.relation()} h ON h.id = a.event_id
+            WHERE a.cluster_id IN ({placeholders})
+            GROUP BY a.cluster_id
+        """, stale)
+        self.conn.execute(f"""
+            INSERT INTO hotspot_cluster_states
+            SELECT a.cluster_id, h.state, COUNT(*)
+            FROM hotspot_assignments a JOIN {self.relation()} h ON h.id = a.event_id
+            WHERE a.cluster_id IN ({placeholders}) AND h.state IS NOT NULL
+            GROUP BY a.cluster_id, h.state
+        """, stale)
+
+    def _mark(self, last_id):
+        self.conn.execute(
+            "UPDATE hotspot_state SET last_event_id = ?, stale = 0, params = ? WHERE id = 1",
+            (last_id, self.index.params)
+        )
+
+    def _max_id(self):
+        return self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.relation()}").fetchone()[0]
+
+
+def top_hotspots(conn, state=None, limit=10):
+    """Largest persisted clusters, optionally those with events in one state.
+
+    `states` lists every state a cluster spans, most events first.
+    """
+    where, params = (
+        "WHERE c.cluster_id IN (SELECT cluster_id FROM hotspot_cluster_states WHERE state = ?)", (state, limit)
+    ) if state else ("", (limit,))
+    return pd.read_sql_query(f"""
+        SELECT c.cluster_id, c.state, c.district, c.events, c.first_date, c.last_date, c.casualties,
+               ROUND(c.avg_rainfall, 1) as avg_rainfall, ROUND(c.latitude, 2) as latitude, ROUND(c.longitude, 2) as longitude,
+               (SELECT group_concat(state, ' / ') FROM (
+                    SELECT state FROM hotspot_cluster_states s WHERE s.cluster_id = c.cluster_id ORDER BY events DESC, state
+               )) as states
+        FROM hotspot_clusters c {where}
+        ORDER BY c.events DESC, c.casualties DESC
+        LIMIT ?
+    """, conn, params=params)
+
+
+def hotspot_features(conn, active_days=config.HOTSPOT_ACTIVE_DAYS, today=None):
+    """Per-state counts of the clusters with events in the state; a cluster is active if it had an event within active_days of today"""
+    today = to_epoch_day(today or date.today())
+    return pd.read_sql_query("""
+        SELECT s.state,
+               COUNT(*) as hotspot_clusters,
+               SUM(c.last_day >= ?) as active_hotspots,
+               SUM(s.events) as hotspot_events
+        FROM hotspot_cluster_states s JOIN hotspot_clusters c ON c.cluster_id = s.cluster_id
+        GROUP BY s.state
+    """, conn, params=(today - active_days,)).set_index('state')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster cloudburst events into space-time hotspots")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="Re-cluster every event from scratch")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_date_columns(conn)
+        ensure_hotspot_schema(conn)
+        if args.rebuild:
+            conn.execute("UPDATE hotspot_state SET stale = 1 WHERE id = 1")
+        if config.SHARDING:
+            shards = ShardSet()
+            engine = HotspotEngine(conn, lambda: shards.relation(conn, 'cloudburst_history'), incremental=False)
+        else:
+            partitions = PartitionManager(conn, config.ARCHIVE_DIR)
+            engine = HotspotEngine(conn, lambda: partitions.relation('cloudburst_history'))
+        result = engine.refresh()
+        print(f"{result['mode']}: {result['events']} events in {result['seconds']:.2f}s")
+        print(top_hotspots(conn, limit=args.top).to_string(index=False))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+import config
+from loading import ensure_natural_keys, upsert_batch
+from nowcast import AnomalyDetector
+from sharding import ShardSet
+
+log = logging.getLogger(__name__)
+
+OBSERVATION_FIELDS = ['humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation']
+
+# Writer wake-up marker when no observation arrived within the flush interval
+_IDLE = object()
+
+# HTTP statuses worth retrying; anything else is treated as a permanent failure
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class PermanentFeedError(Exception):
+    """Endpoint answered, but with something retrying will not fix"""
+
+
+def load_feed_config(path):
+    """Read the feed definition: base_url, path template and the station list.
+
+    Example:
+        {"base_url": "http://127.0.0.1:8765",
+         "path": "/stations/{id}/latest",
+         "stations": [{"id": "UK-0001", "state": "Uttarakhand", "district": "Chamoli"}]}
+    """
+    with open(path, encoding='utf-8') as fh:
+        feed = json.load(fh)
+    feed.setdefault('path', '/stations/{id}/latest')
+    for station in feed['stations']:
+        missing = {'id', 'state', 'district'} - station.keys()
+        if missing:
+            raise ValueError(f"Station entry {station!r} is missing {sorted(missing)}")
+    return feed
+
+
+def parse_observation(station, payload):
+    """Turn an endpoint payload into a weather_data row"""
+    try:
+        values = [float(payload[field]) for field in OBSERVATION_FIELDS]
+        observed = payload.get('timestamp')
+        if observed:
+            observed = datetime.fromisoformat(observed.replace('Z', '+00:00'))
+            if observed.tzinfo is not None:
+                observed = observed.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            observed = datetime.now(timezone.utc).replace(tzinfo=None)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise PermanentFeedError(f"malformed payload from {station['id']}: {e}") from e
+    return (station['state'], station['district'], station['id'], observed.strftime('%Y-%m-%d %H:%M:%S'), *values)
+
+
+def _upsert_observations(conn, rows):
+    return upsert_batch(conn, 'weather_data', rows)
+
+
+class WeatherIngestor:
+    """Polls every station concurrently and writes observations in batched transactions.
+
+    Fetchers share one keep-alive connection pool bounded by `concurrency` and
+    hand rows to a queue; a single writer drains it into executemany() batches,
+    so the database sees one transaction per `batch_size` observations rather
+    than one per observation. With `shards`, each batch is split by state and
+    every shard gets its own transaction.
+    """
+
+    def __init__(self, db_path, feed, concurrency=config.FEED_CONCURRENCY, batch_size=config.FEED_BATCH_SIZE,
+                 retries=3, backoff=0.5, timeout=10.0, flush_interval=1.0, shards=None):
+        self.db_path = db_path
+        self.shards = shards
+        self.base_url = feed['base_url'].rstrip('/')
+        self.path = feed['path']
+        self.stations = feed['stations']
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        # Streaming nowcast state, fed every written batch
+        self.detector = AnomalyDetector()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            ensure_natural_keys(self._conn)
+        return self._conn
+
+    def write_batch(self, rows):
+        """Upsert rows in one transaction (per shard); returns how many rows were stored new or changed"""
+        if self.shards is not None:
+            return self.shards.write(rows, _upsert_observations)
+        return _upsert_observations(self._connect(), rows)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def fetch(self, session, station):
+        """Fetch one station, retrying transient failures with jittered exponential backoff"""
+        url = self.base_url + self.path.format(id=station['id'])
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return parse_observation(station, await response.json(content_type=None))
+                    if response.status not in RETRY_STATUSES:
+                        raise PermanentFeedError(f"{url} returned HTTP {response.status}")
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+                error = repr(e)
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        raise ConnectionError(f"{url} failed after {self.retries + 1} attempts: {error}")
+
+    async def _writer(self, queue, stats):
+        """Drain the queue, flushing whenever a batch fills up or the feed goes quiet"""
+        batch = []
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                row = _IDLE
+            if row is not None and row is not _IDLE:
+                batch.append(row)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                stats['written'] += await asyncio.to_thread(self.write_batch, batch)
+                stats['batches'] += 1
+                stats['anomalies'] += self.detector.update_rows(batch)
+                batch = []
+            if row is None:
+                return
+
+    async def poll_once(self):
+        """Poll every station once; returns counters for the cycle"""
+        stats = {'stations': len(self.stations), 'fetched': 0, 'failed': 0, 'written': 0, 'batches': 0, 'anomalies': 0}
+        started = time.perf_counter()
+        queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        writer = asyncio.create_task(self._writer(queue, stats))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async def poll_station(station):
+                async with semaphore:
+                    try:
+                        row = await self.fetch(session, station)
+                    except (ConnectionError, PermanentFeedError) as e:
+                        stats['failed'] += 1
+                        log.warning("%s", e)
+                        return
+                stats['fetched'] += 1
+                await queue.put(row)
+
+            await asyncio.gather(*(poll_station(station) for station in self.stations))
+
+        await queue.put(None)
+        await writer
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        return stats
+
+    async def run(self, interval=config.FEED_INTERVAL_SECONDS, cycles=None):
+        """Poll on a fixed schedule; each cycle starts `interval` seconds after the previous one"""
+        completed = 0
+        try:
+            while cycles is None or completed < cycles:
+                started = time.monotonic()
+                stats = await self.poll_once()
+                log.info("ingest cycle: %s", stats)
+                completed += 1
+                if cycles is None or completed < cycles:
+                    await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+        finally:
+            self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll live weather station feeds into weather_data")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--config', default=config.FEED_CONFIG_PATH, help="Feed definition JSON")
+    parser.add_argument('--interval', type=int, default=config.FEED_INTERVAL_SECONDS)
+    parser.add_argument('--concurrency', type=int, default=config.FEED_CONCURRENCY)
+    parser.add_argument('--batch-size', type=int, default=config.FEED_BATCH_SIZE)
+    parser.add_argument('--once', action='store_true', help="Run a single polling cycle and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    shards = None
+    if config.SHARDING:
+        shards = ShardSet()
+        source = sqlite3.connect(args.db)
+        try:
+            ensure_natural_keys(source)
+            shards.ensure_schema(source)
+        finally:
+            source.close()
+    ingestor = WeatherIngestor(
+        args.db, load_feed_config(args.config), concurrency=args.concurrency, batch_size=args.batch_size,
+        shards=shards
+    )
+    asyncio.run(ingestor.run(interval=args.interval, cycles=1 if args.once else None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import sqlite3
+from itertools import islice
+
+import config
+from frames import ensure_date_columns
+from hotspots import HotspotEngine, ensure_hotspot_schema
+from partitions import PartitionManager
+from search import ensure_search_schema
+from sharding import ShardSet
+from snapshot import rebuild
+
+# Natural keys: one event per district and date, one weather observation per
+# station and timestamp (weather_data.date holds the observation time; a
+# district has several stations). Loads upsert against them, so re-running a
+# load or re-ingesting an overlapping feed window updates rows in place
+# instead of duplicating them. Keys that a retention run already moved into a
+# year's archive file are updated there (see update_archived).
+NATURAL_KEYS = {
+    'cloudburst_history': ('state', 'district', 'date'),
+    'weather_data': ('state', 'district', 'station', 'date'),
+}
+
+# Values for key columns a source does not provide. weather_data.station was
+# added to the tables later (frames.ADDED_COLUMNS); rows that do not come from
+# a feed station (seed data, CSV loads without the column, daily rollups) take
+# the default.
+KEY_DEFAULTS = {'station': ''}
+
+VALUE_COLUMNS = {
+    'cloudburst_history': (
+        'rainfall_mm', 'duration_hours', 'casualties', 'severity', 'latitude', 'longitude'
+    ),
+    'weather_data': (
+        'humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation'
+    ),
+}
+
+
+def upsert_sql(table):
+    """INSERT ... ON CONFLICT DO UPDATE for `table`, taking rows in key-then-value column order.
+
+    Unchanged rows are left alone (the WHERE clause), so replaying identical
+    data neither rewrites pages nor fires the data_version triggers.
+    """
+    keys, values = NATURAL_KEYS[table], VALUE_COLUMNS[table]
+    columns = keys + values
+    return f'''
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+        ON CONFLICT ({', '.join(keys)}) DO UPDATE SET
+            {', '.join(f"{col} = excluded.{col}" for col in values)}
+        WHERE ({', '.join(f"{table}.{col}" for col in values)})
+              IS NOT ({', '.join(f"excluded.{col}" for col in values)})
+    '''
+
+
+UPSERT_EVENT = upsert_sql('cloudburst_history')
+UPSERT_OBSERVATION = upsert_sql('weather_data')
+
+
+def ensure_natural_keys(conn):
+    """Create the UNIQUE natural-key indexes, first collapsing duplicates to their most recent row.
+
+    Missing key columns are added and an index over an older key is rebuilt.
+    """
+    ensure_date_columns(conn)
+    for table, keys in NATURAL_KEYS.items():
+        index = f"ux_{table}_natural_key"
+        indexed = tuple(row[2] for row in conn.execute(f"PRAGMA index_info({index})"))
+        if indexed == keys:
+            continue
+        if indexed:
+            conn.execute(f"DROP INDEX {index}")
+        key_list = ', '.join(keys)
+        conn.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key_list})")
+        conn.execute(f"CREATE UNIQUE INDEX {index} ON {table} ({key_list})")
+    conn.commit()
+
+
+def latest_per_key(table, rows):
+    """Rows of one batch with only the last row for each natural key.
+
+    Upserting a key twice in one executemany() counts both writes in its
+    rowcount although one row is stored; without repeats the rowcount is the
+    number of rows inserted or changed.
+    """
+    width = len(NATURAL_KEYS[table])
+    return list({tuple(row[:width]): row for row in rows}.values())
+
+
+def update_archived(conn, table, rows, partitions):
+    """Update the rows whose natural key is stored in an archive there; returns (the other rows, rows changed).
+
+    One transaction per archived year the rows fall in. Rows with new keys
+    are left for the hot tables whatever their year; the next retention run
+    moves them to their archive.
+    """
+    keys, values = NATURAL_KEYS[table], VALUE_COLUMNS[table]
+    by_year = {}
+    for row in rows:
+        by_year.setdefault(int(str(row[keys.index('date')])[:4]), []).append(row)
+    match = ' AND '.join(f"{col} = ?" for col in keys)
+    update = f'''
+        UPDATE {{alias}}.{table} SET {', '.join(f"{col} = ?" for col in values)}
+        WHERE {match} AND ({', '.join(values)}) IS NOT ({', '.join('?' * len(values))})
+    '''
+    remaining, changed = [], 0
+    for year, year_rows in by_year.items():
+        alias = partitions.attached_archive(year)
+        if alias is None:
+            remaining += year_rows
+            continue
+        archived = []
+        for row in year_rows:
+            found = conn.execute(f"SELECT 1 FROM {alias}.{table} WHERE {match}", row[:len(keys)]).fetchone()
+            (archived if found else remaining).append(row)
+        with conn:
+            changed += conn.executemany(update.format(alias=alias), [
+                (*row[len(keys):], *row[:len(keys)], *row[len(keys):]) for row in archived
+            ]).rowcount
+    return remaining, changed
+
+
+def upsert_batch(conn, table, rows, partitions=None):
+    """Upsert one batch of rows; returns how many rows were inserted or changed.
+
+    The hot tables take the batch in one transaction. Given the database's
+    PartitionManager, keys already archived are updated in their archive
+    instead of being inserted into the hot tables a second time.
+    """
+    rows = latest_per_key(table, rows)
+    changed = 0
+    if partitions is not None:
+        rows, changed = update_archived(conn, table, rows, partitions)
+    with conn:
+        return changed + conn.executemany(upsert_sql(table), rows).rowcount
+
+
+def upsert_rows(conn, table, rows, batch_size=config.LOAD_BATCH_SIZE, partitions=None):
+    """Upsert rows (key columns then value columns) in batches of one transaction each.
+
+    Returns the number of rows inserted or changed. Pass `partitions` for a
+    database that may have archived years (see upsert_batch).
+    """
+    changed = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            changed += upsert_batch(conn, table, batch, partitions)
+            batch = []
+    if batch:
+        changed += upsert_batch(conn, table, batch, partitions)
+    return changed
+
+
+def read_csv_rows(path, table):
+    """Rows from a CSV with a header naming (at least) the table's key and value columns"""
+    columns = NATURAL_KEYS[table] + VALUE_COLUMNS[table]
+    with open(path, newline='', encoding='utf-8') as fh:
+        for record in csv.DictReader(fh):
+            yield tuple(record.get(col) or KEY_DEFAULTS.get(col) for col in columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idempotently bulk-load events or observations from CSV")
+    parser.add_argument('csv', help="CSV file with a header row of column names")
+    parser.add_argument('--table', choices=sorted(NATURAL_KEYS), default='cloudburst_history')
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--batch-size', type=int, default=config.LOAD_BATCH_SIZE)
+    parser.add_argument('--snapshot', action='store_true', help="Rebuild the app's startup snapshot afterwards")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        ensure_natural_keys(conn)
+        ensure_hotspot_schema(conn)
+        ensure_search_schema(conn)
+        rows = read_csv_rows(args.csv, args.table)
+        if config.SHARDING:
+            # Each shard gets its own batches, so a load only write-locks the shards it touches
+            shards = ShardSet()
+            shards.ensure_schema(conn)
+            changed = 0
+            for chunk in iter(lambda: list(islice(rows, args.batch_size)), []):
+                changed += shards.write(chunk, lambda shard, batch: upsert_rows(shard, args.table, batch, args.batch_size))
+            engine = HotspotEngine(conn, lambda: shards.relation(conn, 'cloudburst_history'), incremental=False)
+        else:
+            partitions = PartitionManager(conn, config.ARCHIVE_DIR)
+            changed = upsert_rows(conn, args.table, rows, args.batch_size, partitions)
+            engine = HotspotEngine(conn, lambda: partitions.relation('cloudburst_history'))
+        print(f"{changed} rows inserted or updated in {args.table}")
+        if args.table == 'cloudburst_history' and changed:
+            result = engine.refresh()
+            print(f"Hotspots: {result['mode']} update over {result['events']} events")
+    finally:
+        conn.close()
+    if args.snapshot and config.SNAPSHOT_PATH:
+        path = config.SNAPSHOT_PATH
+        snapshot = rebuild(args.db, path)
+        print(f"Startup snapshot of data version {snapshot['version']} written to {path}")
+
+
+if __name__ == '__main__':
+    main()
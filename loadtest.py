@@ -0,0 +1,239 @@
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Drives simulated operator sessions through every page with Streamlit's
+# AppTest. Each session is a full script run in this process, sharing the
+# st.cache_resource objects (connection, caches, scorer) exactly as sessions
+# on one `streamlit run` server do, so latency and memory under N concurrent
+# sessions approximate a server with N busy operators. AppTest itself is not
+# built for concurrent use: a session finishing while another runs can print a
+# "Runtime hasn't been created!" traceback from its teardown, which does not
+# affect the measured run.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+HOME = "🏠 Home & Prediction"
+CHATBOT = "💬 Chatbot Assistant"
+EXPLORER = "📊 Database Explorer"
+QUERY = "🔍 Query Information"
+
+STATES = ["Uttarakhand", "Himachal Pradesh", "Kerala", "West Bengal", "Assam", "Maharashtra"]
+FREE_TEXT = [
+    "Tell me about {state}",
+    "risk in {state}",
+    "total casualties in {state}",
+    "which districts in {state} had the most cloudbursts",
+    "show me recent cloudbursts",
+    "average rainfall",
+]
+QUERY_TYPES = ["Historical Rainfall", "Current Weather", "Precipitation Trends"]
+
+# Every AppTest run recompiles the script, and concurrent ast.parse calls hit
+# a CPython 3.11 race ("AST constructor recursion depth mismatch"). Real
+# servers compile once, so parsing is serialised here rather than measured.
+if sys.version_info < (3, 12):
+    _parse = ast.parse
+    _parse_lock = threading.Lock()
+
+    def _serialised_parse(*args, **kwargs):
+        with _parse_lock:
+            return _parse(*args, **kwargs)
+
+    ast.parse = _serialised_parse
+
+
+def _by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+class Session:
+    """One simulated operator; every interaction is a timed script rerun"""
+
+    def __init__(self, app_path, timeout, rng, record):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.rng = rng
+        self.record = record
+
+    def step(self, name, action):
+        started = time.perf_counter()
+        try:
+            action()
+            error = bool(self.at.exception)
+        except Exception:
+            error = True
+        self.record(name, time.perf_counter() - started, error)
+        if error:
+            # Rerun from scratch so the session can carry on with the next page
+            self.at.run()
+
+    def goto(self, page):
+        self.step(f"open {page[2:]}", lambda: self.at.sidebar.radio[0].set_value(page).run())
+
+    def home(self):
+        self.goto(HOME)
+        state = self.rng.choice(STATES)
+        self.step('select state', lambda: self.at.selectbox[0].set_value(state).run())
+        self.step('predict', lambda: _by_label(self.at.button, "🔮 Predict Risk").click().run())
+
+    def chatbot(self):
+        self.goto(CHATBOT)
+        quick = [b for b in self.at.button if b.label != "🗑️ Clear Chat History"]
+        button = self.rng.choice(quick)
+        self.step('quick query', lambda: button.click().run())
+        text = self.rng.choice(FREE_TEXT).format(state=self.rng.choice(STATES))
+        self.step('free text', lambda: self.at.chat_input[0].set_value(text).run())
+
+    def explorer(self):
+        self.goto(EXPLORER)
+        states = _by_label(self.at.multiselect, "Filter by State")
+        picked = self.rng.sample(list(states.options), min(2, len(states.options)))
+        self.step('filter states', lambda: states.set_value(picked).run())
+        severity = _by_label(self.at.multiselect, "Filter by Severity")
+        self.step('filter severity', lambda: severity.set_value(list(severity.options)[:1]).run())
+
+    def query(self):
+        self.goto(QUERY)
+        self.at.selectbox[0].set_value(self.rng.choice(QUERY_TYPES))
+        self.at.selectbox[1].set_value(self.rng.choice(STATES))
+        self.step('execute query', lambda: _by_label(self.at.button, "🔍 Execute Query").click().run())
+
+    def run(self, iterations):
+        self.step('initial load', self.at.run)
+        for _ in range(iterations):
+            for page in (self.home, self.chatbot, self.explorer, self.query):
+                try:
+                    page()
+                except LookupError:
+                    # A widget the page should render is missing
+                    self.record(f"{page.__name__} widgets missing", 0.0, True)
+                    self.at.run()
+
+
+class MemorySampler(threading.Thread):
+    """Samples this process's resident set size until stopped"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def rss():
+        # Linux: resident pages from /proc; elsewhere fall back to the peak counter
+        try:
+            with open('/proc/self/statm') as fh:
+                return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, self.rss())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, self.rss())
+
+
+def run_level(concurrency, iterations, app_path, timeout, seed):
+    """Run `concurrency` sessions at once; returns the per-interaction timings and memory"""
+    samples = []
+    lock = threading.Lock()
+
+    def record(name, elapsed, error):
+        with lock:
+            samples.append((name, elapsed, error))
+
+    def worker(i):
+        Session(app_path, timeout, random.Random(seed * 1000 + i), record).run(iterations)
+
+    sampler = MemorySampler()
+    rss_before = sampler.rss()
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+    sampler.stop()
+
+    by_name = {}
+    for name, elapsed, error in samples:
+        by_name.setdefault(name, []).append(elapsed)
+    return {
+        'concurrency': concurrency,
+        'interactions': len(samples),
+        'errors': sum(error for _, _, error in samples),
+        'throughput': len(samples) / wall,
+        'rss_before_mb': rss_before / 2**20,
+        'rss_peak_mb': sampler.peak / 2**20,
+        'latency_ms': {
+            name: {
+                'p50': float(np.percentile(times, 50)) * 1000,
+                'p95': float(np.percentile(times, 95)) * 1000,
+                'p99': float(np.percentile(times, 99)) * 1000,
+                'n': len(times),
+            }
+            for name, times in by_name.items()
+        },
+    }
+
+
+def print_level(result):
+    print(
+        f"\n== {result['concurrency']} sessions: {result['interactions']} interactions, "
+        f"{result['errors']} errors, {result['throughput']:.1f}/s, "
+        f"RSS {result['rss_before_mb']:.0f} -> peak {result['rss_peak_mb']:.0f} MB"
+    )
+    print(f"{'interaction':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in result['latency_ms'].items():
+        print(f"{name:<28}{stats['n']:>6}{stats['p50']:>10.0f}{stats['p95']:>10.0f}{stats['p99']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with concurrent simulated sessions")
+    parser.add_argument('--concurrency', default='1,2,4,8,16',
+                        help="Comma-separated session counts, run one level after another")
+    parser.add_argument('--iterations', type=int, default=2, help="Passes through all four pages per session")
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds allowed per script run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="Also write the capacity curve as JSON")
+    args = parser.parse_args()
+
+    # The app opens its database and data files relative to its own directory
+    os.chdir(os.path.dirname(os.path.abspath(args.app)))
+    results = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        result = run_level(concurrency, args.iterations, os.path.abspath(args.app), args.timeout, args.seed)
+        print_level(result)
+        results.append(result)
+
+    print(f"\n{'sessions':>8}{'worst p95 ms':>14}{'interactions/s':>16}{'peak RSS MB':>13}")
+    for result in results:
+        worst_p95 = max(stats['p95'] for stats in result['latency_ms'].values())
+        print(f"{result['concurrency']:>8}{worst_p95:>14.0f}{result['throughput']:>16.1f}{result['rss_peak_mb']:>13.0f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=1)
+
+
+if __name__ == '__main__':
+    main()
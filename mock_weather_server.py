@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import random
+import zlib
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from gazetteer import GAZETTEER_PATH
+
+# Local stand-in for the station feed so the ingestor can be exercised offline.
+# Every station serves a slowly drifting synthetic observation at
+# GET /stations/{id}/latest; failures and latency can be injected.
+
+
+def station_observation(station_id, now):
+    """Deterministic per-station baseline plus a time-varying perturbation"""
+    rng = random.Random(zlib.crc32(f"{station_id}:{int(now.timestamp()) // 300}".encode()))
+    base = random.Random(zlib.crc32(station_id.encode()))
+    return {
+        'station': station_id,
+        'timestamp': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'humidity': round(min(100, base.uniform(50, 90) + rng.gauss(0, 5)), 1),
+        'temperature': round(base.uniform(18, 33) + rng.gauss(0, 1.5), 1),
+        'wind_speed': round(max(0, base.uniform(4, 16) + rng.gauss(0, 2)), 1),
+        'pressure': round(base.uniform(978, 1004) + rng.gauss(0, 2), 1),
+        'cloud_cover': round(min(100, max(0, base.uniform(40, 92) + rng.gauss(0, 8))), 1),
+        'precipitation': round(max(0, base.uniform(0, 50) + rng.gauss(0, 10)), 1),
+    }
+
+
+def create_app(fail_rate=0.0, latency_ms=0):
+    async def latest(request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if fail_rate and random.random() < fail_rate:
+            return web.json_response({'error': 'temporarily unavailable'}, status=503)
+        now = datetime.now(timezone.utc)
+        return web.json_response(station_observation(request.match_info['station_id'], now))
+
+    app = web.Application()
+    app.router.add_get('/stations/{station_id}/latest', latest)
+    return app
+
+
+def write_feed_config(path, count, base_url):
+    """Spread `count` stations across the districts listed in the gazetteer"""
+    with open(GAZETTEER_PATH, encoding='utf-8') as fh:
+        static = json.load(fh)
+    districts = [
+        (state, district)
+        for state, info in static['states'].items()
+        for district in info['districts']
+    ]
+    stations = []
+    for i in range(count):
+        state, district = districts[i % len(districts)]
+        stations.append({'id': f"STN-{i:05d}", 'state': state, 'district': district})
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'base_url': base_url, 'path': '/stations/{id}/latest', 'stations': stations}, fh, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic weather station observations")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--write-config', metavar='PATH', help="Write a feed config for this server and exit")
+    parser.add_argument('--stations', type=int, default=5000, help="Station count for --write-config")
+    args = parser.parse_args()
+
+    if args.write_config:
+        write_feed_config(args.write_config, args.stations, f"http://{args.host}:{args.port}")
+        return
+    web.run_app(create_app(args.fail_rate, args.latency_ms), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import math
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import config
+from frames import ensure_date_columns
+
+# Anomaly flags, one bit each
+PRECIPITATION_SPIKE = 1
+PRESSURE_DROP = 2
+PRESSURE_FALLING_FAST = 4
+
+FLAG_NAMES = {
+    PRECIPITATION_SPIKE: 'precipitation spike',
+    PRESSURE_DROP: 'pressure drop',
+    PRESSURE_FALLING_FAST: 'pressure falling fast',
+}
+
+# Per-state columns merged into the scorer's feature frame
+NOWCAST_COLUMNS = ['anomaly_flags', 'precipitation_z', 'pressure_z', 'pressure_tendency']
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_hours(value):
+    """Hours since the epoch for a 'YYYY-MM-DD[ HH:MM:SS]' timestamp"""
+    return (datetime.fromisoformat(str(value)) - _EPOCH).total_seconds() / 3600
+
+
+class AnomalyDetector:
+    """Streaming per-station anomaly state, updated in O(1) per observation.
+
+    Every (state, district, station) gets a slot in a set of parallel NumPy
+    arrays holding exponentially weighted mean and variance of precipitation
+    and pressure, and the reading the pressure tendency is measured from.
+    Each observation is scored against the state *before* it is folded in: a
+    precipitation z-score above `z_threshold` is a spike, a pressure z-score
+    below -z_threshold a drop, and a pressure tendency steeper than
+    `pressure_fall` hPa/hour a fast fall. The tendency is taken over at least
+    `min_gap_hours` (readings closer to the reference keep the previous
+    tendency, so sensor noise over seconds is not read as hPa/hour) and at
+    most `max_gap_hours` (longer gaps reset it). Stations need `warmup`
+    readings before z-scores count. Only observations from the last
+    `seed_days` before the newest one are read (see catch_up).
+    """
+
+    def __init__(self, alpha=config.NOWCAST_ALPHA, z_threshold=config.NOWCAST_Z_THRESHOLD,
+                 pressure_fall=config.NOWCAST_PRESSURE_FALL, warmup=config.NOWCAST_WARMUP,
+                 min_gap_hours=config.NOWCAST_MIN_GAP_HOURS, max_gap_hours=config.NOWCAST_MAX_GAP_HOURS,
+                 seed_days=config.NOWCAST_SEED_DAYS, capacity=256):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.pressure_fall = pressure_fall
+        self.warmup = warmup
+        self.min_gap_hours = min_gap_hours
+        self.max_gap_hours = max_gap_hours
+        self.seed_days = seed_days
+        self.index = {}
+        self.regions = []
+        # Highest weather_data id folded in, per source database
+        self.last_ids = {}
+        self.clock = -math.inf
+        self._lock = threading.Lock()
+        self._catch_up_lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.count = np.zeros(capacity, dtype=np.int32)
+        self.last_time = np.full(capacity, np.nan, dtype=np.float64)
+        self.reference_time = np.full(capacity, np.nan, dtype=np.float64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        # EW moments and the tendency reference reading; float32 keeps 8 arrays x 4 bytes per station
+        for name in ('precipitation_mean', 'precipitation_var', 'pressure_mean', 'pressure_var',
+                     'reference_pressure', 'precipitation_z', 'pressure_z', 'pressure_tendency'):
+            setattr(self, name, np.zeros(capacity, dtype=np.float32))
+        self.reference_pressure[:] = np.nan
+
+    def _grow(self):
+        arrays = {name: value for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+        self._allocate(2 * len(self.count))
+        for name, old in arrays.items():
+            getattr(self, name)[:len(old)] = old
+
+    def _slot(self, state, district, station):
+        key = (state, district, station)
+        slot = self.index.get(key)
+        if slot is None:
+            slot = len(self.regions)
+            if slot == len(self.count):
+                self._grow()
+            self.index[key] = slot
+            self.regions.append(key)
+        return slot
+
+    def _observe(self, slot, value, mean, var):
+        """Score value against the EW moments of `slot`, then fold it in; returns the z-score"""
+        delta = value - mean[slot]
+        std = math.sqrt(var[slot])
+        z = delta / std if self.count[slot] >= self.warmup and std > 0 else 0.0
+        if self.count[slot] == 0:
+            mean[slot] = value
+        else:
+            mean[slot] += self.alpha * delta
+            var[slot] = (1 - self.alpha) * (var[slot] + self.alpha * delta * delta)
+        return z
+
+    def update(self, state, district, station, hours, precipitation, pressure):
+        """Fold in one observation (time in epoch hours); returns its anomaly flags"""
+        with self._lock:
+            slot = self._slot(state, district, station)
+            flags = 0
+            if precipitation is not None:
+                z = self._observe(slot, precipitation, self.precipitation_mean, self.precipitation_var)
+                self.precipitation_z[slot] = z
+                if z > self.z_threshold:
+                    flags |= PRECIPITATION_SPIKE
+            if pressure is not None:
+                z = self._observe(slot, pressure, self.pressure_mean, self.pressure_var)
+                self.pressure_z[slot] = z
+                if z < -self.z_threshold:
+                    flags |= PRESSURE_DROP
+                gap = hours - self.reference_time[slot]
+                if np.isnan(self.reference_pressure[slot]) or not 0 <= gap <= self.max_gap_hours:
+                    # First reading, a long silence or an older reading: start measuring afresh
+                    self.pressure_tendency[slot] = 0.0
+                    self.reference_pressure[slot] = pressure
+                    self.reference_time[slot] = hours
+                elif gap >= self.min_gap_hours:
+                    self.pressure_tendency[slot] = (pressure - self.reference_pressure[slot]) / gap
+                    self.reference_pressure[slot] = pressure
+                    self.reference_time[slot] = hours
+                if self.pressure_tendency[slot] <= -self.pressure_fall:
+                    flags |= PRESSURE_FALLING_FAST
+            self.count[slot] += 1
+            self.last_time[slot] = hours
+            self.flags[slot] = flags
+            self.clock = max(self.clock, hours)
+            return flags
+
+    def update_rows(self, rows):
+        """Fold in weather_data rows (state, district, station, date, ..., pressure, ..., precipitation); returns how many were flagged"""
+        flagged = 0
+        for state, district, station, date, _, _, _, pressure, _, precipitation in rows:
+            flagged += bool(self.update(state, district, station, to_hours(date), precipitation, pressure))
+        return flagged
+
+    def catch_up(self, conn, source='main'):
+        """Fold in weather_data rows added to `conn` since the last call, in insertion order.
+
+        Each source (the main database, or one shard) keeps its own watermark.
+        Upserts that rewrite an existing row keep its id and are not replayed.
+        Rows dated more than seed_days before the newest observation are
+        skipped: a cold start seeds the EW moments from that recent window
+        instead of the whole table, and the daily rows a weather rollup
+        inserts (new ids, old dates; see partitions.rollup_weather) are not
+        read as fresh observations.
+        """
+        with self._catch_up_lock:
+            top = conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0]
+            if top is None:
+                return 0
+            cutoff = conn.execute("SELECT MAX(epoch_day) FROM weather_data").fetchone()[0] - self.seed_days
+            start = self.last_ids.get(source)
+            if start is None:
+                # First call: start at the window's first row rather than id 0 (the epoch_day index finds it)
+                start = conn.execute("SELECT MIN(id) FROM weather_data WHERE epoch_day >= ?", (cutoff,)).fetchone()[0] - 1
+            rows = conn.execute("""
+                SELECT state, district, station, date, precipitation, pressure
+                FROM weather_data WHERE id > ? AND id <= ? AND epoch_day >= ? ORDER BY id
+            """, (start, top, cutoff)).fetchall()
+            for state, district, station, date, precipitation, pressure in rows:
+                self.update(state, district, station, to_hours(date), precipitation, pressure)
+            self.last_ids[source] = top
+            return len(rows)
+
+    def region_frame(self):
+        """Current detector state, one row per station"""
+        n = len(self.regions)
+        frame = pd.DataFrame(self.regions, columns=['state', 'district', 'station'])
+        for name in ('count', 'flags', 'precipitation_mean', 'precipitation_z', 'pressure_mean',
+                     'pressure_z', 'pressure_tendency'):
+            frame[name] = getattr(self, name)[:n]
+        frame['hours_ago'] = self.clock - self.last_time[:n]
+        return frame
+
+    def state_features(self, max_age_hours=config.NOWCAST_MAX_GAP_HOURS):
+        """Per-state nowcast features over stations heard from within max_age_hours of the newest reading"""
+        n = len(self.regions)
+        if n == 0:
+            return pd.DataFrame(columns=NOWCAST_COLUMNS, index=pd.Index([], name='state'))
+        fresh = (self.clock - self.last_time[:n]) <= max_age_hours
+        frame = pd.DataFrame({
+            'state': [state for state, _, _ in self.regions],
+            'anomaly_flags': np.where(fresh, self.flags[:n], 0),
+            'precipitation_z': np.where(fresh, self.precipitation_z[:n], np.nan),
+            'pressure_z': np.where(fresh, self.pressure_z[:n], np.nan),
+            'pressure_tendency': np.where(fresh, self.pressure_tendency[:n], np.nan),
+        })
+        return frame.groupby('state').agg({
+            'anomaly_flags': lambda flags: int(np.bitwise_or.reduce(flags.to_numpy())),
+            'precipitation_z': 'max',
+            'pressure_z': 'min',
+            'pressure_tendency': 'min',
+        })
+
+
+def describe_flags(flags):
+    return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recent weather_data through the anomaly detector")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--seed-days', type=int, default=config.NOWCAST_SEED_DAYS,
+                        help="Days of observations before the newest one to replay")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_date_columns(conn)
+        detector = AnomalyDetector(seed_days=args.seed_days)
+        processed = detector.catch_up(conn)
+    finally:
+        conn.close()
+    regions = detector.region_frame()
+    flagged = regions[regions['flags'] > 0]
+    print(f"{processed} observations over {len(regions)} stations; {len(flagged)} stations currently flagged")
+    if not flagged.empty:
+        print(flagged.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import config
+from frames import ensure_date_columns, to_epoch_day
+
+PARTITIONED_TABLES = ('cloudburst_history', 'weather_data')
+
+# SQLite's compile-time ceiling on simultaneously attached databases is 10
+MAX_ATTACHED = 9
+
+WEATHER_MEASURES = ['humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation']
+
+# Rows that stay in the hot database whatever their year: the newest
+# observation of every station, which the current-weather reads look up
+RETAINED = {
+    'weather_data': """
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY state, district, station ORDER BY epoch_day DESC, date DESC, id DESC
+            ) as rn
+            FROM main.weather_data
+        )
+        WHERE rn = 1
+    """,
+}
+
+
+def archivable(table):
+    """WHERE condition (one year parameter) selecting the rows of `table` that a year's archive takes"""
+    if table in RETAINED:
+        return f"year = ? AND id NOT IN ({RETAINED[table]})"
+    return "year = ?"
+
+
+class PartitionManager:
+    """Hot database plus one archive file per past year, ATTACHed on demand.
+
+    The hot database (the one `conn` is opened on) holds the current year,
+    anything not yet archived and the latest observation of every weather
+    station (see RETAINED). archive_year() moves a year's rows into
+    <archive_dir>/cloudburst_<year>.db and records its day range in the
+    `partitions` table, so relation() can prune: a query bounded to recent
+    days reads the hot tables only, and older ranges get a temporary UNION ALL
+    view over just the archives they overlap.
+    """
+
+    def __init__(self, conn, archive_dir=config.ARCHIVE_DIR, lock=None):
+        self.conn = conn
+        self.archive_dir = archive_dir
+        self._attached = OrderedDict()
+        self._views = {}
+        # Pass the lock the connection's readers hold when other threads share it:
+        # attaching an archive beyond MAX_ATTACHED detaches one and drops its views
+        self._lock = threading.RLock() if lock is None else lock
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS partitions (
+                year INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                min_day INTEGER,
+                max_day INTEGER,
+                history_rows INTEGER,
+                weather_rows INTEGER
+            )
+        ''')
+        self.conn.commit()
+
+    def archives(self, since_day=None, until_day=None):
+        """[(year, path)] of archives whose day range overlaps [since_day, until_day]"""
+        rows = self.conn.execute("SELECT year, path, min_day, max_day FROM partitions ORDER BY year").fetchall()
+        return [
+            (year, path) for year, path, min_day, max_day in rows
+            if (since_day is None or max_day >= since_day) and (until_day is None or min_day <= until_day)
+        ]
+
+    def archive_path(self, year):
+        return os.path.join(self.archive_dir, f"cloudburst_{year}.db")
+
+    def _attach(self, year, path):
+        alias = f"archive_{year}"
+        if alias in self._attached:
+            self._attached.move_to_end(alias)
+            return alias
+        while len(self._attached) >= MAX_ATTACHED:
+            self._detach(next(iter(self._attached)))
+        self.conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+        self._attached[alias] = year
+        # Archives written before a schema change get its new columns and keys
+        self._create_archive_schema(alias)
+        self._create_archive_triggers(alias)
+        return alias
+
+    def _detach(self, alias):
+        for name, aliases in list(self._views.items()):
+            if alias in aliases:
+                self.conn.execute(f"DROP VIEW IF EXISTS temp.{name}")
+                del self._views[name]
+        for (name,) in self.conn.execute("SELECT name FROM sqlite_temp_master WHERE type = 'trigger'").fetchall():
+            if name.startswith(f"{alias}_"):
+                self.conn.execute(f"DROP TRIGGER temp.{name}")
+        self.conn.execute(f"DETACH DATABASE {alias}")
+        del self._attached[alias]
+
+    def attached_archive(self, year):
+        """Alias of `year`'s archive, attached, or None if the year has not been archived"""
+        with self._lock:
+            row = self.conn.execute("SELECT path FROM partitions WHERE year = ?", (year,)).fetchone()
+            return None if row is None else self._attach(year, row[0])
+
+    def _columns(self, table):
+        # Stored columns only; generated columns are recomputed in every partition
+        return [row[1] for row in self.conn.execute(f"PRAGMA main.table_xinfo({table})") if row[6] == 0]
+
+    def relation(self, table, since_day=None, until_day=None):
+        """Name to select `table` rows from, spanning only the partitions the day range touches"""
+        with self._lock:
+            archives = self.archives(since_day, until_day)
+            if not archives:
+                return table
+            if len(archives) > MAX_ATTACHED:
+                raise RuntimeError(
+                    f"Query spans {len(archives)} archive years; at most {MAX_ATTACHED} can be attached at once"
+                )
+            aliases = [self._attach(year, path) for year, path in archives]
+            name = f"{table}_{'_'.join(str(year) for year, _ in archives)}"
+            if name not in self._views:
+                columns = ', '.join(self._columns(table) + ['epoch_day', 'year', 'month'])
+                branches = [f"SELECT {columns} FROM main.{table}"]
+                branches += [f"SELECT {columns} FROM {alias}.{table}" for alias in aliases]
+                self.conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS {name} AS " + " UNION ALL ".join(branches))
+                self._views[name] = set(aliases)
+            return name
+
+    def _create_archive_schema(self, alias):
+        """Replicate the hot tables and their indexes (unique natural keys included) inside an attached archive.
+
+        Columns the hot tables gained since the archive was written are added,
+        and indexes whose columns changed are rebuilt.
+        """
+        objects = self.conn.execute("""
+            SELECT type, name, tbl_name, sql FROM main.sqlite_master
+            WHERE tbl_name IN ({}) AND sql IS NOT NULL AND type IN ('table', 'index')
+            ORDER BY type = 'index'
+        """.format(', '.join('?' * len(PARTITIONED_TABLES))), PARTITIONED_TABLES).fetchall()
+        for kind, name, table, sql in objects:
+            if kind == 'table':
+                self.conn.execute(re.sub(r'^CREATE TABLE (IF NOT EXISTS )?', f'CREATE TABLE IF NOT EXISTS {alias}.', sql))
+                archived = {row[1] for row in self.conn.execute(f"PRAGMA {alias}.table_xinfo({table})")}
+                for _, column, column_type, notnull, default, _, hidden in self.conn.execute(f"PRAGMA main.table_xinfo({table})"):
+                    if hidden == 0 and column not in archived:
+                        self.conn.execute(
+                            f"ALTER TABLE {alias}.{table} ADD COLUMN {column} {column_type}"
+                            + (" NOT NULL" if notnull else "") + (f" DEFAULT {default}" if default is not None else "")
+                        )
+            else:
+                columns = [row[2] for row in self.conn.execute(f"PRAGMA main.index_info({name})")]
+                archived = [row[2] for row in self.conn.execute(f"PRAGMA {alias}.index_info({name})")]
+                if archived and archived != columns:
+                    self.conn.execute(f"DROP INDEX {alias}.{name}")
+                self.conn.execute(re.sub(
+                    r'^CREATE (UNIQUE )?INDEX (IF NOT EXISTS )?', rf'CREATE \1INDEX IF NOT EXISTS {alias}.', sql
+                ))
+
+    def _create_archive_triggers(self, alias):
+        """TEMP copies of the hot tables' triggers on the archive's tables.
+
+        Upserts into an archive (see loading.upsert_batch) then bump the data
+        version and mark hotspots stale like writes to the hot tables. The
+        event index triggers (*_search, see search.py) are left out: an
+        archive keeps its own index.
+        """
+        triggers = self.conn.execute("""
+            SELECT tbl_name, sql FROM main.sqlite_master
+            WHERE type = 'trigger' AND tbl_name IN ({}) AND name NOT LIKE '%\\_search' ESCAPE '\\'
+        """.format(', '.join('?' * len(PARTITIONED_TABLES))), PARTITIONED_TABLES).fetchall()
+        for table, sql in triggers:
+            sql = re.sub(r'^CREATE TRIGGER (IF NOT EXISTS )?(\w+)', rf'CREATE TEMP TRIGGER IF NOT EXISTS {alias}_\2', sql)
+            self.conn.execute(re.sub(rf'\bON {table}\b', f'ON {alias}.{table}', sql, count=1))
+
+    def archive_year(self, year):
+        """Move the rows dated in `year` from the hot tables into that year's archive file, except RETAINED ones"""
+        with self._lock:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = self.archive_path(year)
+            alias = self._attach(year, path)
+            counts = {}
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._create_archive_schema(alias)
+                for table in PARTITIONED_TABLES:
+                    columns = ', '.join(self._columns(table))
+                    counts[table] = self.conn.execute(
+                        f"INSERT OR REPLACE INTO {alias}.{table} ({columns}) "
+                        f"SELECT {columns} FROM main.{table} WHERE {archivable(table)}",
+                        (year,)
+                    ).rowcount
+                    self.conn.execute(f"DELETE FROM main.{table} WHERE {archivable(table)}", (year,))
+                totals = [
+                    self.conn.execute(f"SELECT COUNT(*) FROM {alias}.{table}").fetchone()[0]
+                    for table in PARTITIONED_TABLES
+                ]
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO partitions (year, path, min_day, max_day, history_rows, weather_rows)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (year, path, to_epoch_day(date(year, 1, 1)), to_epoch_day(date(year, 12, 31)), *totals))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            # Views built before this year existed as an archive no longer cover it
+            for name in list(self._views):
+                self.conn.execute(f"DROP VIEW IF EXISTS temp.{name}")
+                del self._views[name]
+            return counts
+
+    def rollup_weather(self, before_day):
+        """Replace raw weather observations older than before_day with one row per station and day"""
+        with self._lock:
+            measures = ', '.join(
+                f"MAX({m}) as {m}" if m == 'precipitation' else f"ROUND(AVG({m}), 1) as {m}"
+                for m in WEATHER_MEASURES
+            )
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                # Only days that still hold raw observations (several rows or timestamps)
+                self.conn.execute(f'''
+                    CREATE TEMP TABLE weather_rollup AS
+                    SELECT state, district, station, epoch_day as day, date(MIN(date)) as date, {measures}
+                    FROM main.weather_data
+                    WHERE epoch_day < ?
+                    GROUP BY state, district, station, epoch_day
+                    HAVING COUNT(*) > 1 OR MAX(length(date)) > 10
+                ''', (before_day,))
+                self.conn.execute("CREATE INDEX temp.idx_weather_rollup ON weather_rollup (state, district, station, day)")
+                removed = self.conn.execute('''
+                    DELETE FROM main.weather_data
+                    WHERE epoch_day < ? AND EXISTS (
+                        SELECT 1 FROM temp.weather_rollup r
+                        WHERE r.state = weather_data.state AND r.district = weather_data.district
+                          AND r.station = weather_data.station AND r.day = weather_data.epoch_day
+                    )
+                ''', (before_day,)).rowcount
+                columns = ', '.join(['state', 'district', 'station', 'date'] + WEATHER_MEASURES)
+                added = self.conn.execute(
+                    f"INSERT INTO main.weather_data ({columns}) SELECT {columns} FROM temp.weather_rollup"
+                ).rowcount
+                self.conn.execute("DROP TABLE temp.weather_rollup")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return {'raw_rows_removed': removed, 'daily_rows_added': added}
+
+    def maintain(self, today=None, hot_years=config.HOT_YEARS, raw_weather_days=config.WEATHER_RAW_RETENTION_DAYS):
+        """Retention job: roll up old raw weather, then archive years older than the hot window"""
+        today = today or date.today()
+        report = {'rollup': self.rollup_weather(to_epoch_day(today) - raw_weather_days), 'archived': {}}
+        first_hot_year = today.year - hot_years + 1
+        years = [row[0] for row in self.conn.execute(f"""
+            SELECT year FROM main.cloudburst_history WHERE year < ?
+            UNION SELECT year FROM main.weather_data WHERE year < ? AND id NOT IN ({RETAINED['weather_data']})
+        """, (first_hot_year, first_hot_year))]
+        for year in sorted(years):
+            report['archived'][year] = self.archive_year(year)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive past years and roll up old weather observations")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--archive-dir', default=config.ARCHIVE_DIR)
+    parser.add_argument('--hot-years', type=int, default=config.HOT_YEARS,
+                        help="Calendar years kept in the hot database, including the current one")
+    parser.add_argument('--raw-weather-days', type=int, default=config.WEATHER_RAW_RETENTION_DAYS,
+                        help="Days of raw weather observations kept before rolling up to daily rows")
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM the hot database afterwards")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        ensure_date_columns(conn)
+        manager = PartitionManager(conn, args.archive_dir)
+        print(manager.maintain(hot_years=args.hot_years, raw_weather_days=args.raw_weather_days))
+        if args.vacuum:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+# Opt-in memory profiling (CLOUDBURST_MEMORY_PROFILING=1). tracemalloc counters
+# bracket each page render; on-demand heap snapshots attribute live memory to
+# the project line (and call stack) that allocated it. Query results and
+# long-lived cached objects are measured by their deep size, which attributes
+# memory to the query or cache that holds it.
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by obj and everything it references, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def _where(trace):
+    frame = trace[0]
+    return f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    """Per-render traced memory, allocation snapshots, per-query result sizes and cached object sizes.
+
+    Render records are kept per session (the most recent `history` of them), so
+    growth shows up as the trend of each session's retained state size. The
+    traced-memory delta of a render includes whatever other sessions allocated
+    meanwhile; run with few concurrent sessions for clean numbers. Heap
+    snapshots walk every traced block, so they are taken on demand only.
+    """
+
+    def __init__(self, frames=10, top=15, history=50):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.top = top
+        self.history = history
+        self.sessions = {}
+        self.queries = {}
+        self.caches = OrderedDict()
+        self.captures = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    # Page renders
+
+    def begin_render(self, session_id, page):
+        """Mark the start of a script run. A run cut short by st.rerun() is never ended and is dropped"""
+        tracemalloc.reset_peak()
+        self._pending[session_id] = (page, time.time(), tracemalloc.get_traced_memory()[0])
+
+    def rendering(self, session_id):
+        """Whether a script run for this session has begun and not yet ended"""
+        return session_id in self._pending
+
+    def end_render(self, session_id, session_state):
+        pending = self._pending.pop(session_id, None)
+        if pending is None:
+            return
+        page, started, before = pending
+        current, peak = tracemalloc.get_traced_memory()
+        record = {
+            'page': page,
+            'at': started,
+            'seconds': time.time() - started,
+            'net_bytes': current - before,
+            'peak_bytes': peak - before,
+            'session_state_bytes': deep_sizeof(dict(session_state)),
+        }
+        with self._lock:
+            self.sessions.setdefault(session_id, deque(maxlen=self.history)).append(record)
+
+    # Heap snapshots
+
+    def capture(self):
+        """Group live traced memory by the innermost project line that allocated it, with growth since the last capture"""
+        snapshot = tracemalloc.take_snapshot()
+        totals = {}
+        for stat in snapshot.statistics('traceback'):
+            project = [frame for frame in stat.traceback if frame.filename.startswith(PROJECT_DIR)]
+            if not project:
+                continue
+            # Tracebacks run oldest to most recent; the last project frame made the allocation
+            where = _where(project[-1:])
+            entry = totals.setdefault(where, {
+                'where': where,
+                'stack': ' < '.join(_where([frame]) for frame in reversed(project[-5:])),
+                'bytes': 0,
+                'blocks': 0,
+            })
+            entry['bytes'] += stat.size
+            entry['blocks'] += stat.count
+        with self._lock:
+            previous = self.captures[-1]['lines'] if self.captures else {}
+            for where, entry in totals.items():
+                entry['growth_bytes'] = entry['bytes'] - previous.get(where, {}).get('bytes', 0)
+            self.captures.append({'at': time.time(), 'lines': totals})
+            del self.captures[:-2]
+        return self.top_allocations()
+
+    def top_allocations(self):
+        """Largest live allocations by project line from the latest capture"""
+        columns = ['where', 'stack', 'bytes', 'growth_bytes', 'blocks']
+        with self._lock:
+            lines = self.captures[-1]['lines'] if self.captures else {}
+        frame = pd.DataFrame(list(lines.values()), columns=columns)
+        return frame.sort_values('bytes', ascending=False).head(self.top)
+
+    # Queries and caches
+
+    def record_query(self, sql, frame):
+        """Account the result of one query against its normalised SQL text"""
+        key = ' '.join(sql.split())
+        size = deep_sizeof(frame)
+        with self._lock:
+            stats = self.queries.setdefault(key, {'calls': 0, 'rows': 0, 'bytes': 0, 'max_bytes': 0})
+            stats['calls'] += 1
+            stats['rows'] += len(frame)
+            stats['bytes'] += size
+            stats['max_bytes'] = max(stats['max_bytes'], size)
+
+    def track_cache(self, name, getter):
+        """Register a long-lived object; getter is called lazily when a report is built"""
+        self.caches[name] = getter
+
+    # Reporting
+
+    def session_summary(self):
+        rows = []
+        with self._lock:
+            sessions = {sid: list(records) for sid, records in self.sessions.items()}
+        for session_id, records in sessions.items():
+            first, last = records[0], records[-1]
+            rows.append({
+                'session': session_id,
+                'renders': len(records),
+                'session_state_bytes': last['session_state_bytes'],
+                'growth_bytes': last['session_state_bytes'] - first['session_state_bytes'],
+                'last_page': last['page'],
+                'last_net_bytes': last['net_bytes'],
+                'last_peak_bytes': last['peak_bytes'],
+            })
+        return pd.DataFrame(rows, columns=[
+            'session', 'renders', 'session_state_bytes', 'growth_bytes',
+            'last_page', 'last_net_bytes', 'last_peak_bytes'
+        ])
+
+    def query_summary(self):
+        with self._lock:
+            rows = [{'query': sql, **stats} for sql, stats in self.queries.items()]
+        frame = pd.DataFrame(rows, columns=['query', 'calls', 'rows', 'bytes', 'max_bytes'])
+        return frame.sort_values('bytes', ascending=False)
+
+    def cache_summary(self):
+        rows = []
+        for name, getter in self.caches.items():
+            rows.append({'cache': name, 'bytes': deep_sizeof(getter())})
+        return pd.DataFrame(rows, columns=['cache', 'bytes']).sort_values('bytes', ascending=False)
+
+    def report(self):
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            renders = {sid: list(records) for sid, records in self.sessions.items()}
+        return {
+            'generated_at': time.time(),
+            'traced_bytes': current,
+            'traced_peak_bytes': peak,
+            'sessions': self.session_summary().to_dict('records'),
+            'top_allocations': self.top_allocations().to_dict('records'),
+            'queries': self.query_summary().to_dict('records'),
+            'caches': self.cache_summary().to_dict('records'),
+            'renders': renders,
+        }
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.report(), fh, indent=1, default=str)
@@ -0,0 +1,240 @@
+import argparse
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import runpy
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Chatbot query log: one JSON line per operator question, typed or a quick
+# button (logged with intent "quick"), with the question, the intent that
+# answered it, latency, rows returned and a digest of the answer. Callers
+# only enqueue; a background thread appends batches to the file, so logging
+# never waits on disk. Replaying a log (python
+# querylog.py LOG) loads app.py in Streamlit's bare mode, answers every logged
+# question again with the current code and database, and compares.
+
+log = logging.getLogger(__name__)
+
+# Queue marker asking the writer to flush what it has and acknowledge
+_FLUSH = object()
+
+
+def answer_digest(response, result):
+    """Short stable hash of a chatbot answer: the response text and its result table"""
+    digest = hashlib.sha1(response.encode('utf-8'))
+    if result is not None:
+        digest.update(','.join(map(str, result.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(result, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def summary(response, width=200):
+    """Start of a response on one line, for readable diffs"""
+    return ' / '.join(line.strip() for line in response.splitlines() if line.strip())[:width]
+
+
+class QueryLog:
+    """Append-only JSON-lines log written in batches by a daemon thread.
+
+    record() never blocks: when `max_pending` records are already waiting
+    (the disk is stuck) new ones are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, path, batch_size=config.QUERY_LOG_BATCH_SIZE,
+                 flush_interval=config.QUERY_LOG_FLUSH_SECONDS, max_pending=10_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='query-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def record(self, query, intent, seconds, response, result, version=None):
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'query': query,
+            'intent': intent,
+            'latency_ms': round(seconds * 1000, 2),
+            'rows': 0 if result is None else len(result),
+            'version': version,
+        }
+        try:
+            # The digest is left to the writer thread; result frames are shared and never modified
+            self._queue.put_nowait((entry, response, result))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Write everything recorded so far; returns False if the writer did not finish in time"""
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] is not _FLUSH:
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if item is not None and item[0] is _FLUSH:
+                item[1].set()
+
+    def _write(self, batch):
+        lines = []
+        for entry, response, result in batch:
+            entry['answer'] = answer_digest(response, result)
+            entry['summary'] = summary(response)
+            lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as fh:
+                fh.writelines(lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            log.warning("query log write to %s failed: %s", self.path, e)
+
+
+def read_log(path):
+    """Entries of a query log, skipping lines that are not complete JSON (e.g. a torn final write)"""
+    entries = []
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def load_app(app_path):
+    """Run app.py once without a Streamlit server and return its namespace.
+
+    Streamlit's bare mode keeps st.cache_resource working and turns page
+    elements into no-ops, so the chatbot functions are callable directly.
+    """
+    # Replays must not append to the log being replayed
+    config.QUERY_LOG_PATH = ''
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    directory = os.path.dirname(os.path.abspath(app_path))
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    return runpy.run_path(os.path.basename(app_path))
+
+
+def replay(entries, answer, repeat=1, warmup=False):
+    """Answer every logged query again; one row per replayed call.
+
+    `answer(query, trace)` must return (response, result) and set
+    trace['intent'], as app.answer_chatbot_query does.
+    """
+    if warmup:
+        for query in {entry['query'] for entry in entries}:
+            answer(query, {})
+    rows = []
+    for entry in entries:
+        for _ in range(repeat):
+            trace = {'intent': None}
+            started = time.perf_counter()
+            response, result = answer(entry['query'], trace)
+            elapsed = time.perf_counter() - started
+            rows.append({
+                'query': entry['query'],
+                'intent': entry.get('intent'),
+                'new_intent': trace['intent'],
+                'logged_ms': entry.get('latency_ms'),
+                'replay_ms': elapsed * 1000,
+                'changed': answer_digest(response, result) != entry.get('answer'),
+                'old_summary': entry.get('summary'),
+                'new_summary': summary(response),
+            })
+    return pd.DataFrame(rows)
+
+
+def latency_report(results):
+    """Per-intent latency distribution of the logged calls and the replayed ones.
+
+    Quick-button entries logged the lookup of a precomputed answer, not its
+    computation, so they form their own "quick" row instead of pulling the
+    logged percentiles of their intent towards zero.
+    """
+    def percentiles(values):
+        values = values.dropna().to_numpy(dtype=float)
+        if not len(values):
+            return [np.nan] * 3
+        return np.percentile(values, [50, 95, 99]).tolist()
+
+    rows = []
+    intents = results['new_intent'].fillna('?').where(results['intent'] != 'quick', 'quick')
+    for intent, group in results.groupby(intents):
+        logged, replayed = percentiles(group['logged_ms']), percentiles(group['replay_ms'])
+        rows.append([intent, len(group), *logged, *replayed, int(group['changed'].sum())])
+    return pd.DataFrame(rows, columns=[
+        'intent', 'n', 'logged p50', 'logged p95', 'logged p99', 'replay p50', 'replay p95', 'replay p99', 'changed'
+    ]).sort_values('n', ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a chatbot query log against the current code and database")
+    parser.add_argument('log', nargs='?', default=config.QUERY_LOG_PATH)
+    parser.add_argument('--app', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'))
+    parser.add_argument('--limit', type=int, help="Replay only the last N entries")
+    parser.add_argument('--repeat', type=int, default=1, help="Times each query is answered")
+    parser.add_argument('--warmup', action='store_true', help="Answer each distinct query once, untimed, first")
+    parser.add_argument('--show', type=int, default=20, help="Changed answers to list")
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if args.limit:
+        entries = entries[-args.limit:]
+    if not entries:
+        print(f"No entries in {args.log}")
+        return
+    app = load_app(args.app)
+    results = replay(entries, app['answer_chatbot_query'], args.repeat, args.warmup)
+
+    pd.set_option('display.width', 200)
+    print(f"Replayed {len(entries)} logged queries x{args.repeat}")
+    print(latency_report(results).round(1).to_string(index=False))
+
+    changed = results[results['changed']].drop_duplicates('query')
+    versions = {entry.get('version') for entry in entries}
+    current = app['get_data_version']()
+    print(f"\n{len(changed)} of {results['query'].nunique()} distinct queries answered differently")
+    if versions - {current}:
+        print(f"(logged at data versions {sorted(v for v in versions if v is not None)}, now {current}: "
+              f"some changes may come from the data rather than the code)")
+    for row in changed.head(args.show).itertuples(index=False):
+        intent = row.intent if row.intent == row.new_intent else f"{row.intent} -> {row.new_intent}"
+        print(f"- {row.query!r} [{intent}]\n    was: {row.old_summary}\n    now: {row.new_summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import argparse
+import os
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import config
+from frames import ensure_date_columns, to_epoch_day
+from nowcast import PRECIPITATION_SPIKE, PRESSURE_DROP, PRESSURE_FALLING_FAST
+from partitions import PartitionManager
+
+# Columns every scorer receives, one row per region
+FEATURE_COLUMNS = [
+    'total_incidents', 'recent_incidents',
+    'humidity', 'temperature', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation'
+]
+
+
+def recent_start(latest_year=None):
+    """Start of the 'recent' window: 1 January of the latest year with events, else of this year"""
+    return f"{latest_year or date.today().year}-01-01"
+
+
+def build_features(conn, states=None, recent_since=None, history_table='cloudburst_history', weather_table='weather_data'):
+    """Build the per-state feature frame from history aggregates and the latest weather row.
+
+    The table arguments name the relations to read, e.g. views that include archived years.
+    """
+    if recent_since is None:
+        latest_year = conn.execute(f"SELECT MAX(substr(date, 1, 4)) FROM {history_table}").fetchone()[0]
+        recent_since = recent_start(latest_year and int(latest_year))
+    history = pd.read_sql_query(f"""
+        SELECT state,
+               COUNT(*) as total_incidents,
+               SUM(epoch_day >= ?) as recent_incidents,
+               AVG(rainfall_mm) as avg_rainfall,
+               MAX(rainfall_mm) as max_rainfall,
+               AVG(casualties) as avg_casualties
+        FROM {history_table}
+        GROUP BY state
+    """, conn, params=(to_epoch_day(recent_since),))
+    weather = pd.read_sql_query(f"""
+        SELECT state, district, date, humidity, temperature, wind_speed,
+               pressure, cloud_cover, precipitation
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY state ORDER BY epoch_day DESC, date DESC, id DESC) as rn
+            FROM {weather_table}
+        )
+        WHERE rn = 1
+    """, conn)
+
+    features = weather.merge(history, on='state', how='outer').set_index('state')
+    if states is not None:
+        features = features.reindex(pd.Index(states, name='state'))
+    features[['total_incidents', 'recent_incidents']] = (
+        features[['total_incidents', 'recent_incidents']].fillna(0).astype('int64')
+    )
+    return features
+
+
+def training_frame(conn, horizon_days=2, recent_days=365, history_table='cloudburst_history', weather_table='weather_data'):
+    """Label each weather observation with whether a cloudburst followed in the same state"""
+    return pd.read_sql_query(f"""
+        SELECT w.state, w.date, w.humidity, w.temperature, w.wind_speed,
+               w.pressure, w.cloud_cover, w.precipitation,
+               (SELECT COUNT(*) FROM {history_table} h
+                WHERE h.state = w.state AND h.epoch_day < w.epoch_day) as total_incidents,
+               (SELECT COUNT(*) FROM {history_table} h
+                WHERE h.state = w.state AND h.epoch_day < w.epoch_day
+                  AND h.epoch_day >= w.epoch_day - ?) as recent_incidents,
+               EXISTS (SELECT 1 FROM {history_table} h
+                       WHERE h.state = w.state
+                         AND h.epoch_day BETWEEN w.epoch_day AND w.epoch_day + ?) as label
+        FROM {weather_table} w
+    """, conn, params=(recent_days, horizon_days))
+
+
+def feature_arrays(features):
+    """The numeric columns of a feature frame as float64 arrays, the form scorers evaluate"""
+    return {
+        col: features[col].to_numpy(dtype='float64')
+        for col in features.columns if pd.api.types.is_numeric_dtype(features[col])
+    }
+
+
+class Scorer:
+    """Maps a feature frame to cloudburst probabilities (percent), one per row"""
+
+    name = 'base'
+    # Weather readings the scorer depends on, i.e. the inputs worth perturbing
+    inputs = ()
+
+    def score(self, features):
+        return self.score_columns(feature_arrays(features))
+
+    def score_columns(self, columns):
+        """Probabilities from {column: array}; arrays may carry a leading samples axis and broadcast"""
+        raise NotImplementedError
+
+
+class RuleScorer(Scorer):
+    """The additive points system, evaluated column-wise"""
+
+    name = 'rules'
+    inputs = ('humidity', 'pressure', 'cloud_cover', 'wind_speed')
+
+    def points(self, columns):
+        total = columns['total_incidents']
+        recent = columns['recent_incidents']
+        humidity = columns['humidity']
+        pressure = columns['pressure']
+        cloud_cover = columns['cloud_cover']
+        wind_speed = columns['wind_speed']
+
+        # Historical frequency (0-30) and recent activity (0-25)
+        points = np.minimum(total * 3, 30) + np.minimum(recent * 5, 25)
+
+        # Current weather conditions (0-45); missing readings compare False and add nothing
+        points = points + np.select([humidity > 80, humidity > 70], [15, 8], 0)
+        points = points + np.select([pressure < 985, pressure < 990], [12, 6], 0)
+        points = points + np.select([cloud_cover > 85, cloud_cover > 75], [10, 5], 0)
+        points = points + np.select([wind_speed > 12, wind_speed > 8], [8, 3], 0)
+
+        # Streaming nowcast anomalies (0-18); absent when no fresh readings were flagged
+        if 'anomaly_flags' in columns:
+            flags = np.nan_to_num(columns['anomaly_flags']).astype('int64')
+            points = points + np.where(flags & PRECIPITATION_SPIKE, 10, 0)
+            points = points + np.where(flags & (PRESSURE_DROP | PRESSURE_FALLING_FAST), 8, 0)
+
+        # Space-time hotspot clusters (0-10): an active cluster, or any cluster on record
+        if 'hotspot_clusters' in columns:
+            clusters = np.nan_to_num(columns['hotspot_clusters'])
+            active = np.nan_to_num(columns['active_hotspots'])
+            points = points + np.select([active > 0, clusters > 0], [10, 5], 0)
+        return points
+
+    def score_columns(self, columns):
+        points = self.points(columns)
+        probability = np.select(
+            [points >= 70, points >= 50, points >= 30],
+            [85 + (points - 70) / 3, 65 + (points - 50) / 2, 40 + (points - 30) / 1.5],
+            15 + points / 2
+        )
+        # States without any recorded cloudburst keep the flat baseline
+        no_history = columns['total_incidents'] == 0
+        return np.where(no_history, 15.0, probability)
+
+
+class LogisticScorer(Scorer):
+    """L2-regularised logistic regression fitted with Newton iterations (NumPy only)"""
+
+    name = 'logistic'
+
+    def __init__(self, columns=FEATURE_COLUMNS, l2=1.0):
+        self.columns = list(columns)
+        self.inputs = tuple(self.columns)
+        self.l2 = l2
+        self.mean = None
+        self.scale = None
+        self.coef = None
+        self.intercept = 0.0
+
+    def _design(self, columns):
+        missing = np.full(1, np.nan)
+        x = np.stack(np.broadcast_arrays(*[columns.get(col, missing) for col in self.columns]), axis=-1)
+        # Missing readings fall back to the training mean, i.e. contribute nothing
+        x = np.where(np.isnan(x), self.mean, x)
+        return (x - self.mean) / self.scale
+
+    def fit(self, features, labels, max_iter=50, tol=1e-8):
+        y = np.asarray(labels, dtype='float64')
+        if y.min() == y.max():
+            raise ValueError("Training labels contain a single class; cannot fit a logistic model")
+
+        raw = features.reindex(columns=self.columns).to_numpy(dtype='float64')
+        self.mean = np.nan_to_num(np.nanmean(raw, axis=0))
+        scale = np.nan_to_num(np.nanstd(raw, axis=0))
+        self.scale = np.where(scale > 0, scale, 1.0)
+        x = np.column_stack([np.ones(len(y)), self._design(feature_arrays(features))])
+
+        beta = np.zeros(x.shape[1])
+        penalty = np.full(x.shape[1], self.l2)
+        penalty[0] = 0.0
+        for _ in range(max_iter):
+            p = 1.0 / (1.0 + np.exp(-(x @ beta)))
+            gradient = x.T @ (p - y) + penalty * beta
+            hessian = (x * (p * (1 - p))[:, None]).T @ x + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            beta -= step
+            if np.abs(step).max() < tol:
+                break
+
+        self.intercept = float(beta[0])
+        self.coef = beta[1:]
+        return self
+
+    def score_columns(self, columns):
+        z = self._design(columns) @ self.coef + self.intercept
+        return 100.0 / (1.0 + np.exp(-z))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(
+            path, columns=np.array(self.columns), mean=self.mean, scale=self.scale,
+            coef=self.coef, intercept=self.intercept, l2=self.l2
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as artifact:
+            scorer = cls(columns=artifact['columns'].tolist(), l2=float(artifact['l2']))
+            scorer.mean = artifact['mean']
+            scorer.scale = artifact['scale']
+            scorer.coef = artifact['coef']
+            scorer.intercept = float(artifact['intercept'])
+        return scorer
+
+
+SCORERS = {
+    RuleScorer.name: RuleScorer,
+    LogisticScorer.name: LogisticScorer,
+}
+
+
+def load_scorer(name, model_path=None):
+    """Instantiate a scorer by name, reading its artifact from disk if it has one"""
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer '{name}'; expected one of {sorted(SCORERS)}")
+    scorer_cls = SCORERS[name]
+    if hasattr(scorer_cls, 'load'):
+        return scorer_cls.load(model_path)
+    return scorer_cls()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the logistic cloudburst risk model")
+    parser.add_argument('--db', default='cloudburst_data.db')
+    parser.add_argument('--out', default=os.path.join('models', 'logistic.npz'))
+    parser.add_argument('--horizon-days', type=int, default=2)
+    parser.add_argument('--l2', type=float, default=1.0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_date_columns(conn)
+        partitions = PartitionManager(conn, config.ARCHIVE_DIR)
+        frame = training_frame(
+            conn, horizon_days=args.horizon_days, history_table=partitions.relation('cloudburst_history'),
+            weather_table=partitions.relation('weather_data')
+        )
+    finally:
+        conn.close()
+
+    scorer = LogisticScorer(l2=args.l2).fit(frame, frame['label'])
+    scorer.save(args.out)
+    print(f"Trained on {len(frame)} observations ({int(frame['label'].sum())} positive); saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
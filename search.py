@@ -0,0 +1,171 @@
+import argparse
+import re
+import sqlite3
+
+import pandas as pd
+
+import config
+from frames import ensure_date_columns
+from partitions import PartitionManager
+
+# Full-text search over cloudburst events. event_search is an FTS5 index
+# whose content is cloudburst_history itself (content=...), so it stores only
+# the inverted index, not a second copy of the rows. Triggers on the events
+# table keep it in step with every insert, upsert and delete. A search reads
+# the index postings of its words and ranks them with bm25, so its cost
+# follows the number of matching events rather than the size of the table.
+# Every year archive file and every shard of a sharded layout has its own
+# index over its own rows, and search_events() merges their pages.
+
+SEARCH_TABLE = 'event_search'
+
+# Indexed event columns and their bm25 weights: a district hit outranks a
+# state hit, which outranks severity or date words. A narrative/source notes
+# column, once events carry one, belongs here too.
+SEARCH_COLUMNS = {
+    'district': 4.0,
+    'state': 2.0,
+    'severity': 1.0,
+    'date': 1.0,
+}
+
+# Words that describe every event and so would only filter out matches
+IGNORED_WORDS = frozenset("""
+    a all an and any at cloudburst cloudbursts during event events for in incident incidents
+    me of on show the with
+""".split())
+
+RESULT_COLUMNS = ['id', 'state', 'district', 'date', 'rainfall_mm', 'duration_hours', 'casualties', 'severity']
+
+
+def ensure_search_schema(conn, schema='main'):
+    """Create the event index and its sync triggers, filling it from the existing events the first time.
+
+    `schema` names an attached database (a year archive) to index instead of the main one.
+    """
+    columns = list(SEARCH_COLUMNS)
+    existing = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({SEARCH_TABLE})")]
+    if existing == columns:
+        return
+    with conn:
+        # A different column set (or none yet): drop the old index and index everything again
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f"DROP TRIGGER IF EXISTS {schema}.cloudburst_history_{event}_search")
+        conn.execute(f"DROP TABLE IF EXISTS {schema}.{SEARCH_TABLE}")
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {schema}.{SEARCH_TABLE} USING fts5(
+                {', '.join(columns)},
+                content='cloudburst_history', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+        new_values = ', '.join(f"new.{col}" for col in columns)
+        old_values = ', '.join(f"old.{col}" for col in columns)
+        delete = f"""
+            INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, {', '.join(columns)})
+            VALUES ('delete', old.id, {old_values});
+        """
+        insert = f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(columns)}) VALUES (new.id, {new_values});"
+        conn.execute(
+            f"CREATE TRIGGER {schema}.cloudburst_history_insert_search AFTER INSERT ON cloudburst_history BEGIN {insert} END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER {schema}.cloudburst_history_delete_search AFTER DELETE ON cloudburst_history BEGIN {delete} END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER {schema}.cloudburst_history_update_search AFTER UPDATE OF {', '.join(columns)} "
+            f"ON cloudburst_history BEGIN {delete} {insert} END"
+        )
+        conn.execute(f"INSERT INTO {schema}.{SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+        conn.execute(
+            f"INSERT INTO {schema}.{SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', ?)",
+            (f"bm25({', '.join(str(weight) for weight in SEARCH_COLUMNS.values())})",)
+        )
+
+
+def match_expression(text):
+    """FTS5 query matching events that contain every word of text (as a prefix); None if nothing is left to match.
+
+    Words are quoted, so operators and punctuation in the text are never
+    parsed as FTS5 syntax.
+    """
+    words = [word for word in re.findall(r'\w+', text.lower()) if word not in IGNORED_WORDS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def archive_sources(conn, partitions):
+    """Search sources for the hot database and each of its year archives, indexing an archive the first time.
+
+    A generator, so each archive is attached only when search_events reaches
+    it and any number of years can be searched.
+    """
+    yield conn, 'main'
+    for year, _ in partitions.archives():
+        alias = partitions.attached_archive(year)
+        ensure_search_schema(conn, alias)
+        yield conn, alias
+
+
+def search_events(sources, text, page=1, page_size=config.SEARCH_PAGE_SIZE):
+    """(rows, total) for one page of the events matching text, best match first.
+
+    `sources` are the databases to search: connections (every shard) or
+    (connection, schema) pairs (see archive_sources). Each returns its best
+    page * page_size matches and the merged list is cut to the requested
+    page. `score` is bm25, lower being better.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return pd.DataFrame(columns=RESULT_COLUMNS + ['score']), 0
+    depth = page * page_size
+    total = 0
+    frames = []
+    for source in sources:
+        conn, schema = source if isinstance(source, tuple) else (source, 'main')
+        total += conn.execute(f"SELECT COUNT(*) FROM {schema}.{SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?",
+                              (expression,)).fetchone()[0]
+        frames.append(pd.read_sql_query(f"""
+            SELECT {', '.join(f'h.{col}' for col in RESULT_COLUMNS)}, m.rank as score
+            FROM (
+                SELECT rowid, rank FROM {schema}.{SEARCH_TABLE}
+                WHERE {SEARCH_TABLE} MATCH ?
+                ORDER BY rank, rowid DESC
+                LIMIT ?
+            ) m
+            JOIN {schema}.cloudburst_history h ON h.id = m.rowid
+        """, conn, params=(expression, depth)))
+    rows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    # Equal scores go newest row first, so pages never overlap
+    rows = rows.sort_values(['score', 'id'], ascending=[True, False])
+    return rows.iloc[(page - 1) * page_size:depth].reset_index(drop=True), total
+
+
+def page_count(total, page_size=config.SEARCH_PAGE_SIZE):
+    return max((total + page_size - 1) // page_size, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over cloudburst events")
+    parser.add_argument('text', nargs='+')
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=config.SEARCH_PAGE_SIZE)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_date_columns(conn)
+        ensure_search_schema(conn)
+        sources = archive_sources(conn, PartitionManager(conn, config.ARCHIVE_DIR))
+        rows, total = search_events(sources, ' '.join(args.text), args.page, args.page_size)
+    finally:
+        conn.close()
+    print(f"{total} matching events; page {args.page} of {page_count(total, args.page_size)}")
+    if len(rows):
+        print(rows.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import config
+from frames import ensure_date_columns
+from search import ensure_search_schema
+
+# Optional sharded layout: cloudburst_history and weather_data live in one
+# SQLite file per state group (<shard_dir>/<group>.db) instead of the main
+# database, each in WAL mode with its own writer lock. A feed writing
+# Uttarakhand observations only locks the Uttarakhand shard, so reads and
+# writes for every other group carry on. State-scoped lookups open a single
+# shard; national aggregates run once per shard on a thread pool and their
+# partial results are merged (see split_aggregate). The main database keeps
+# everything that is not per-state: hotspots, partitions and its own
+# data_version.
+
+SHARDED_TABLES = ('cloudburst_history', 'weather_data')
+
+# States with their own shard; every other state shares REST_SHARD
+DEFAULT_GROUPS = {
+    'uttarakhand': ['Uttarakhand'],
+    'himachal_pradesh': ['Himachal Pradesh'],
+    'jammu_kashmir': ['Jammu and Kashmir'],
+}
+REST_SHARD = 'rest'
+
+# Shard k's AUTOINCREMENT ids start above (k + 1) << 40, so ids stay unique across shards
+ID_STRIDE = 1 << 40
+
+AGGREGATE = re.compile(r'\b(COUNT|SUM|AVG|MIN|MAX)\s*\(([^()]*)\)', re.IGNORECASE)
+CLAUSE_END = r'(?=\bGROUP\s+BY\b|\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|\Z)'
+WHERE = re.compile(r'\bWHERE\b.*?' + CLAUSE_END, re.IGNORECASE | re.DOTALL)
+GROUP_BY = re.compile(r'\bGROUP\s+BY\b(.*?)' + CLAUSE_END, re.IGNORECASE | re.DOTALL)
+SOURCE = re.compile(r'\bFROM\s+\{(\w+)\}', re.IGNORECASE)
+
+
+def load_groups(path=config.SHARD_MAP_PATH):
+    """Shard groups from a {"group": ["State", ...]} JSON file, or DEFAULT_GROUPS if there is none"""
+    if not os.path.exists(path):
+        return DEFAULT_GROUPS
+    with open(path, encoding='utf-8') as fh:
+        groups = json.load(fh)
+    if REST_SHARD in groups:
+        raise ValueError(f"'{REST_SHARD}' is reserved for states outside every group")
+    return groups
+
+
+def split_aggregate(template):
+    """Split an aggregate query into a per-shard partial query and a merge query over the stacked partials.
+
+    The partial query keeps the WHERE clause and GROUP BY keys and computes
+    COUNT/SUM/MIN/MAX (AVG as a SUM and a COUNT) per shard; the merge query
+    is the original with each aggregate replaced by its combination over the
+    `partials` table. GROUP BY keys must be plain columns, and parameters may
+    only appear in WHERE and in aggregate arguments. Raises ValueError for
+    anything else (DISTINCT aggregates, several sources, joins).
+    """
+    sources = SOURCE.findall(template)
+    if len(set(sources)) != 1 or re.search(r'\bJOIN\b', template, re.IGNORECASE):
+        raise ValueError("Sharded aggregates must read exactly one {table} placeholder")
+    where = WHERE.search(template)
+    where_sql = where.group(0) if where else ''
+    group = GROUP_BY.search(template)
+    keys = [key.strip() for key in group.group(1).split(',')] if group else []
+    if not all(re.fullmatch(r'\w+', key) for key in keys):
+        raise ValueError("Sharded aggregates can only GROUP BY plain columns")
+
+    partials = []
+
+    def merge(match):
+        func, arg = match.group(1).upper(), match.group(2).strip()
+        if arg.upper().startswith('DISTINCT'):
+            raise ValueError("DISTINCT aggregates cannot be merged across shards")
+        if '?' in arg and where and match.start() > where.start():
+            raise ValueError("Parameters after WHERE must not appear in aggregates")
+        n = len(partials)
+        if func == 'AVG':
+            partials.extend([f"SUM({arg}) as p{n}", f"COUNT({arg}) as p{n + 1}"])
+            return f"(CAST(SUM(p{n}) AS REAL) / SUM(p{n + 1}))"
+        partials.append(f"{func}({arg}) as p{n}")
+        return f"{'SUM' if func in ('COUNT', 'SUM') else func}(p{n})"
+
+    merged = AGGREGATE.sub(merge, template)
+    if where:
+        merged = merged.replace(where_sql, ' ', 1)
+    merged = SOURCE.sub('FROM partials', merged)
+    if '?' in merged:
+        raise ValueError("Parameters are only supported in WHERE and aggregate arguments")
+    partial = f"SELECT {', '.join(keys + partials)} FROM {{{sources[0]}}} {where_sql}"
+    if keys:
+        partial += f" GROUP BY {', '.join(keys)}"
+    return partial, merged
+
+
+class ShardSet:
+    """One SQLite file per state group, with per-thread connections and a fan-out pool"""
+
+    def __init__(self, shard_dir=config.SHARD_DIR, groups=None, workers=config.SHARD_WORKERS):
+        self.shard_dir = shard_dir
+        self.groups = load_groups() if groups is None else groups
+        self.names = list(self.groups) + [REST_SHARD]
+        self._shard_of = {state: name for name, states in self.groups.items() for state in states}
+        self._local = threading.local()
+        self._views = {}
+        self._lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=min(workers, len(self.names)), thread_name_prefix='shard')
+
+    def path(self, name):
+        return os.path.join(self.shard_dir, f"{name}.db")
+
+    def shard_for(self, state):
+        return self._shard_of.get(state, REST_SHARD)
+
+    def connection(self, name):
+        """This thread's connection to shard `name`"""
+        conns = self._local.__dict__.setdefault('conns', {})
+        if name not in conns:
+            conn = sqlite3.connect(self.path(name))
+            conn.execute("PRAGMA journal_mode=WAL")
+            conns[name] = conn
+        return conns[name]
+
+    def query(self, name, sql, params=()):
+        return pd.read_sql_query(sql, self.connection(name), params=params)
+
+    def query_state(self, state, sql, params=()):
+        """Run sql on the shard holding `state`; the query must itself filter by state"""
+        return self.query(self.shard_for(state), sql, params)
+
+    def fan_out(self, sql, params=()):
+        """Run sql on every shard in parallel; one frame per shard"""
+        return list(self.pool.map(lambda name: self.query(name, sql, params), self.names))
+
+    def aggregate(self, template, params=()):
+        """Run a {table}-placeholder aggregate on every shard and merge the partial results"""
+        partial, merged = split_aggregate(template)
+        tables = {table: table for table in SHARDED_TABLES}
+        frames = self.fan_out(partial.format(**tables), params)
+        scratch = sqlite3.connect(':memory:')
+        try:
+            pd.concat(frames, ignore_index=True).to_sql('partials', scratch, index=False)
+            return pd.read_sql_query(merged, scratch)
+        finally:
+            scratch.close()
+
+    def version(self, conn):
+        """Sum of the shard data versions, read in one statement through `conn`; it grows with every shard write"""
+        self.attach(conn)
+        return conn.execute("SELECT " + " + ".join(
+            f"(SELECT version FROM shard_{name}.data_version WHERE id = 1)" for name in self.names
+        )).fetchone()[0]
+
+    def ensure_schema(self, source):
+        """Create the sharded tables, their indexes and version triggers (copied from `source`) and the event search index in every shard"""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        objects = source.execute("""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name IN ('cloudburst_history', 'weather_data', 'data_version') AND sql IS NOT NULL
+              AND (type IN ('table', 'index') OR (type = 'trigger' AND name LIKE '%\\_version' ESCAPE '\\'))
+            ORDER BY type = 'index', type = 'trigger'
+        """).fetchall()
+        columns = {
+            table: [row for row in source.execute(f"PRAGMA table_xinfo({table})") if row[6] == 0]
+            for table in SHARDED_TABLES
+        }
+        index_columns = {
+            name: [row[2] for row in source.execute(f"PRAGMA index_info({name})")]
+            for kind, name, _ in objects if kind == 'index'
+        }
+        for k, name in enumerate(self.names):
+            conn = self.connection(name)
+            with conn:
+                for kind, object_name, sql in objects:
+                    # Shards created before a schema change get its new columns and rebuilt keys
+                    if kind == 'index':
+                        existing = [row[2] for row in conn.execute(f"PRAGMA index_info({object_name})")]
+                        if existing and existing != index_columns[object_name]:
+                            conn.execute(f"DROP INDEX {object_name}")
+                    conn.execute(re.sub(
+                        rf'^CREATE ({kind.upper()}|UNIQUE INDEX) (IF NOT EXISTS )?', r'CREATE \1 IF NOT EXISTS ', sql
+                    ))
+                    if kind == 'table' and object_name in columns:
+                        existing = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({object_name})")}
+                        for _, column, column_type, notnull, default, _, _ in columns[object_name]:
+                            if column not in existing:
+                                conn.execute(
+                                    f"ALTER TABLE {object_name} ADD COLUMN {column} {column_type}"
+                                    + (" NOT NULL" if notnull else "")
+                                    + (f" DEFAULT {default}" if default is not None else "")
+                                )
+                conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+                for table in SHARDED_TABLES:
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                        (table, (k + 1) * ID_STRIDE, table)
+                    )
+            ensure_search_schema(conn)
+
+    def is_empty(self):
+        return all(
+            self.connection(name).execute(f"SELECT NOT EXISTS (SELECT 1 FROM {table})").fetchone()[0]
+            for name in self.names for table in SHARDED_TABLES
+        )
+
+    def split(self, source_path):
+        """Copy every row of the sharded tables from the database at source_path into its shard.
+
+        Rows keep their ids; the source is left as it was. Returns {shard: rows copied}.
+        """
+        grouped = sorted(self._shard_of)
+        copied = {}
+        for name in self.names:
+            conn = self.connection(name)
+            conn.execute("ATTACH DATABASE ? AS source", (source_path,))
+            try:
+                if name == REST_SHARD:
+                    condition = f"state NOT IN ({', '.join('?' * len(grouped))})"
+                    params = grouped
+                else:
+                    condition = f"state IN ({', '.join('?' * len(self.groups[name]))})"
+                    params = self.groups[name]
+                copied[name] = 0
+                with conn:
+                    for table in SHARDED_TABLES:
+                        columns = ', '.join(
+                            row[1] for row in conn.execute(f"PRAGMA main.table_xinfo({table})") if row[6] == 0
+                        )
+                        copied[name] += conn.execute(
+                            f"INSERT OR IGNORE INTO main.{table} ({columns}) "
+                            f"SELECT {columns} FROM source.{table} WHERE {condition}",
+                            params
+                        ).rowcount
+            finally:
+                conn.execute("DETACH DATABASE source")
+        return copied
+
+    def write(self, rows, write_rows):
+        """Route rows (state first) to their shards and call write_rows(conn, rows) once per shard.
+
+        Returns the sum of what write_rows returned.
+        """
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(self.shard_for(row[0]), []).append(row)
+        return sum(write_rows(self.connection(name), shard_rows) for name, shard_rows in by_shard.items())
+
+    def attach(self, conn):
+        """ATTACH every shard to `conn` as shard_<name>"""
+        attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+        for name in self.names:
+            if f"shard_{name}" not in attached:
+                conn.execute(f"ATTACH DATABASE ? AS shard_{name}", (self.path(name),))
+
+    def relation(self, conn, table):
+        """Temp UNION ALL view over `table` in every shard, on `conn`, for queries that read all states"""
+        with self._lock:
+            if (id(conn), table) not in self._views:
+                self.attach(conn)
+                columns = ', '.join(
+                    [row[1] for row in conn.execute(f"PRAGMA main.table_xinfo({table})") if row[6] == 0]
+                    + ['epoch_day', 'year', 'month']
+                )
+                conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS sharded_{table} AS " + " UNION ALL ".join(
+                    f"SELECT {columns} FROM shard_{name}.{table}" for name in self.names
+                ))
+                self._views[id(conn), table] = f"sharded_{table}"
+            return self._views[id(conn), table]
+
+    def status(self):
+        """Rows per table and data version for every shard"""
+        return pd.DataFrame([
+            {
+                'shard': name,
+                'states': ', '.join(self.groups.get(name, ['(all others)'])),
+                **{
+                    table: self.connection(name).execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in SHARDED_TABLES
+                },
+                'version': self.connection(name).execute("SELECT version FROM data_version").fetchone()[0],
+            }
+            for name in self.names
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the main database into per-state shards, or show them")
+    parser.add_argument('command', choices=['split', 'status'])
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--shard-dir', default=config.SHARD_DIR)
+    args = parser.parse_args()
+
+    shards = ShardSet(args.shard_dir)
+    if args.command == 'split':
+        source = sqlite3.connect(args.db)
+        try:
+            ensure_date_columns(source)
+            shards.ensure_schema(source)
+        finally:
+            source.close()
+        print(shards.split(args.db))
+    print(shards.status().to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
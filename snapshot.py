@@ -0,0 +1,120 @@
+import argparse
+import logging
+import os
+import pickle
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import config
+from querylog import load_app
+
+# Startup snapshot. After an ingest, build_snapshot() runs app.py in
+# Streamlit's bare mode and asks the app's own functions for what the first
+# pages need: risk predictions for every state, the trend cube, the latest
+# weather and aggregates per state, filter values and the quick-query
+# answers. They are pickled into one file tagged with the data version they
+# were computed at. Its size grows with the number of states and districts,
+# not events, so the app loads it in milliseconds at any data size and serves
+# from it while the database is still at that version, falling back to live
+# queries after any write.
+
+# Bumped when the snapshot layout changes; files of another format are ignored
+FORMAT = 1
+
+log = logging.getLogger(__name__)
+
+
+def build_snapshot(app, attempts=3):
+    """Snapshot of the startup data, computed by an app namespace (see querylog.load_app).
+
+    The data version is read before and after; if a writer changed the data
+    in between the build is repeated, up to `attempts` times.
+    """
+    for _ in range(attempts):
+        version = app['get_data_version']()
+        snapshot = {
+            'format': FORMAT,
+            'version': version,
+            'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'predictions': app['predict_states'](app['all_indian_states']),
+            'trend_cube': app['get_trends']().frame(),
+            'weather': app['latest_weather'](),
+            'state_stats': app['get_state_stats'](),
+            'filters': app['filter_values'](),
+            'quick_answers': app['get_quick_answers'](),
+        }
+        if app['get_data_version']() == version:
+            return snapshot
+    raise RuntimeError(f"Data changed during each of {attempts} snapshot builds")
+
+
+def write_snapshot(snapshot, path):
+    """Atomically replace the snapshot file: readers see the old file or the new one, never part of one"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(snapshot, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # mkstemp creates the file private to its owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path):
+    """The snapshot at path, or None if there is none or it cannot be used"""
+    try:
+        with open(path, 'rb') as fh:
+            snapshot = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('format') != FORMAT:
+        log.warning("ignoring snapshot %s in an old format", path)
+        return None
+    return snapshot
+
+
+def rebuild(db_path=config.DB_PATH, path=config.SNAPSHOT_PATH,
+            app_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')):
+    """Build a snapshot of the database at db_path and write it to path; returns the snapshot"""
+    # The app must compute everything afresh rather than serve the snapshot being replaced
+    path = os.path.abspath(path)
+    config.DB_PATH = os.path.abspath(db_path)
+    config.SNAPSHOT_PATH = ''
+    snapshot = build_snapshot(load_app(app_path))
+    write_snapshot(snapshot, path)
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the app's startup data into a snapshot file")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--output', default=config.SNAPSHOT_PATH)
+    parser.add_argument('--app', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'))
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("no snapshot path: pass --output or set CLOUDBURST_SNAPSHOT")
+
+    output = os.path.abspath(args.output)
+    started = time.perf_counter()
+    snapshot = rebuild(args.db, output, args.app)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    load_snapshot(output)
+    loaded = time.perf_counter() - started
+    print(f"Snapshot of data version {snapshot['version']} written to {output} "
+          f"({os.path.getsize(output) / 1024:.0f} KB) in {built:.1f}s; it loads in {loaded * 1000:.0f}ms")
+    print(f"{len(snapshot['predictions'])} state predictions, {len(snapshot['trend_cube'])} trend cube rows, "
+          f"{len(snapshot['filters']['places'])} places, {len(snapshot['quick_answers'])} quick answers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from loading import NATURAL_KEYS, VALUE_COLUMNS, ensure_natural_keys, upsert_rows
+from partitions import PartitionManager
+
+EVENTS = [
+    ('Uttarakhand', 'Chamoli', '2023-06-15', 150, 3, 12, 'High', 30.4, 79.4),
+    ('Uttarakhand', 'Rudraprayag', '2023-08-12', 100, 2, 5, 'Medium', 30.3, 78.9),
+    ('Sikkim', 'North Sikkim', '2023-07-15', 92, 2, 3, 'Medium', 27.8, 88.6),
+    ('Kerala', 'Idukki', '2024-06-25', 148, 3, 16, 'High', 9.9, 77.1),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'hot.db')
+    conn.execute('''
+        CREATE TABLE cloudburst_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            state TEXT NOT NULL, district TEXT NOT NULL, date TEXT NOT NULL,
+            rainfall_mm REAL, duration_hours REAL, casualties INTEGER, severity TEXT,
+            latitude REAL, longitude REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE weather_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            state TEXT NOT NULL, district TEXT NOT NULL, date TEXT NOT NULL,
+            humidity REAL, temperature REAL, wind_speed REAL, pressure REAL, cloud_cover REAL, precipitation REAL
+        )
+    ''')
+    ensure_natural_keys(conn)
+    yield conn
+    conn.close()
+
+
+def stored_events(partitions):
+    return partitions.conn.execute(f"SELECT COUNT(*) FROM {partitions.relation('cloudburst_history')}").fetchone()[0]
+
+
+def test_reload_after_archiving_adds_nothing(conn, tmp_path):
+    partitions = PartitionManager(conn, str(tmp_path / 'archive'))
+    assert upsert_rows(conn, 'cloudburst_history', EVENTS, partitions=partitions) == len(EVENTS)
+    partitions.archive_year(2023)
+    assert conn.execute("SELECT COUNT(*) FROM main.cloudburst_history").fetchone()[0] == 1
+
+    assert upsert_rows(conn, 'cloudburst_history', EVENTS, partitions=partitions) == 0
+    assert stored_events(partitions) == len(EVENTS)
+
+
+def test_reload_updates_archived_rows_in_place(conn, tmp_path):
+    partitions = PartitionManager(conn, str(tmp_path / 'archive'))
+    upsert_rows(conn, 'cloudburst_history', EVENTS, partitions=partitions)
+    partitions.archive_year(2023)
+
+    revised = [EVENTS[0][:3] + (155,) + EVENTS[0][4:], ('Sikkim', 'Gangtok', '2023-09-09', 90, 2, 1, 'Medium', 27.3, 88.6)]
+    assert upsert_rows(conn, 'cloudburst_history', revised, partitions=partitions) == 2
+    assert stored_events(partitions) == len(EVENTS) + 1
+    keys = ' AND '.join(f"{col} = ?" for col in NATURAL_KEYS['cloudburst_history'])
+    assert conn.execute(
+        f"SELECT {VALUE_COLUMNS['cloudburst_history'][0]} FROM archive_2023.cloudburst_history WHERE {keys}",
+        EVENTS[0][:3]
+    ).fetchone() == (155,)
@@ -0,0 +1,213 @@
+import argparse
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+from caching import LRUCache
+from frames import ensure_date_columns
+
+# Trend analytics over any span of years. build() reads the events once per
+# data version into a cube of per (state, district, year, month) totals held
+# in a private in-memory SQLite database; yearly() and monthly() then roll the
+# cube up to the requested level and fill in a dense calendar (years or months
+# with no events count as zero) and take year-over-year deltas and moving
+# averages with window functions, all in one statement. Adding years of
+# history grows the cube by one row per district-month, not the query count.
+
+LEVELS = {
+    'national': [],
+    'state': ['state'],
+    'district': ['state', 'district'],
+}
+
+
+class TrendCube:
+    """Per (state, district, year, month) event totals with windowed yearly and monthly series.
+
+    A cube is built per data version, so series are memoised on it; callers
+    must not modify the frames they get back.
+    """
+
+    def __init__(self, cube, cache_size=64):
+        self.db = sqlite3.connect(':memory:', check_same_thread=False)
+        self._lock = threading.Lock()
+        self._results = LRUCache(cache_size)
+        cube.to_sql('cube', self.db, index=False)
+        self.db.execute("CREATE INDEX idx_cube ON cube (state, district, year, month)")
+        years = cube['year'].dropna()
+        self.years = sorted(int(year) for year in years.unique())
+
+    @classmethod
+    def build(cls, conn, relation='cloudburst_history'):
+        """Aggregate the events in `relation` into a cube, in one pass"""
+        return cls(pd.read_sql_query(f"""
+            SELECT state, district, year, month,
+                   COUNT(*) as incidents,
+                   COALESCE(SUM(casualties), 0) as casualties,
+                   SUM(rainfall_mm) as rainfall_total,
+                   COUNT(rainfall_mm) as rainfall_events
+            FROM {relation}
+            GROUP BY state, district, year, month
+        """, conn))
+
+    def frame(self):
+        """The cube's rows, from which TrendCube(frame) rebuilds it without the events"""
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM cube", self.db)
+
+    @property
+    def first_year(self):
+        return self.years[0] if self.years else None
+
+    @property
+    def latest_year(self):
+        return self.years[-1] if self.years else None
+
+    def span(self):
+        """'first-latest' years covered by the data, or a single year"""
+        if not self.years:
+            return ''
+        if self.first_year == self.latest_year:
+            return str(self.first_year)
+        return f"{self.first_year}-{self.latest_year}"
+
+    def _query(self, sql, params):
+        key = (sql, tuple(params))
+        result = self._results.get(key)
+        if result is None:
+            with self._lock:
+                result = pd.read_sql_query(sql, self.db, params=params)
+            self._results.put(key, result)
+        return result
+
+    def _scope(self, level, state, district):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown trend level '{level}'; expected one of {sorted(LEVELS)}")
+        keys = LEVELS[level]
+        conditions, params = [], []
+        if state is not None:
+            conditions.append("state = ?")
+            params.append(state)
+        if district is not None:
+            conditions.append("district = ?")
+            params.append(district)
+        return keys, conditions, params
+
+    def yearly(self, level='national', first_year=None, last_year=None, window=3, state=None, district=None):
+        """One row per key and year: totals, change on the previous year and a `window`-year moving average.
+
+        Years default to the span of the data; optional state/district filters
+        narrow the keys (e.g. level='district', state='Kerala').
+        """
+        if not self.years:
+            return pd.DataFrame(columns=LEVELS.get(level, []) + [
+                'year', 'incidents', 'casualties', 'avg_rainfall', 'yoy_change', 'yoy_pct', 'moving_avg'
+            ])
+        first_year = self.first_year if first_year is None else first_year
+        last_year = self.latest_year if last_year is None else last_year
+        keys, conditions, params = self._scope(level, state, district)
+        return self._series(keys, conditions + ['year BETWEEN ? AND ?'], params + [first_year, last_year],
+                            'year', (first_year, last_year), ['period as year'], 1, window)
+
+    def monthly(self, level='national', first_year=None, last_year=None, window=3, state=None, district=None):
+        """One row per key and month: totals, change on the same month a year earlier and a `window`-month moving average"""
+        if not self.years:
+            return pd.DataFrame(columns=LEVELS.get(level, []) + [
+                'year', 'month', 'incidents', 'casualties', 'avg_rainfall', 'yoy_change', 'yoy_pct', 'moving_avg'
+            ])
+        first_year = self.first_year if first_year is None else first_year
+        last_year = self.latest_year if last_year is None else last_year
+        keys, conditions, params = self._scope(level, state, district)
+        return self._series(keys, conditions + ['year BETWEEN ? AND ?'], params + [first_year, last_year],
+                            'year * 12 + month - 1', (first_year * 12, last_year * 12 + 11),
+                            ['period / 12 as year', 'period % 12 + 1 as month'], 12, window)
+
+    def _series(self, keys, conditions, params, period, bounds, labels, lag, window):
+        """Totals per key and period over a dense calendar, with LAG and moving-average windows.
+
+        `period` is the cube expression numbering periods consecutively,
+        `bounds` its first and last value, and `labels` turn it back into
+        output columns; `lag` periods back is the same period a year earlier.
+        """
+        where = ' AND '.join(conditions)
+        key_columns = ''.join(f"{key}, " for key in keys)
+        d_keys = ''.join(f"d.{key}, " for key in keys)
+        join_keys = ''.join(f"t.{key} = k.{key} AND " for key in keys)
+        partition = f"PARTITION BY {', '.join(f'd.{key}' for key in keys)} " if keys else ''
+        sql = f"""
+            WITH RECURSIVE calendar(period) AS (
+                SELECT ? UNION ALL SELECT period + 1 FROM calendar WHERE period < ?
+            ),
+            keys AS ({f"SELECT DISTINCT {', '.join(keys)} FROM cube WHERE {where}" if keys else "SELECT 1 as scope"}),
+            totals AS (
+                SELECT {key_columns}{period} as period,
+                       SUM(incidents) as incidents,
+                       SUM(casualties) as casualties,
+                       SUM(rainfall_total) as rainfall_total,
+                       SUM(rainfall_events) as rainfall_events
+                FROM cube
+                WHERE {where}
+                GROUP BY {key_columns}{period}
+            ),
+            dense AS (
+                SELECT {''.join(f"k.{key}, " for key in keys)}c.period,
+                       COALESCE(t.incidents, 0) as incidents,
+                       COALESCE(t.casualties, 0) as casualties,
+                       ROUND(t.rainfall_total / t.rainfall_events, 2) as avg_rainfall
+                FROM keys k CROSS JOIN calendar c
+                LEFT JOIN totals t ON {join_keys}t.period = c.period
+            )
+            SELECT {d_keys}{', '.join(label.replace('period', 'd.period') for label in labels)},
+                   d.incidents, d.casualties, d.avg_rainfall,
+                   d.incidents - LAG(d.incidents, {lag}) OVER w as yoy_change,
+                   ROUND(100.0 * (d.incidents - LAG(d.incidents, {lag}) OVER w)
+                         / NULLIF(LAG(d.incidents, {lag}) OVER w, 0), 1) as yoy_pct,
+                   ROUND(AVG(d.incidents) OVER (w ROWS BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW), 2)
+                       as moving_avg
+            FROM dense d
+            WINDOW w AS ({partition}ORDER BY d.period)
+            ORDER BY {d_keys}d.period
+        """
+        # Placeholders in statement order: calendar bounds, keys filter, totals filter
+        return self._query(sql, list(bounds) + (params if keys else []) + params)
+
+
+def direction(series, column='incidents'):
+    """'increasing', 'decreasing' or 'steady' from the least-squares slope of `column` over the rows"""
+    values = series[column].to_numpy(dtype=float)
+    if len(values) < 2:
+        return 'steady'
+    slope = np.polyfit(np.arange(len(values)), values, 1)[0]
+    if abs(slope) < 1e-9:
+        return 'steady'
+    return 'increasing' if slope > 0 else 'decreasing'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print yearly or monthly cloudburst trends")
+    parser.add_argument('--db', default=config.DB_PATH)
+    parser.add_argument('--level', choices=sorted(LEVELS), default='national')
+    parser.add_argument('--monthly', action='store_true')
+    parser.add_argument('--first-year', type=int)
+    parser.add_argument('--last-year', type=int)
+    parser.add_argument('--window', type=int, default=3, help="Moving-average window in years (months with --monthly)")
+    parser.add_argument('--state')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_date_columns(conn)
+        cube = TrendCube.build(conn)
+    finally:
+        conn.close()
+    series = cube.monthly if args.monthly else cube.yearly
+    frame = series(args.level, args.first_year, args.last_year, args.window, state=args.state)
+    print(frame.to_string(index=False))
+    print(f"Trend over {cube.span()}: {direction(frame)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from scoring import RuleScorer, feature_arrays
+
+# Monte Carlo confidence bands for risk probabilities. Each weather reading a
+# scorer depends on is perturbed by Gaussian sensor error, giving one
+# samples x regions array per reading; the scorer evaluates all of them in a
+# single broadcast pass and the bands are percentiles over the samples axis.
+
+# One-sigma sensor error per reading, in the reading's own units
+SENSOR_ERROR = {
+    'humidity': 3.0,        # % RH
+    'temperature': 0.5,     # deg C
+    'wind_speed': 1.5,      # km/h
+    'pressure': 1.0,        # hPa
+    'cloud_cover': 5.0,     # %
+    'precipitation': 0.5,   # mm
+}
+
+# Physical bounds perturbed readings are clipped to
+BOUNDS = {
+    'humidity': (0.0, 100.0),
+    'cloud_cover': (0.0, 100.0),
+    'wind_speed': (0.0, None),
+    'precipitation': (0.0, None),
+}
+
+
+def perturb(columns, names, samples, rng, errors=SENSOR_ERROR):
+    """Copy of `columns` with each name in `names` replaced by a samples x regions array of noisy readings"""
+    perturbed = dict(columns)
+    for name in names:
+        base = columns[name].astype(np.float32)
+        # float32 and in-place arithmetic: one full-size array per reading, no temporaries
+        noisy = rng.standard_normal((samples, len(base)), dtype=np.float32)
+        noisy *= errors[name]
+        noisy += base
+        low, high = BOUNDS.get(name, (None, None))
+        if low is not None or high is not None:
+            np.clip(noisy, low, high, out=noisy)
+        perturbed[name] = noisy
+    return perturbed
+
+
+def probability_bands(scorer, features, samples=config.UNCERTAINTY_SAMPLES, interval=config.UNCERTAINTY_INTERVAL,
+                      seed=None, errors=SENSOR_ERROR):
+    """Per-region median and central `interval` (percent) band of the scorer's probability under sensor error.
+
+    Regions with a missing reading keep it missing in every sample, so the
+    scorer treats it as it does for the point estimate.
+    """
+    columns = feature_arrays(features)
+    names = [name for name in scorer.inputs if name in errors and name in columns]
+    rng = np.random.default_rng(seed)
+    scores = np.broadcast_to(scorer.score_columns(perturb(columns, names, samples, rng, errors)),
+                             (samples, len(features)))
+    tail = (100 - interval) / 2
+    low, median, high = np.percentile(scores, [tail, 50, 100 - tail], axis=0)
+    return pd.DataFrame({
+        'probability_low': low,
+        'probability_median': median,
+        'probability_high': high,
+    }, index=features.index)
+
+
+def synthetic_features(regions, seed=0):
+    """Feature frame for `regions` made-up districts, for timing"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'total_incidents': rng.poisson(4, regions),
+        'recent_incidents': rng.poisson(1, regions),
+        'humidity': rng.uniform(50, 98, regions),
+        'temperature': rng.uniform(12, 35, regions),
+        'wind_speed': rng.uniform(0, 20, regions),
+        'pressure': rng.uniform(980, 1015, regions),
+        'cloud_cover': rng.uniform(20, 100, regions),
+        'precipitation': rng.gamma(1, 5, regions),
+    }, index=pd.Index([f"District {i}" for i in range(regions)], name='region'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Monte Carlo probability bands on synthetic regions")
+    parser.add_argument('--regions', type=int, default=780, help="Roughly the number of districts in India")
+    parser.add_argument('--samples', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs; the best is reported")
+    args = parser.parse_args()
+
+    features = synthetic_features(args.regions)
+    scorer = RuleScorer()
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        bands = probability_bands(scorer, features, samples=args.samples, seed=0)
+        best = min(best, time.perf_counter() - started)
+    print(f"{args.samples:,} samples x {args.regions:,} regions in {best * 1000:.0f}ms")
+    print(bands.head().round(1).to_string())
+
+
+if __name__ == '__main__':
+    main()